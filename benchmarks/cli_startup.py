@@ -0,0 +1,39 @@
+"""
+Measures the startup time of the pydbhub command line interface.
+
+    python benchmarks/cli_startup.py [runs]
+
+The time of "pydbhub --help" is compared with the time of a bare interpreter and with the time
+of importing the client, which the command line only does when a subcommand runs.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def measure(args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    cases = [
+        ('python -c pass', ['-c', 'pass']),
+        ('pydbhub --help', ['-m', 'pydbhub', '--help']),
+        ('import pydbhub.cli', ['-c', 'import pydbhub.cli']),
+        ('import pydbhub.dbhub', ['-c', 'import pydbhub.dbhub']),
+    ]
+    baseline = None
+    for name, args in cases:
+        median = measure(args, runs)
+        baseline = median if baseline is None else baseline
+        print(f"{name:24} {median * 1000:8.1f} ms  (+{(median - baseline) * 1000:.1f} ms)")
@@ -0,0 +1,50 @@
+"""
+Compares the memory taken by the rows of a large query result, as one dictionnary by row (Query()) and as
+a shared header with a tuple by row (Query(compact=True)), along with the time to build them.
+
+    python benchmarks/compact_rows.py [rows] [columns]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pydbhub.dbhub as dbhub  # noqa: E402
+
+
+def response(rows, columns):
+    # A query response as DBHub.io returns it: integer, float and text columns
+    types = [(4, lambda r: str(r)), (5, lambda r: str(r / 7)), (3, lambda r: f'value {r}')]
+    return [
+        [{'Name': f'column{c}', 'Type': types[c % 3][0], 'Value': types[c % 3][1](r * columns + c)} for c in range(columns)]
+        for r in range(rows)
+    ]
+
+
+def measure(build, res):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(res)
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, seconds
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    columns = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    res = response(rows, columns)
+    dicts, dict_size, dict_seconds = measure(dbhub._build_rows, res)
+    compact, compact_size, compact_seconds = measure(dbhub._build_compact, res)
+    assert compact == dicts
+    # The values are the same objects in both: the difference is in the containers holding them
+    dict_containers = sum(sys.getsizeof(row) for row in dicts)
+    compact_containers = sum(sys.getsizeof(row) for row in compact.tuples) + sys.getsizeof(compact.tuples)
+    print(f"{rows} rows of {columns} columns")
+    print(f"{'':14} {'total':>12} {'containers':>12} {'build':>8}")
+    print(f"{'dictionnaries':14} {dict_size / 2 ** 20:8.1f} MiB {dict_containers / 2 ** 20:8.1f} MiB {dict_seconds:6.2f} s")
+    print(f"{'compact':14} {compact_size / 2 ** 20:8.1f} MiB {compact_containers / 2 ** 20:8.1f} MiB {compact_seconds:6.2f} s")
+    print(f"{'ratio':14} {dict_size / compact_size:11.1f}x {dict_containers / compact_containers:11.1f}x")
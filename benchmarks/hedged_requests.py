@@ -0,0 +1,76 @@
+"""
+Compares the latency percentiles of queries with and without hedged requests, against the local stand-in
+server of the tests injecting latency spikes: most requests take the base latency, a few take the spike latency.
+
+    python benchmarks/hedged_requests.py [threads] [requests per thread] [base latency in ms] [spike latency in ms] [spike rate in %]
+
+For each configuration, prints the p50, p99 and p99.9 latencies of the calls, and the extra requests hedging cost.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+import pydbhub.dbhub as dbhub  # noqa: E402
+from standin import StandInServer  # noqa: E402
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run(connection, threads, count):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def work(worker):
+        for i in range(count):
+            start = time.perf_counter()
+            result, err = connection.Query('standin', 'bench.sqlite', 'SELECT ?, ?', [worker, i])
+            latency = time.perf_counter() - start
+            with lock:
+                latencies.append(latency)
+                if err or result[0]['sql'] != f'SELECT {worker}, {i}':
+                    errors.append((worker, i, err))
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(threads)))
+    return sorted(latencies), errors
+
+
+if __name__ == '__main__':
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    base = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+    spike = float(sys.argv[4]) / 1000 if len(sys.argv) > 4 else 0.2
+    rate = float(sys.argv[5]) / 100 if len(sys.argv) > 5 else 0.02
+    server = StandInServer().start()
+    randomness = random.Random(1)
+    server.latency = lambda endpoint, fields: spike if randomness.random() < rate else base
+    cases = [
+        ('no hedging', {}),
+        ('hedge at p95', {'hedge': 'true', 'hedge_percentile': 95}),
+        ('hedge at p90', {'hedge': 'true', 'hedge_percentile': 90, 'hedge_max_ratio': 0.1}),
+    ]
+    try:
+        print(f"{'':14} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'extra requests':>15} {'hedge wins':>11} errors")
+        for name, options in cases:
+            connection = dbhub.Dbhub(config_data=server.config(query_cache_size=0, head_check_interval=3600, **options))
+            # Warms the connections, and the latency history of the hedger
+            run(connection, threads, 10)
+            hits = server.hits['query']
+            before = connection.Metrics()
+            latencies, errors = run(connection, threads, count)
+            metrics = connection.Metrics()
+            extra = (server.hits['query'] - hits) / (threads * count) - 1
+            wins = metrics.get('hedge_wins', 0) - before.get('hedge_wins', 0)
+            print(f"{name:14} {percentile(latencies, 50) * 1000:8.1f} {percentile(latencies, 99) * 1000:8.1f} "
+                  f"{percentile(latencies, 99.9) * 1000:9.1f} {extra:14.1%} {wins:11} {len(errors)}")
+    finally:
+        server.stop()
@@ -0,0 +1,124 @@
+"""
+Compares the HTTP/1.1 transport (requests) with the HTTP/2 one (httpx and h2) on many concurrent small
+queries, against a local HTTP/2 capable server (hypercorn, speaking h2c to clients with prior knowledge).
+
+    pip install httpx[http2] hypercorn
+    python benchmarks/http2_transport.py [threads] [requests per thread] [server latency in ms]
+
+For each transport, prints the throughput and the number of TCP connections the server saw.
+"""
+import asyncio
+import base64
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pydbhub.dbhub as dbhub  # noqa: E402
+
+
+class Server(object):
+    def __init__(self, latency):
+        self.latency = latency
+        self.connections = set()
+        self.versions = set()
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    async def app(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        self.connections.add(tuple(scope['client']))
+        self.versions.add(scope['http_version'])
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        fields = {k: v[-1] for k, v in parse_qs(body.decode('utf-8')).items()}
+        await asyncio.sleep(self.latency)
+        sql = base64.b64decode(fields.get('sql', '')).decode('utf-8')
+        payload = json.dumps([[{'Name': 'sql', 'Type': 3, 'Value': sql}]]).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    def _run(self):
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        config = Config()
+        config.bind = [f'127.0.0.1:{self.port}']
+        config.loglevel = 'ERROR'
+        config.backlog = 1024
+        config.h2_max_concurrent_streams = 1000
+        config.keep_alive_max_requests = 1 << 30
+        loop = asyncio.new_event_loop()
+        self._stop = asyncio.Event()
+        loop.call_soon(self._ready.set)
+        loop.run_until_complete(serve(self.app, config, shutdown_trigger=self._stop.wait))
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', self.port)).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        self.connections.clear()
+        return self
+
+    def reset(self):
+        self.connections.clear()
+        self.versions.clear()
+
+
+def run(connection, threads, count):
+    ident = dbhub.Identifier(commit_id='c' * 64)
+    errors = []
+
+    def work(worker):
+        for i in range(count):
+            rows, err = connection.Query('bench', 'bench.sqlite', 'SELECT ?, ?', [worker, i], ident=ident)
+            if err or rows != [{'sql': f'SELECT {worker}, {i}'}]:
+                errors.append(err)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(threads)))
+    return time.perf_counter() - start, errors
+
+
+if __name__ == '__main__':
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+    server = Server(latency).start()
+    base = ['[dbhub]', 'api_key = bench', 'db_owner = bench', 'db_name = bench.sqlite', f'server = http://127.0.0.1:{server.port}',
+            'query_cache_size = 0', f'pool_size = {threads}']
+    cases = [
+        ('requests HTTP/1.1', []),
+        ('httpx HTTP/1.1', ['http2 = true']),
+        ('httpx HTTP/2', ['http2 = true', 'http2_prior_knowledge = true']),
+    ]
+    for name, options in cases:
+        connection = dbhub.Dbhub(config_data='\n'.join(base + options) + '\n')
+        run(connection, threads, 1)
+        server.reset()
+        seconds, errors = run(connection, threads, count)
+        total = threads * count
+        print(f"{name:18} {total / seconds:8.0f} requests/s  {len(server.connections):4} connections  "
+              f"HTTP {'/'.join(sorted(server.versions))}  {len(errors)} errors")
@@ -0,0 +1,52 @@
+"""
+Measures how the throughput of one Dbhub object shared by a pool of threads scales
+from 1 to 64 threads, against the local stand-in server of the tests.
+
+    python benchmarks/thread_scaling.py [requests per thread] [server latency in ms]
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests'))
+
+import pydbhub.dbhub as dbhub  # noqa: E402
+from standin import StandInServer  # noqa: E402
+
+
+def run(connection, threads, count):
+    errors = []
+    lock = threading.Lock()
+
+    def work(worker):
+        for i in range(count):
+            result, err = connection.Query('standin', 'bench.sqlite', 'SELECT ?, ?', [worker, i])
+            if err or result[0]['sql'] != f'SELECT {worker}, {i}':
+                with lock:
+                    errors.append((worker, i, err))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(threads)))
+    return time.perf_counter() - start, errors
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    server = StandInServer().start()
+    server.latency = lambda endpoint, fields: latency
+    connection = dbhub.Dbhub(config_data=server.config(query_cache_size=0))
+    try:
+        baseline = None
+        print(f"{'threads':>8} {'requests':>9} {'seconds':>8} {'req/s':>9} {'speedup':>8} errors")
+        for threads in (1, 2, 4, 8, 16, 32, 64):
+            seconds, errors = run(connection, threads, count)
+            rate = threads * count / seconds
+            baseline = baseline or rate
+            print(f"{threads:>8} {threads * count:>9} {seconds:>8.2f} {rate:>9.0f} {rate / baseline:>7.1f}x {len(errors)}")
+    finally:
+        server.stop()
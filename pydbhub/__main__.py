@@ -0,0 +1,5 @@
+import sys
+
+from pydbhub.cli import main
+
+sys.exit(main())
@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+# LRUCache is a small bounded mapping which evicts the least recently used entry once full.
+# It can be shared between threads.
+class LRUCache(object):
+    def __init__(self, maxsize: int = 128):
+        """
+        Creates a new, empty, cache.
+
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of entries kept. A size of 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
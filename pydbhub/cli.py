@@ -0,0 +1,353 @@
+"""
+pydbhub command line interface.
+
+Only the standard library modules needed to parse the command line are imported at startup:
+the client (and with it the HTTP stack) is imported when a subcommand actually runs.
+"""
+import argparse
+import os
+import sys
+
+DEFAULT_CONFIG = os.path.join('~', '.pydbhub.ini')
+
+# The result of the commands which wrote their output themselves
+_WRITTEN = object()
+
+
+def _to_json(value):
+    # json.dump() fallback for the objects returned by Dbhub
+    import base64
+    import datetime
+
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    if hasattr(value, '__dict__'):
+        return vars(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _write(result, out, fmt: str):
+    import json
+
+    if fmt == 'raw':
+        out.write(f"{result}\n")
+    elif fmt == 'jsonl' and isinstance(result, (list, dict)):
+        # One item per line, written as it is serialized
+        items = result.items() if isinstance(result, dict) else result
+        for item in items:
+            out.write(json.dumps(item, default=_to_json, ensure_ascii=False))
+            out.write('\n')
+    elif fmt == 'csv' and isinstance(result, list):
+        import csv
+
+        writer = None
+        for row in result:
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow({k: _to_json(v) if isinstance(v, (bytes, bytearray)) else v for k, v in row.items()})
+    else:
+        json.dump(result, out, default=_to_json, ensure_ascii=False, indent=2)
+        out.write('\n')
+
+
+def _param(value: str):
+    # Query parameters are JSON values, anything else is taken as a string
+    import json
+
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _ident(args):
+    from pydbhub.dbhub import Identifier
+
+    if not (args.branch or args.commit or args.tag or args.release):
+        return None
+    return Identifier(branch=args.branch or '', commit_id=args.commit or '', tag=args.tag or '', release=args.release or '')
+
+
+def _cmd_databases(db, args):
+    return db.Databases()
+
+
+def _cmd_columns(db, args):
+    return db.Columns(args.db_owner, args.db_name, args.table, _ident(args))
+
+
+def _cmd_delete(db, args):
+    err = db.Delete(args.db_name)
+    return ('deleted', None) if not err else (None, err)
+
+
+def _cmd_branches(db, args):
+    branches, default_branch, err = db.Branches(args.db_owner, args.db_name)
+    if branches is None:
+        return None, err
+    return {'branches': branches, 'default_branch': default_branch}, None
+
+
+def _cmd_commits(db, args):
+    return db.Commits(args.db_owner, args.db_name)
+
+
+def _cmd_diff(db, args):
+    from pydbhub.dbhub import Identifier
+
+    merge = {'none': None, 'preserve_pk': db.PRESERVE_PK_MERGE, 'new_pk': db.NEX_PK_MERGE}[args.merge]
+    ident_a = Identifier(branch=args.branch_a or '', commit_id=args.commit_a or '', tag=args.tag_a or '', release=args.release_a or '')
+    ident_b = Identifier(branch=args.branch_b or '', commit_id=args.commit_b or '', tag=args.tag_b or '', release=args.release_b or '')
+    # Without a second database, two versions of the first one are compared
+    return db.Diff(args.db_owner_a, args.db_name_a, ident_a, args.db_owner_b or args.db_owner_a, args.db_name_b or args.db_name_a, ident_b, merge)
+
+
+def _cmd_download(db, args):
+    # Streamed to the output as it is received, so the database is never held in memory
+    if args.output == '-':
+        size, err = db.DownloadTo(args.db_owner, args.db_name, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.output, 'wb') as f:
+            size, err = db.DownloadTo(args.db_owner, args.db_name, f)
+        if err:
+            os.remove(args.output)
+    return (None, err) if err else (_WRITTEN, None)
+
+
+def _cmd_indexes(db, args):
+    return db.Indexes(args.db_owner, args.db_name)
+
+
+def _cmd_metadata(db, args):
+    return db.Metadata(args.db_owner, args.db_name)
+
+
+def _cmd_mirror(db, args):
+    names = args.db_name
+    if not names and args.owner:
+        # The databases of the API key, which belong to the given account
+        names, err = db.Databases()
+        if err or names is None:
+            return None, err
+    databases = ([(args.owner, name) for name in names] if args.owner else names) or None
+    report, err = db.Mirror(args.directory, databases, max_workers=args.jobs)
+    for name, error in (report.errors.items() if report is not None else ()):
+        print(f"[ERROR] {name}: {error}", file=sys.stderr)
+    return report, err
+
+
+def _cmd_query(db, args):
+    if args.named:
+        params = {}
+        for item in args.named:
+            name, _, value = item.partition('=')
+            params[name] = _param(value)
+    else:
+        params = [_param(value) for value in args.param] or None
+    sql = sys.stdin.read() if args.sql == '-' else args.sql
+    return db.Query(args.db_owner, args.db_name, sql, params, ident=_ident(args), preflight=args.preflight)
+
+
+def _cmd_releases(db, args):
+    return db.Releases(args.db_owner, args.db_name)
+
+
+def _cmd_tables(db, args):
+    return db.Tables(args.db_owner, args.db_name)
+
+
+def _cmd_tags(db, args):
+    return db.Tags(args.db_owner, args.db_name)
+
+
+def _cmd_upload(db, args):
+    from pydbhub.dbhub import Identifier, UploadInformation
+
+    info = UploadInformation(
+        identifier=Identifier(branch=args.branch or ''),
+        commitmsg=args.commit_msg or '',
+        sourceurl=args.source_url or '',
+        licence=args.licence or '',
+        public=not args.private,
+        force=args.force,
+    )
+    with open(args.file, 'rb') as f:
+        return db.Upload(args.db_name, info, f, skip_unchanged=args.skip_unchanged)
+
+
+def _cmd_views(db, args):
+    return db.Views(args.db_owner, args.db_name, _ident(args))
+
+
+def _cmd_webpage(db, args):
+    return db.Webpage(args.db_owner, args.db_name)
+
+
+def _add_database(parser):
+    parser.add_argument('db_owner', help='the owner of the database')
+    parser.add_argument('db_name', help='the name of the database')
+
+
+def _add_ident(parser, suffix: str = ''):
+    dest = suffix.replace('-', '_')
+    parser.add_argument(f'--branch{suffix}', dest=f'branch{dest}', help='branch name')
+    parser.add_argument(f'--commit{suffix}', dest=f'commit{dest}', help='commit ID')
+    parser.add_argument(f'--tag{suffix}', dest=f'tag{dest}', help='tag name')
+    parser.add_argument(f'--release{suffix}', dest=f'release{dest}', help='release name')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pydbhub', description='Access and use SQLite databases on DBHub.io')
+    parser.add_argument('-c', '--config', default=os.environ.get('PYDBHUB_CONFIG', DEFAULT_CONFIG),
+                        help='INI configuration file (default: $PYDBHUB_CONFIG or %(default)s)')
+    parser.add_argument('-k', '--api-key', default=os.environ.get('DBHUB_API_KEY'),
+                        help='API key, instead of the one of the configuration file (default: $DBHUB_API_KEY)')
+    parser.add_argument('-o', '--output', default='-', help='output file (default: standard output)')
+    parser.add_argument('-f', '--format', choices=('json', 'jsonl', 'csv', 'raw'), default='json',
+                        help='output format (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    sub = commands.add_parser('databases', help='list the databases of your account')
+    sub.set_defaults(func=_cmd_databases)
+
+    sub = commands.add_parser('columns', help='list the columns of a table or view')
+    _add_database(sub)
+    sub.add_argument('table')
+    _add_ident(sub)
+    sub.set_defaults(func=_cmd_columns)
+
+    sub = commands.add_parser('delete', help='delete a database of your account')
+    sub.add_argument('db_name')
+    sub.set_defaults(func=_cmd_delete)
+
+    for name, func, text in (
+        ('branches', _cmd_branches, 'list the branches of a database'),
+        ('commits', _cmd_commits, 'list the commits of a database'),
+        ('indexes', _cmd_indexes, 'list the indexes of a database'),
+        ('metadata', _cmd_metadata, 'show the metadata of a database'),
+        ('releases', _cmd_releases, 'list the releases of a database'),
+        ('tables', _cmd_tables, 'list the tables of a database'),
+        ('tags', _cmd_tags, 'list the tags of a database'),
+        ('webpage', _cmd_webpage, 'show the web page address of a database'),
+    ):
+        sub = commands.add_parser(name, help=text)
+        _add_database(sub)
+        sub.set_defaults(func=func)
+
+    sub = commands.add_parser('views', help='list the views of a database')
+    _add_database(sub)
+    _add_ident(sub)
+    sub.set_defaults(func=_cmd_views)
+
+    sub = commands.add_parser('diff', help='diff two databases, or two versions of a database')
+    sub.add_argument('db_owner_a')
+    sub.add_argument('db_name_a')
+    sub.add_argument('db_owner_b', nargs='?', help='the owner of the second database (default: the first one)')
+    sub.add_argument('db_name_b', nargs='?', help='the name of the second database (default: the first one)')
+    _add_ident(sub, '-a')
+    _add_ident(sub, '-b')
+    sub.add_argument('--merge', choices=('none', 'preserve_pk', 'new_pk'), default='none')
+    sub.set_defaults(func=_cmd_diff)
+
+    sub = commands.add_parser('download', help='download a database file')
+    _add_database(sub)
+    sub.set_defaults(func=_cmd_download)
+
+    sub = commands.add_parser('mirror', help='mirror the database files of all commits to a local directory')
+    sub.add_argument('directory', help='the directory of the mirror, where only the files not mirrored yet are downloaded')
+    sub.add_argument('db_name', nargs='*', help='the databases to mirror (default: all the databases of your account)')
+    sub.add_argument('--owner', help='the owner of the databases (default: db_owner of the configuration file, '
+                     'or for all the databases of your account, the account option)')
+    sub.add_argument('-j', '--jobs', type=int, help='the number of downloads running at the same time')
+    sub.set_defaults(func=_cmd_mirror)
+
+    sub = commands.add_parser('query', help='run a SELECT query on a database')
+    _add_database(sub)
+    sub.add_argument('sql', help='the SQL query, or - to read it from standard input')
+    # A query has either positional or named placeholders
+    params = sub.add_mutually_exclusive_group()
+    params.add_argument('-p', '--param', action='append', default=[], help='value of the next positional placeholder (JSON, or a string)')
+    params.add_argument('-n', '--named', action='append', default=[], metavar='NAME=VALUE', help='value of a named placeholder')
+    sub.add_argument('--preflight', action='store_true', default=None, help='check the query against the schema of the database before sending it')
+    _add_ident(sub)
+    sub.set_defaults(func=_cmd_query)
+
+    sub = commands.add_parser('upload', help='upload a database file')
+    sub.add_argument('db_name')
+    sub.add_argument('file')
+    sub.add_argument('--branch')
+    sub.add_argument('-m', '--commit-msg')
+    sub.add_argument('--source-url')
+    sub.add_argument('--licence')
+    sub.add_argument('--private', action='store_true')
+    sub.add_argument('--no-force', dest='force', action='store_false')
+    sub.add_argument('--skip-unchanged', action='store_true', help="don't upload the file if it matches the head commit (needs the account option)")
+    sub.set_defaults(func=_cmd_upload)
+
+    return parser
+
+
+def _client(args):
+    import configparser
+    import io
+
+    from pydbhub.dbhub import Dbhub
+
+    config = configparser.ConfigParser()
+    path = os.path.expanduser(args.config)
+    if os.path.exists(path):
+        with open(path) as f:
+            config.read_file(f)
+    if not config.has_section('dbhub'):
+        config.add_section('dbhub')
+    if args.api_key:
+        config.set('dbhub', 'api_key', args.api_key)
+    for option in ('db_owner', 'db_name'):
+        if not config.has_option('dbhub', option):
+            config.set('dbhub', option, '')
+    if not config.get('dbhub', 'api_key', fallback=''):
+        raise ValueError(f"No API key: use --api-key, $DBHUB_API_KEY or the configuration file {path}")
+
+    data = io.StringIO()
+    config.write(data)
+    return Dbhub(config_data=data.getvalue())
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        db = _client(args)
+        result, err = args.func(db, args)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    if result is None or err:
+        print(f"[ERROR] {err or 'Request failed'}", file=sys.stderr)
+        return 1
+    if result is _WRITTEN:
+        return 0
+
+    if isinstance(result, (bytes, bytearray)):
+        if args.output == '-':
+            sys.stdout.buffer.write(result)
+            sys.stdout.buffer.flush()
+        else:
+            with open(args.output, 'wb') as f:
+                f.write(result)
+        return 0
+
+    if args.output == '-':
+        _write(result, sys.stdout, args.format)
+    else:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            _write(result, f, args.format)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
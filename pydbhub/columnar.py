@@ -0,0 +1,104 @@
+from typing import Any, Dict, List, Tuple
+
+import pydbhub.values as values
+
+# numpy and pandas are optional dependencies, only imported when a columnar result is built
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Columnar query results require numpy: pip install numpy")
+    return numpy
+
+
+def _columns(res: List) -> Tuple[List[str], List[List[int]], List[List[Any]]]:
+    # Splits a query response into the type codes and raw values of each column, in a single pass
+    if not res:
+        return [], [], []
+    names = [cell['Name'] for cell in res[0]]
+    types = [[] for _ in names]
+    raw = [[] for _ in names]
+    for result_row in res:
+        for i, cell in enumerate(result_row):
+            types[i].append(cell['Type'])
+            raw[i].append(cell['Value'])
+    return names, types, raw
+
+
+def _column(np, types: List[int], raw: List[Any]):
+    # Builds the masked array of one column, its dtype being chosen from the type codes of its values:
+    # int64 for integers, float64 for floats (or a mix of integers and floats), object otherwise.
+    # Null values are masked.
+    mask = np.fromiter((t == values.NULL for t in types), dtype=bool, count=len(types))
+    kinds = set(types)
+    kinds.discard(values.NULL)
+
+    if kinds == {values.INTEGER}:
+        try:
+            data = np.fromiter((int(v) if t == values.INTEGER else 0 for t, v in zip(types, raw)), dtype=np.int64, count=len(raw))
+            return np.ma.MaskedArray(data, mask=mask)
+        except OverflowError:
+            pass
+    elif kinds and kinds <= {values.INTEGER, values.FLOAT}:
+        data = np.fromiter((float(v) if t != values.NULL else np.nan for t, v in zip(types, raw)), dtype=np.float64, count=len(raw))
+        return np.ma.MaskedArray(data, mask=mask)
+
+    decoders = values.DECODERS
+    data = np.empty(len(raw), dtype=object)
+    for i, (t, v) in enumerate(zip(types, raw)):
+        data[i] = decoders[t](v)
+    return np.ma.MaskedArray(data, mask=mask)
+
+
+def to_arrays(res: List) -> Dict[str, Any]:
+    """
+    Builds one NumPy masked array by column from a query response, without building rows first.
+
+    Parameters
+    ----------
+    res : List
+        The response of the query API
+
+    Returns
+    -------
+    Dict[str, numpy.ma.MaskedArray]
+        The values of each column, Null values being masked
+    """
+    np = _numpy()
+    names, types, raw = _columns(res)
+    return {name: _column(np, t, r) for name, t, r in zip(names, types, raw)}
+
+
+def to_dataframe(res: List) -> Any:
+    """
+    Builds a pandas DataFrame from a query response, without building rows first.
+    Integer and float columns use the nullable Int64 and Float64 dtypes, so Null values stay missing values.
+
+    Parameters
+    ----------
+    res : List
+        The response of the query API
+
+    Returns
+    -------
+    pandas.DataFrame
+        The result of the query
+    """
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError("DataFrame query results require pandas: pip install pandas")
+
+    np = _numpy()
+    columns = {}
+    for name, array in to_arrays(res).items():
+        data, mask = array.data, np.ma.getmaskarray(array)
+        if data.dtype.kind == 'i':
+            columns[name] = pandas.arrays.IntegerArray(data, mask)
+        elif data.dtype.kind == 'f':
+            columns[name] = pandas.arrays.FloatingArray(data, mask)
+        else:
+            columns[name] = pandas.Series(data, dtype=object)
+    return pandas.DataFrame(columns, copy=False)
@@ -0,0 +1,182 @@
+import heapq
+from typing import Any, Callable, Dict, Iterable, List, Set
+
+_FROM_A = 1
+_FROM_B = 2
+_BOTH = _FROM_A | _FROM_B
+_STALE = 4
+
+
+class CommitGraph(object):
+    def __init__(self, commits: Iterable[Any]):
+        """
+        Indexes commits, as returned by Dbhub.Commits(), into a graph linked by their parent and other parents.
+        Each commit gets a generation number: 1 for a root commit, otherwise 1 + the highest generation of its parents.
+        Walks stop as soon as the generations show the answer can't be further down the history.
+
+        Parameters
+        ----------
+        commits : Iterable[Any]
+            The commits of a database
+        """
+        self._commits = {}
+        self._parents = {}
+        for commit in commits:
+            self._commits[commit.id] = commit
+        for commit_id, commit in self._commits.items():
+            parents = [getattr(commit, 'parent', '')] + list(getattr(commit, 'other_parents', None) or [])
+            self._parents[commit_id] = tuple(p for p in parents if p and p in self._commits)
+
+        self._children = {commit_id: [] for commit_id in self._commits}
+        for commit_id, parents in self._parents.items():
+            for parent in parents:
+                self._children[parent].append(commit_id)
+
+        # Generation numbers, computed from the roots up
+        self._generation = {}
+        pending = {commit_id: len(parents) for commit_id, parents in self._parents.items()}
+        ready = [commit_id for commit_id, count in pending.items() if count == 0]
+        while ready:
+            commit_id = ready.pop()
+            self._generation[commit_id] = 1 + max((self._generation[p] for p in self._parents[commit_id]), default=0)
+            for child in self._children[commit_id]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+        if len(self._generation) != len(self._commits):
+            raise ValueError("The commit history contains a cycle")
+
+    def __len__(self) -> int:
+        return len(self._commits)
+
+    def __contains__(self, commit_id: str) -> bool:
+        return commit_id in self._commits
+
+    def __getitem__(self, commit_id: str) -> Any:
+        return self._commits[commit_id]
+
+    def get(self, commit_id: str, default: Any = None) -> Any:
+        return self._commits.get(commit_id, default)
+
+    def parents(self, commit_id: str) -> List[str]:
+        return list(self._parents[commit_id])
+
+    def children(self, commit_id: str) -> List[str]:
+        return list(self._children[commit_id])
+
+    def generation(self, commit_id: str) -> int:
+        return self._generation[commit_id]
+
+    def roots(self) -> List[str]:
+        return [commit_id for commit_id, parents in self._parents.items() if not parents]
+
+    def ancestors(self, commit_id: str) -> Set[str]:
+        """
+        Returns the IDs of all the ancestors of a commit, the commit itself included.
+        """
+        seen = {commit_id}
+        stack = [commit_id]
+        while stack:
+            for parent in self._parents[stack.pop()]:
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return seen
+
+    def is_ancestor(self, ancestor: str, commit_id: str) -> bool:
+        """
+        Returns True if ancestor is reachable from commit_id, or is commit_id itself.
+        Commits with a generation lower than the one of ancestor are never visited.
+        """
+        if ancestor not in self._commits:
+            raise KeyError(ancestor)
+        floor = self._generation[ancestor]
+        seen = {commit_id}
+        stack = [commit_id]
+        while stack:
+            current = stack.pop()
+            if current == ancestor:
+                return True
+            for parent in self._parents[current]:
+                if parent not in seen and self._generation[parent] >= floor:
+                    seen.add(parent)
+                    stack.append(parent)
+        return False
+
+    def _paint(self, a: str, b: str, visit: Callable[[str, int], int], stop: Callable[[Dict[str, int], List], bool]):
+        # Propagates the _FROM_A and _FROM_B flags down the history, highest generation first, so the flags
+        # of a commit are final when it is popped. visit(commit_id, flags) returns the flags given to its parents.
+        flags = {a: _FROM_A}
+        flags[b] = flags.get(b, 0) | _FROM_B
+        heap = [(-self._generation[a], a)]
+        if b != a:
+            heapq.heappush(heap, (-self._generation[b], b))
+        popped = set()
+        while heap:
+            if stop(flags, heap):
+                break
+            _, commit_id = heapq.heappop(heap)
+            if commit_id in popped:
+                continue
+            popped.add(commit_id)
+            current = flags[commit_id] = visit(commit_id, flags[commit_id])
+            for parent in self._parents[commit_id]:
+                before = flags.get(parent, 0)
+                after = before | current
+                if after != before:
+                    flags[parent] = after
+                    heapq.heappush(heap, (-self._generation[parent], parent))
+
+    def merge_bases(self, a: str, b: str) -> List[str]:
+        """
+        Returns the best common ancestors of two commits: the common ancestors which aren't ancestors of another
+        common ancestor. There's usually only one, but criss-cross merges may give several.
+        """
+        for commit_id in (a, b):
+            if commit_id not in self._commits:
+                raise KeyError(commit_id)
+
+        results = []
+
+        def visit(commit_id, current):
+            if current & _BOTH == _BOTH:
+                if not current & _STALE:
+                    results.append(commit_id)
+                # Everything below a common ancestor is a common ancestor too, but not a best one
+                current |= _STALE
+            return current
+
+        def stop(flags, heap):
+            return all(flags[commit_id] & _STALE for _, commit_id in heap)
+
+        self._paint(a, b, visit, stop)
+        return results
+
+    def merge_base(self, a: str, b: str) -> str:
+        """
+        Returns the best common ancestor of two commits, or None if they don't share any history.
+        """
+        bases = self.merge_bases(a, b)
+        return bases[0] if bases else None
+
+    def range(self, start: str, end: str) -> List[str]:
+        """
+        Returns the IDs of the commits reachable from end but not from start (the "start..end" range of git),
+        highest generation first.
+        """
+        for commit_id in (start, end):
+            if commit_id not in self._commits:
+                raise KeyError(commit_id)
+
+        results = []
+
+        def visit(commit_id, current):
+            if current == _FROM_B:
+                results.append(commit_id)
+            return current
+
+        def stop(flags, heap):
+            return all(flags[commit_id] & _FROM_A for _, commit_id in heap)
+
+        self._paint(start, end, visit, stop)
+        return results
@@ -1,18 +1,121 @@
 
 import os
 import io
-import configparser
-import base64
+import copy
 import datetime
-from typing import List, Tuple, Dict
-from dataclasses import dataclass
-from typing_extensions import Literal
-
-# https://dateutil.readthedocs.io/
-import dateutil.parser as p
-
-
+import functools
+import threading
+import time
+from typing import Callable, ContextManager, Iterable, Iterator, List, Tuple, Dict
+from dataclasses import astuple, dataclass, field
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+import pydbhub.deadline as deadline
 import pydbhub.httphub as httphub
+import pydbhub.sqlparams as sqlparams
+import pydbhub.fanout as fanout
+import pydbhub.values as values
+from pydbhub.commitgraph import CommitGraph
+from pydbhub.schema import Schema
+from pydbhub.cache import LRUCache
+
+
+def _parse_date(value: str) -> datetime.datetime:
+    # Timestamps returned by DBHub.io are usually ISO 8601, which the standard library parses.
+    # dateutil is only imported for the other ones.
+    try:
+        return datetime.datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        # https://dateutil.readthedocs.io/
+        import dateutil.parser
+
+        return dateutil.parser.parse(value)
+
+
+def _file_sha256(fileobj: io.BufferedReader, chunk_size: int = 1024 * 1024) -> str:
+    # Hashes the rest of a file in one streaming pass, then rewinds it to where it was
+    import hashlib
+
+    position = fileobj.tell()
+    sha = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        sha.update(chunk)
+    fileobj.seek(position)
+    return sha.hexdigest()
+
+
+def _normalize_commit(commit: Dict) -> Dict:
+    # Rewrites the timestamps of a commit as returned by the API into ISO 8601, which parses fast
+    commit['timestamp'] = _parse_date(commit['timestamp']).isoformat()
+    for entry in commit['tree']['entries']:
+        entry['last_modified'] = _parse_date(entry['last_modified']).isoformat()
+    return commit
+
+
+def _stored_commit(commit: Dict) -> '_DbhubDictToObject':
+    # Builds the commit object of a normalized commit
+    commit = _DbhubDictToObject(commit)
+    commit.timestamp = datetime.datetime.fromisoformat(commit.timestamp)
+    for entry in commit.tree.entries:
+        entry.last_modified = datetime.datetime.fromisoformat(entry.last_modified)
+    return commit
+
+
+def _decode_pooled(res: List) -> List[list]:
+    # The values of each row of a query response, in the order of its columns, the BLOB values of each column
+    # being decoded into one shared buffer (see values.BlobColumn)
+    decoders = values.DECODERS
+    rows = []
+    blobs = {}
+    for result_row in res:
+        one_row = []
+        for i, data in enumerate(result_row):
+            if data['Type'] == values.BINARY and isinstance(data['Value'], str):
+                blobs.setdefault(i, []).append((len(rows), data['Value']))
+                one_row.append(None)
+            else:
+                one_row.append(decoders[data['Type']](data['Value']))
+        rows.append(one_row)
+    for i, cells in blobs.items():
+        column = values.BlobColumn([value for _, value in cells])
+        for (row, _), blob in zip(cells, column):
+            rows[row][i] = blob
+    return rows
+
+
+def _build_rows(res: List, pool_blobs: bool = False) -> List[Dict]:
+    # One dictionnary by row of a query response.
+    # With pool_blobs, the BLOB values of each column are decoded into one shared buffer (see values.BlobColumn)
+    if pool_blobs:
+        return [dict(zip([data['Name'] for data in result_row], one_row)) for result_row, one_row in zip(res, _decode_pooled(res))]
+    decoders = values.DECODERS
+    return [{data['Name']: decoders[data['Type']](data['Value']) for data in result_row} for result_row in res]
+
+
+def _build_compact(res: List, pool_blobs: bool = False) -> 'Rows':
+    # The rows of a query response as tuples, under one shared header of column names
+    from pydbhub.rows import Rows
+
+    if not res:
+        return Rows((), ())
+    columns = tuple(data['Name'] for data in res[0])
+    if pool_blobs:
+        return Rows(columns, [tuple(one_row) for one_row in _decode_pooled(res)])
+    decoders = values.DECODERS
+    return Rows(columns, [tuple([decoders[data['Type']](data['Value']) for data in result_row]) for result_row in res])
+
+
+def _prefetchable(method: Callable) -> Callable:
+    # Marks a read which Prefetch() can warm: calls are answered from a copy of the prefetched result while it is fresh,
+    # and join the same request when it is already in flight
+    @functools.wraps(method)
+    def read(self, db_owner: str, db_name: str, *args, **kwargs):
+        key = self._readKey(method.__name__, db_owner, db_name, *args, **kwargs)
+        return self._read(key, lambda: method(self, db_owner, db_name, *args, **kwargs))
+    return read
 
 
 # Dictionnary to object
@@ -47,7 +150,7 @@ class Identifier:
 # UploadInformation holds information used when uploading
 @dataclass()
 class UploadInformation:
-    identifier: Identifier = Identifier()
+    identifier: Identifier = field(default_factory=Identifier)
     commitmsg: str = ''
     sourceurl: str = ''
     lastmodified: datetime.datetime = None
@@ -63,6 +166,161 @@ class UploadInformation:
     dbshasum: str = ''
 
 
+# PrefetchJob tracks a background prefetch started by Dbhub.Prefetch()
+class PrefetchJob(object):
+    def __init__(self):
+        self.fetched = 0
+        self.errors = {}
+        self._done = threading.Event()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Waits until the prefetch is finished, returning whether it is.
+        """
+        return self._done.wait(timeout)
+
+
+# UploadResult holds the outcome of one upload of a bulk upload
+@dataclass()
+class UploadResult:
+    db_name: str = ''
+    path: str = ''
+    commit: Dict = None
+    err: str = None
+    skipped: bool = False
+    attempts: int = 0
+    size: int = 0
+    seconds: float = 0.0
+
+
+# UploadReport holds the outcome of a bulk upload
+@dataclass()
+class UploadReport:
+    results: List[UploadResult] = field(default_factory=list)
+    bytes_sent: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        # Bytes uploaded per second
+        return self.bytes_sent / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def failed(self) -> List[UploadResult]:
+        return [r for r in self.results if r.err]
+
+
+def _flag(options: Dict[str, str], name: str) -> bool:
+    return options.get(name, 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _limiter(options: Dict[str, str]) -> fanout.AdaptiveLimiter:
+    # The adaptive concurrency limiter of the transport, when the options enable one
+    if not _flag(options, 'adaptive_concurrency'):
+        return None
+    return fanout.AdaptiveLimiter(
+        initial=int(options.get('initial_concurrency', 4)),
+        maximum=int(options.get('max_concurrency', 64)),
+    )
+
+
+def _hedger(options: Dict[str, str]) -> fanout.Hedger:
+    # The hedger of the transport, when the options enable hedged reads
+    if not _flag(options, 'hedge'):
+        return None
+    return fanout.Hedger(
+        percentile=float(options.get('hedge_percentile', 95)),
+        max_ratio=float(options.get('hedge_max_ratio', 0.05)),
+    )
+
+
+def _seconds(options: Dict[str, str], name: str) -> float:
+    # An optional duration in seconds, None when not set
+    value = options.get(name, '').strip()
+    return float(value) if value else None
+
+
+def _transport(options: Dict[str, str]) -> httphub.Transport:
+    # A transport configured by the options
+    return httphub.create_transport(
+        pool_size=int(options.get('pool_size', 10)),
+        limiter=_limiter(options),
+        connect_timeout=_seconds(options, 'connect_timeout'),
+        read_timeout=_seconds(options, 'timeout'),
+        hedger=_hedger(options),
+        http2=_flag(options, 'http2'),
+        prior_knowledge=_flag(options, 'http2_prior_knowledge'),
+    )
+
+
+_config_cache = LRUCache(maxsize=64)
+
+
+def load_config(config_data: str = None, config_file: str = None) -> Dict[str, str]:
+    """
+    Reads the options of the [dbhub] section of an INI configuration.
+    Parsed configurations are cached, by content for configuration data and by path and
+    modification time for configuration files.
+
+    Parameters
+    ----------
+    config_data : str
+        INI configuration data from a string
+    config_file : str
+        INI configuration file
+
+    Returns
+    -------
+    Dict[str, str]
+        The options of the [dbhub] section
+    """
+    if config_data:
+        key = ('data', config_data)
+    elif config_file:
+        try:
+            key = ('file', os.path.abspath(config_file), os.stat(config_file).st_mtime_ns)
+        except OSError:
+            key = None
+    else:
+        raise ValueError("No INI configuration specified")
+
+    options = _config_cache.get(key) if key is not None else None
+    if options is not None:
+        return options
+
+    import configparser
+
+    config = configparser.ConfigParser()
+    if config_data:
+        config.read_string(config_data)
+    elif config_file:
+        if os.path.exists(config_file) > 0:
+            try:
+                with open(config_file) as f:
+                    config.read_file(f)
+            except IOError as e:
+                raise ValueError(f"Failed to read config file: {config_file} Erreor: {e}")
+        else:
+            raise ValueError(f"INI configuration file: {config_file} doesn't exist")
+
+    if config.has_section('dbhub') is False:
+        raise configparser.NoSectionError('dbhub')
+    if config.has_option('dbhub', 'api_key') is False:
+        raise configparser.NoOptionError('api_key', 'dbhub')
+    if config.has_option('dbhub', 'db_owner') is False:
+        raise configparser.NoOptionError('db_owner', 'dbhub')
+    if config.has_option('dbhub', 'db_name') is False:
+        raise configparser.NoOptionError('db_name', 'dbhub')
+
+    options = dict(config['dbhub'])
+    if key is not None:
+        _config_cache.put(key, options)
+    return options
+
+
 class Dbhub:
     PRESERVE_PK_MERGE = 1
     NEX_PK_MERGE = 2
@@ -72,6 +330,10 @@ class Dbhub:
         Creates a new DBHub.io connection object.  It doesn't connect to DBHub.io.
         Connection only occurs when subsequent functions (eg Query()) are called.
 
+        A connection object is thread safe, and is meant to be shared by the threads of a pool:
+        each thread sends its requests through its own HTTP session of the transport, while the
+        query result, branch head and configuration caches and the history store are guarded by locks.
+
         Parameters
         ----------
         key : str
@@ -82,31 +344,70 @@ class Dbhub:
             INI configuration file
         """
 
-        config = configparser.ConfigParser()
-        if config_data:
-            config.read_string(config_data)
-        elif config_file:
-            if os.path.exists(config_file) > 0:
-                try:
-                    with open(config_file) as f:
-                        config.read_file(f)
-                except IOError as e:
-                    raise ValueError(f"Failed to read config file: {config_file} Erreor: {e}")
-            else:
-                raise ValueError(f"INI configuration file: {config_file} doesn't exist")
-        else:
-            raise ValueError("No INI configuration specified")
-
-        if config.has_section('dbhub') is False:
-            raise configparser.NoSectionError('dbhub')
-        if config.has_option('dbhub', 'api_key') is False:
-            raise configparser.NoOptionError('api_key', 'dbhub')
-        if config.has_option('dbhub', 'db_owner') is False:
-            raise configparser.NoOptionError('db_owner', 'dbhub')
-        if config.has_option('dbhub', 'db_name') is False:
-            raise configparser.NoOptionError('db_name', 'dbhub')
-
-        self._connection = Connection(api_key=config['dbhub'].get('api_key'))
+        self.__setup(load_config(config_data, config_file))
+
+    def __setup(self, options: Dict[str, str], api_key: str = None, transport: httphub.Transport = None,
+                query_cache: LRUCache = None, heads: LRUCache = None, schemas: LRUCache = None, local_stores: bool = True,
+                account: str = ''):
+        self._connection = Connection(
+            api_key=options['api_key'] if api_key is None else api_key,
+            server=options.get('server', Connection.server).rstrip('/'),
+        )
+        self._db_owner = options['db_owner']
+        # The account of the API key, unknown for the clients of other API keys
+        self._account = options.get('account', '') if api_key is None else account
+        if transport is None and (_flag(options, 'adaptive_concurrency') or _flag(options, 'http2') or _flag(options, 'hedge')
+                                  or _seconds(options, 'timeout') is not None or _seconds(options, 'connect_timeout') is not None):
+            # Requests go through the shared default transport, unless they need a limiter, HTTP/2, hedging or timeouts
+            transport = _transport(options)
+        self._transport = transport
+        # Number of calls stopped by their deadline
+        self._expirations = 0
+        self._expirations_lock = threading.Lock()
+        # Results of queries, keyed by the API key and the commit they were computed against
+        if query_cache is None:
+            query_cache = LRUCache(maxsize=int(options.get('query_cache_size', 128)))
+        self._query_cache = query_cache
+        # Last known branch heads of each database, revalidated at most once per head_check_interval seconds
+        self._head_check_interval = float(options.get('head_check_interval', 10.0))
+        self._heads = LRUCache(maxsize=1024) if heads is None else heads
+        # sha256 of the database file of head commits, checked by the uploads skipping unchanged databases
+        self._file_hashes = LRUCache(maxsize=1024)
+        # Check queries locally against the schema of the database before sending them
+        self._preflight = _flag(options, 'preflight')
+        # Results of Prefetch(), served until they are prefetch_ttl seconds old, and reads in flight
+        self._prefetch_ttl = float(options.get('prefetch_ttl', 60.0))
+        self._prefetched = LRUCache(maxsize=int(options.get('prefetch_cache_size', 1024)))
+        self._flights = fanout.SingleFlight()
+        # Schema snapshots, keyed by the API key and the commit they were taken at
+        if schemas is None:
+            schemas = LRUCache(maxsize=int(options.get('schema_cache_size', 64)))
+        self._schemas = schemas
+        # Local copy of the commit history of databases, only parsing new commits.
+        # Without local_stores (clients of other API keys), neither it nor the HTTP cache file of the configuration is opened.
+        history_store = options.get('history_store', '') if local_stores else ''
+        self._history = None
+        if history_store:
+            from pydbhub.history import HistoryStore
+
+            self._history = HistoryStore(history_store)
+        # Local copy of the responses of Metadata(), Commits() and Download(), only transferred again when they changed
+        http_cache = options.get('http_cache', '') if local_stores else ''
+        self._http_cache = None
+        if http_cache:
+            from pydbhub.httpcache import HttpCache
+
+            self._http_cache = HttpCache(http_cache, max_size=int(float(options.get('http_cache_size_mb', 1024)) * 1024 * 1024))
+
+    @classmethod
+    def _shared(cls, options: Dict[str, str], api_key: str, transport: httphub.Transport, query_cache: LRUCache, heads: LRUCache,
+                schemas: LRUCache = None, account: str = '') -> 'Dbhub':
+        # Creates a client sharing its transport and caches with others, without parsing any configuration.
+        # Entries of shared caches are keyed by API key, so clients never see each other's data.
+        client = cls.__new__(cls)
+        client.__setup(options, api_key=api_key, transport=transport, query_cache=query_cache, heads=heads, schemas=schemas, local_stores=False,
+                       account=account)
+        return client
 
     def __prepareVals(self, dbOwner: str = None, dbName: str = None, ident: Identifier = None):
         data = {}
@@ -127,6 +428,100 @@ class Dbhub:
                 data['tag'] = (None, ident.tag)
         return data
 
+    def __branchHeads(self, db_owner: str, db_name: str) -> Tuple[Dict[str, str], str, str]:
+        # Returns the head commit of each branch and the default branch, checking the branches of the database
+        # at most once per head_check_interval seconds. A failed check is kept as long, so the calls in between
+        # don't each pay a failing request.
+        key = (self._connection.api_key, db_owner, db_name)
+        heads = self._heads.get(key)
+        if heads is None or time.monotonic() - heads[0] >= self._head_check_interval:
+            # Threads racing on the same database share one check
+            heads = self._flights.do(('heads',) + key, lambda: self.__checkHeads(key))
+        return heads[1], heads[2], heads[3]
+
+    def __checkHeads(self, key: Tuple[str, str, str]) -> Tuple:
+        now = time.monotonic()
+        heads = self._heads.get(key)
+        if heads is not None and now - heads[0] < self._head_check_interval:
+            # Checked by another thread in the meantime
+            return heads
+        branches, default_branch, err = self.Branches(key[1], key[2])
+        if branches is None:
+            heads = (now, None, None, err or "Failed to check the branches")
+        else:
+            heads = (now, {name: b.commit for name, b in branches.items()}, default_branch, None)
+        self._heads.put(key, heads)
+        return heads
+
+    def __headCommit(self, db_owner: str, db_name: str, branch: str = '') -> Tuple[str, str]:
+        # Returns the head commit of a branch, or of the default one
+        heads, default_branch, err = self.__branchHeads(db_owner, db_name)
+        if heads is None:
+            return None, err
+
+        commit = heads.get(branch or default_branch)
+        if commit is None:
+            return None, f"Unknown branch: {branch or default_branch}"
+        return commit, None
+
+    def _readKey(self, name: str, db_owner: str, db_name: str, ident: Identifier = None) -> Tuple:
+        return (self._connection.api_key, name, db_owner, db_name, astuple(ident) if ident is not None else None)
+
+    def _read(self, key: Tuple, fetch: Callable[[], Tuple], store: bool = False) -> Tuple:
+        # Runs a read of a _prefetchable method, storing its result when it is successful and store is set.
+        # Prefetched results and those of a shared flight go to many callers: each gets its own copy
+        entry = self._prefetched.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                return copy.deepcopy(entry[1])
+            self._prefetched.pop(key)
+        result = self._flights.do(key, fetch)
+        if store and result[0] is not None:
+            self._prefetched.put(key, (time.monotonic() + self._prefetch_ttl, result))
+        return copy.deepcopy(result)
+
+    def _fanout(self, func: Callable[[object], object], items: Iterable, max_workers: int) -> Iterator[Tuple[object, object]]:
+        # Runs the calls of a parallel method on the threads of the transport, which keep their connections open
+        # from one parallel method to the next (see fanout.as_completed)
+        transport = self._transport or httphub.default_transport()
+        return fanout.as_completed(func, items, max_workers, executor=transport.workers)
+
+    def __maxWorkers(self, max_workers: int, default: int) -> int:
+        # The number of threads of a parallel call: with an adaptive limiter, enough for the limiter to be the bound
+        if max_workers:
+            return max_workers
+        limiter = self._transport.limiter if self._transport is not None else None
+        return limiter.maximum if limiter is not None else default
+
+    def __accountDatabases(self) -> Tuple[List[Tuple[str, str]], str]:
+        # The (owner, name) of the databases listed by Databases(), which belong to the account of the API key:
+        # without the account option, their owner is unknown
+        if not self._account:
+            return None, "The account of the API key is unknown: set the account option, or give the databases"
+        names, err = self.Databases()
+        if err or names is None:
+            return None, err or "Failed to list the databases"
+        return [(self._account, name) for name in names], None
+
+    def __pinCommit(self, db_owner: str, db_name: str, ident: Identifier) -> Tuple[str, Identifier]:
+        # Returns the commit an identifier refers to, along with an identifier of that commit alone.
+        # The commit of a tag or release isn't known without a request: it is returned as None, with the identifier unchanged.
+        if ident is not None and ident.commit_id:
+            return ident.commit_id, ident
+        if ident is None or not (ident.tag or ident.release):
+            commit, _ = self.__headCommit(db_owner, db_name, ident.branch if ident else '')
+            if commit:
+                return commit, Identifier(commit_id=commit)
+        return None, ident
+
+    def __syncHistory(self, db_owner: str, db_name: str, res: Dict[str, Dict], heads: Dict[str, str]) -> List:
+        # Stores the commits of res which aren't in the history store yet, parsing only those,
+        # and returns all of them in the order of res
+        known = self._history.commits(db_owner, db_name)
+        new = {commit_id: _normalize_commit(res[commit_id]) for commit_id in res if commit_id not in known}
+        self._history.sync(db_owner, db_name, new, set(res), heads)
+        return [_stored_commit(new[commit_id] if commit_id in new else known[commit_id]) for commit_id in res]
+
     def Databases(self) -> Tuple[List[str], str]:
         """
         Returns the list of databases in the requesting users account.
@@ -142,7 +537,7 @@ class Dbhub:
         data = {
             'apikey': (None, self._connection.api_key),
         }
-        return httphub.send_request_json(self._connection.server + "/v1/databases", data)
+        return httphub.send_request_json(self._connection.server + "/v1/databases", data, transport=self._transport)
 
     def Columns(self, db_owner: str, db_name: str, table: str, ident: Identifier = None) -> Tuple[List[Dict], str]:
         """
@@ -170,9 +565,10 @@ class Dbhub:
         data = self.__prepareVals(db_owner, db_name, ident)
         data['table'] = table
 
-        res, err = httphub.send_request_json(self._connection.server + "/v1/columns", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/columns", data, transport=self._transport)
         if err:
-            return None, res
+            # The error returned by the server, or the one of the request when there is none
+            return None, res if res is not None else err
 
         for i, val in enumerate(res):
             res[i] = _DbhubDictToObject(val)
@@ -195,9 +591,9 @@ class Dbhub:
             a string describe error if occurs
         """
         data = self.__prepareVals(dbName=db_name)
-        res, err = httphub.send_request_json(self._connection.server + "/v1/delete", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/delete", data, transport=self._transport)
         if err:
-            return res
+            return res if res is not None else err
 
         return ''
 
@@ -222,9 +618,11 @@ class Dbhub:
                 - a string describe error if occurs
         """
         data = self.__prepareVals(dbOwner=db_owner, dbName=db_name)
-        res, err = httphub.send_request_json(self._connection.server + "/v1/branches", data)
+        # Branches are checked often, and rarely change: with validators from the server, they're only transferred on change
+        res, err = httphub.send_request_json(self._connection.server + "/v1/branches", data, transport=self._transport,
+                                             cache=self._http_cache)
         if err:
-            return None, None, res
+            return None, None, res if res is not None else err
 
         branches = {}
         for branche_name in res["branches"]:
@@ -237,6 +635,12 @@ class Dbhub:
         Returns the details of all commits for a database
         Ref: https://api.dbhub.io/#commits
 
+        With a history store (history_store option), the commits are kept in a local SQLite file.
+        While the branch heads are the ones of the last synchronization, the history is answered
+        locally, otherwise only the commits not stored yet are parsed and added to it.
+        With the http_cache option, the commits are only transferred again when the server says they changed,
+        or, when it gives no validator, when the branch heads moved.
+
         Parameters
         ----------
         db_owner : str
@@ -251,22 +655,67 @@ class Dbhub:
                 - a dictionnary containing the details of all commits in the database
                 - a string describe error if occurs
         """
+        query_url = self._connection.server + "/v1/commits"
         data = self.__prepareVals(dbOwner=db_owner, dbName=db_name)
-        res, err = httphub.send_request_json(self._connection.server + "/v1/commits", data)
+        heads = None
+        if self._history is not None:
+            heads, _, _ = self.__branchHeads(db_owner, db_name)
+        elif self._http_cache is not None and not self._http_cache.validated(self._http_cache.key(query_url, data)):
+            # Without validators from the server, the stored commits are current while the branch heads don't move
+            heads, _, _ = self.__branchHeads(db_owner, db_name)
+        if self._history is not None and heads and heads == self._history.heads(db_owner, db_name):
+            return [_stored_commit(commit) for commit in self._history.commits(db_owner, db_name).values()], None
+
+        # The commits only change along with the branch heads
+        commit_id = ' '.join(f'{branch}:{heads[branch]}' for branch in sorted(heads)) if heads else None
+        res, err = httphub.send_request_json(query_url, data, transport=self._transport, cache=self._http_cache, commit_id=commit_id)
         if err:
-            return None, res
+            return None, res if res is not None else err
+
+        if heads and self._history is not None:
+            return self.__syncHistory(db_owner, db_name, res, heads), None
 
         commits = [_DbhubDictToObject(res[i]) for i in res]
         for commit in commits:
-            commit.timestamp = p.parse(commit.timestamp)
+            commit.timestamp = _parse_date(commit.timestamp)
             for entry in commit.tree.entries:
-                entry.last_modified = p.parse(entry.last_modified)
+                entry.last_modified = _parse_date(entry.last_modified)
 
         return commits, None
 
+    def History(self, db_owner: str, db_name: str) -> Tuple[CommitGraph, str]:
+        """
+        Returns the commits of a database indexed as a graph, for ancestry queries
+        (is_ancestor, merge_base, range, ...).
+
+        Parameters
+        ----------
+        db_owner : str
+            The owner of the database
+        db_name : str
+            The name of the database
+
+        Returns
+        -------
+        Tuple[CommitGraph, str]
+            The returned data is
+                - the commit graph of the database
+                - a string describe error if occurs
+        """
+        commits, err = self.Commits(db_owner, db_name)
+        if commits is None:
+            return None, err
+
+        try:
+            return CommitGraph(commits), None
+        except ValueError as e:
+            return None, str(e)
+
     def Diff(self, db_owner_a: str, db_name_a: str, ident_a: Identifier, db_owner_b: str, db_name_b: str, ident_b: Identifier, merge: Literal) -> Tuple[Dict, str]:
         """
         Generates a diff between two databases or two versions of a database
+        The result can be turned into a structured changeset, and applied to a local database,
+        with pydbhub.diff.Changeset.parse()
 
         Parameters
         ----------
@@ -328,9 +777,9 @@ class Dbhub:
             data['merge'] = 'none'
 
         # Fetch the diffs
-        res, err = httphub.send_request_json(self._connection.server + "/v1/diff", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/diff", data, transport=self._transport)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         return _DbhubDictToObject(res), None
 
@@ -352,11 +801,49 @@ class Dbhub:
             The returned data is
                 - database file as a list of bytes
                 - a string describe error if occurs
+
+        With the http_cache option, a file already downloaded is served from the cache while the head commit of
+        the default branch (checked at most once per head_check_interval seconds) stays the same, and is only
+        transferred again when the server says it changed otherwise. Large files are kept as files next to the
+        cache (see pydbhub.httpcache), but are still returned whole: use DownloadTo() for databases which don't fit in memory.
         """
         data = self.__prepareVals(db_owner, db_name)
-        return httphub.send_request(self._connection.server + "/v1/download", data)
+        commit_id = None
+        if self._http_cache is not None:
+            # The file of the head commit of the default branch
+            commit_id, _ = self.__headCommit(db_owner, db_name)
+        return httphub.send_request(self._connection.server + "/v1/download", data, transport=self._transport,
+                                    cache=self._http_cache, commit_id=commit_id)
+
+    def DownloadTo(self, db_owner: str, db_name: str, fileobj: io.BufferedWriter, ident: Identifier = None) -> Tuple[int, str]:
+        """
+        Writes the requested SQLite database file to a file object, chunk by chunk as it is received,
+        so large databases are never held in memory.
+        Ref: https://api.dbhub.io/#download
+
+        Parameters
+        ----------
+        db_owner : str
+            The owner of the database
+        db_name : str
+            The name of the database
+        fileobj : io.BufferedWriter
+            Where the database file is written
+        ident : Identifier
+            Information used to identify a specific commit, tag, release, or the head of a specific branch
 
-    def Indexes(self, db_owner: str, db_name: str) -> Tuple[List[Dict], str]:
+        Returns
+        -------
+        Tuple[int, str]
+            The returned data is
+                - the size of the database file
+                - a string describe error if occurs
+        """
+        data = self.__prepareVals(db_owner, db_name, ident)
+        return httphub.send_download(self._connection.server + "/v1/download", data, fileobj, transport=self._transport)
+
+    @_prefetchable
+    def Indexes(self, db_owner: str, db_name: str, ident: Identifier = None) -> Tuple[List[Dict], str]:
         """
         Returns the details of all indexes in a SQLite database
         Ref: https://api.dbhub.io/#indexes
@@ -367,6 +854,8 @@ class Dbhub:
             The owner of the database
         db_name : str
             The name of the database
+        ident : Identifier
+            Information used to identify a specific commit, tag, release, or the head of a specific branch
 
         Returns
         -------
@@ -375,20 +864,23 @@ class Dbhub:
                 - a dicrionnary containing the details of all indexes in the database
                 - a string describe error if occurs
         """
-        data = self.__prepareVals(db_owner, db_name)
-        res, err = httphub.send_request_json(self._connection.server + "/v1/indexes", data)
+        data = self.__prepareVals(db_owner, db_name, ident)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/indexes", data, transport=self._transport)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         indexes = [_DbhubDictToObject(index) for index in res]
 
         return indexes, None
 
+    @_prefetchable
     def Metadata(self, db_owner: str, db_name: str) -> Tuple[List[Dict], str]:
         """
         Returns the commit, branch, release, tag and web page information for a database
         Ref: https://api.dbhub.io/#metadata
 
+        With a history store (history_store option), only the commits not stored yet are parsed.
+
         Parameters
         ----------
         db_owner : str
@@ -404,9 +896,11 @@ class Dbhub:
                 - a string describe error if occurs
         """
         data = self.__prepareVals(db_owner, db_name)
-        res, err = httphub.send_request_json(self._connection.server + "/v1/metadata", data)
+        # Tags, releases and the other details of the metadata change without any new commit: only validators tell
+        res, err = httphub.send_request_json(self._connection.server + "/v1/metadata", data, transport=self._transport,
+                                             cache=self._http_cache)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         metadata = _DbhubDictToObject(res)
 
@@ -422,18 +916,293 @@ class Dbhub:
         for tag in res["tags"]:
             metadata.tags.update({tag: _DbhubDictToObject(res['tags'][tag])})
 
+        if self._history is not None:
+            heads = {branche: res['branches'][branche]['commit'] for branche in res['branches']}
+            metadata.commits = self.__syncHistory(db_owner, db_name, res['commits'], heads)
+            return metadata, None
+
+        # The timestamps are parsed like those of Commits() and of the history store
         commits = [_DbhubDictToObject(res['commits'][i]) for i in res['commits']]
         for commit in commits:
-            commit.timestamp = p.parse(commit.timestamp)
+            commit.timestamp = _parse_date(commit.timestamp)
+            for entry in commit.tree.entries:
+                entry.last_modified = _parse_date(entry.last_modified)
         metadata.commits = commits
 
         return metadata, None
 
-    def Query(self, db_owner: str, db_name: str, sql: str) -> Tuple[List, str]:
+    def Deadline(self, seconds: float) -> ContextManager[deadline.Deadline]:
+        """
+        Sets a deadline on the calls made in a with block by the current thread, including their retries and
+        the parallel requests of QueryMany(), QueryAsCompleted(), Schema(), UploadMany() or Prefetch().
+        Each request gets the time left as its connect and read timeouts (bounded by the connect_timeout and
+        timeout options), no request starts once the deadline is reached, and calls stopped by the deadline
+        return the error "Deadline exceeded".
+
+            with connection.Deadline(2.5):
+                rows, err = connection.Query(db_owner, db_name, sql)
+
+        Parameters
+        ----------
+        seconds : float
+            The time left for the calls, from now. A deadline nested in another one can't end after it.
+
+        Returns
+        -------
+        ContextManager[deadline.Deadline]
+            The context manager setting the deadline
+        """
+        return deadline.scope(seconds, on_expire=self.__countExpiration)
+
+    def __countExpiration(self, expired: deadline.Deadline):
+        with self._expirations_lock:
+            self._expirations += 1
+
+    def Metrics(self) -> Dict[str, float]:
+        """
+        Returns the metrics of the client, computed locally without any request.
+
+        Returns
+        -------
+        Dict[str, float]
+            The metrics, by name:
+                - deadline_expirations: the number of deadlines which stopped a call (see Deadline())
+                - request_timeouts: the number of requests stopped by a timeout, by the transport of the client
+            With adaptive concurrency:
+                - concurrency_limit: the number of requests the limiter currently lets in flight
+                - inflight: the number of requests in flight
+                - queued: the number of requests waiting for the limiter
+                - limit_decreases: the number of times the limit was cut on overload
+            With hedged reads:
+                - hedged_requests: the number of duplicate requests sent
+                - hedge_wins: the number of duplicate requests which answered first
+                - hedge_ratio: the number of duplicate requests by request which could be hedged
+            With an HTTP cache:
+                - http_cache_hits: the number of responses served from the cache because they belong to the same commit
+                - http_cache_not_modified: the number of responses served from the cache after a 304 answer
+                - http_cache_misses: the number of requests which had no response in the cache
+        """
+        transport = self._transport or httphub.default_transport()
+        with self._expirations_lock:
+            metrics = {'deadline_expirations': self._expirations}
+        metrics['request_timeouts'] = transport.timed_out
+        if transport.limiter is not None:
+            metrics.update(transport.limiter.metrics())
+        if transport.hedger is not None:
+            metrics.update(transport.hedger.metrics())
+        if self._http_cache is not None:
+            metrics.update(self._http_cache.metrics())
+        return metrics
+
+    def Prefetch(self, databases: Iterable = None, endpoints: Iterable[str] = ('metadata', 'tables', 'webpage'),
+                 max_workers: int = None) -> Tuple[PrefetchJob, str]:
+        """
+        Warms the client in the background with the metadata, tables, views, indexes or web page of databases.
+        The method returns at once. Later calls to Metadata(), Tables(), Views(), Indexes() or Webpage() on the
+        same databases are answered from memory for prefetch_ttl seconds, or wait for the prefetch request
+        when it is still in flight instead of sending their own.
+
+        Parameters
+        ----------
+        databases : Iterable
+            The databases to prefetch, as (owner, name) or as names of databases of the owner of the configuration.
+            By default, the databases of the requesting users account (see Databases()), which needs the account option.
+        endpoints : Iterable[str]
+            What to prefetch of each database, among "metadata", "tables", "views", "indexes" and "webpage"
+        max_workers : int
+            The maximum number of requests running at the same time. Defaults to 4, or to the max_concurrency
+            option when adaptive concurrency leaves it to the limiter of the transport
+
+        Returns
+        -------
+        Tuple[PrefetchJob, str]
+            The returned data is
+                - the job, to wait for the prefetch or to check its errors
+                - a string describe error if occurs
+        """
+        methods = {'indexes': 'Indexes', 'metadata': 'Metadata', 'tables': 'Tables', 'views': 'Views', 'webpage': 'Webpage'}
+        endpoints = list(endpoints)
+        unknown = [e for e in endpoints if e not in methods]
+        if unknown:
+            return None, f"Can't prefetch {', '.join(unknown)}"
+        if databases is not None:
+            databases = [(self._db_owner, db) if isinstance(db, str) else tuple(db) for db in databases]
+        elif not self._account:
+            return self.__accountDatabases()
+
+        job = PrefetchJob()
+
+        def fetch(item):
+            db_owner, db_name, endpoint = item
+            method = getattr(Dbhub, methods[endpoint]).__wrapped__
+            key = self._readKey(method.__name__, db_owner, db_name)
+            try:
+                return self._read(key, lambda: method(self, db_owner, db_name), store=True)
+            except Exception as e:
+                return None, str(e)
+
+        def run():
+            try:
+                targets = databases
+                if targets is None:
+                    targets, err = self.__accountDatabases()
+                    if err:
+                        job.errors[None] = err
+                        return
+                items = ((db_owner, db_name, endpoint) for db_owner, db_name in targets for endpoint in endpoints)
+                for item, result in self._fanout(fetch, items, self.__maxWorkers(max_workers, 4)):
+                    if result[0] is None:
+                        job.errors[item] = result[-1] or f"Failed to prefetch the {item[2]} of {item[0]}/{item[1]}"
+                    else:
+                        job.fetched += 1
+            finally:
+                job._done.set()
+
+        # The prefetch runs under the deadline of the caller, if any
+        threading.Thread(target=deadline.propagate(run), name='pydbhub-prefetch', daemon=True).start()
+        return job, None
+
+    def Mirror(self, root: str, databases: Iterable = None, max_workers: int = None,
+               progress: Callable[['MirrorReport'], None] = None) -> Tuple['MirrorReport', str]:
+        """
+        Mirrors the database files of all the commits of databases into a local content-addressed store, for backups.
+        Files are stored once by sha256, and only the ones not stored yet are downloaded, streamed to disk:
+        a database whose branch heads didn't move since its last mirror costs one small request.
+        An interrupted mirror resumes where it stopped (see pydbhub.mirror.mirror).
+
+        Parameters
+        ----------
+        root : str
+            The directory of the store
+        databases : Iterable
+            The databases to mirror, as (owner, name) or as names of databases of the owner of the configuration.
+            By default, the databases of the requesting users account (see Databases()), which needs the account option.
+        max_workers : int
+            The maximum number of requests running at the same time. Defaults to 4, or to the max_concurrency
+            option when adaptive concurrency leaves it to the limiter of the transport
+        progress : Callable[[MirrorReport], None]
+            Called after each file downloaded, with the report so far
+
+        Returns
+        -------
+        Tuple[MirrorReport, str]
+            The returned data is
+                - the numbers of databases, commits and files, and the files downloaded
+                - a string describe error if a database or file failed
+        """
+        from pydbhub.mirror import mirror
+
+        if databases is None:
+            databases, err = self.__accountDatabases()
+            if err:
+                return None, err
+        databases = [(self._db_owner, db) if isinstance(db, str) else tuple(db) for db in databases]
+        report = mirror(self, root, databases, max_workers=self.__maxWorkers(max_workers, 4), progress=progress)
+        if report.errors:
+            return report, f"{len(report.errors)} databases or files failed to mirror"
+        return report, None
+
+    def Watch(self, callback: Callable[[Tuple[str, str], str, str, str], None], databases: Iterable = None,
+              min_interval: float = 10.0, max_interval: float = 600.0, requests_per_second: float = 5.0,
+              max_workers: int = None) -> Tuple['Watcher', str]:
+        """
+        Watches the branch heads of databases in the background, calling back on each new commit, new branch or
+        deleted branch. The method returns at once, the watcher running until its stop() method is called.
+        Databases which change are checked every min_interval seconds, the others less and less often, up to every
+        max_interval seconds, so the requests sent mostly depend on the number of changes (see pydbhub.watch.Watcher).
+
+        Parameters
+        ----------
+        callback : Callable[[Tuple[str, str], str, str, str], None]
+            Called from the thread of the watcher with the (owner, name) of the database, the branch, its old head
+            and its new head. The old head is None for a new branch, the new head is None for a deleted branch.
+        databases : Iterable
+            The databases to watch, as (owner, name) or as names of databases of the owner of the configuration.
+            By default, the databases of the requesting users account (see Databases()), which needs the account option.
+        min_interval : float
+            The delay in seconds between two checks of a database which just changed
+        max_interval : float
+            The longest delay in seconds between two checks of a database
+        requests_per_second : float
+            The most requests sent by second on average, for all the databases
+        max_workers : int
+            The maximum number of checks running at the same time. Defaults to 8, or to the max_concurrency
+            option when adaptive concurrency leaves it to the limiter of the transport
+
+        Returns
+        -------
+        Tuple[Watcher, str]
+            The returned data is
+                - the running watcher
+                - a string describe error if occurs
+        """
+        from pydbhub.watch import Watcher
+
+        if databases is None:
+            databases, err = self.__accountDatabases()
+            if err:
+                return None, err
+        databases = [(self._db_owner, db) if isinstance(db, str) else tuple(db) for db in databases]
+        watcher = Watcher(self, databases, callback, min_interval=min_interval, max_interval=max_interval,
+                          requests_per_second=requests_per_second, max_workers=self.__maxWorkers(max_workers, 8))
+        return watcher.start(), None
+
+    def __runQuery(self, db_owner: str, db_name: str, sql: str, params: sqlparams.Params, ident: Identifier,
+                   kind: str, build: Callable[[List], object], preflight: bool = None) -> Tuple[object, str]:
+        # Runs a query and turns the response into a result with build(), caching the results of each kind
+        # by the commit they were computed against
+        try:
+            statement = sqlparams.encode(sql, params)
+        except (ValueError, TypeError) as e:
+            return None, str(e)
+        preflight = self._preflight if preflight is None else preflight
+
+        cache_key = None
+        commit = None
+        key = sqlparams.params_key(params) if self._query_cache.maxsize > 0 else None
+        if key is not None or preflight:
+            # Pin the query on the commit, so the result matches its cache key and the schema it is checked against
+            commit, ident = self.__pinCommit(db_owner, db_name, ident)
+        if commit and key is not None:
+            cache_key = (self._connection.api_key, db_owner, db_name, commit, sql, key, kind)
+            result = self._query_cache.get(cache_key)
+            if result is not None:
+                return result, None
+
+        if preflight and commit:
+            # A schema which can't be fetched doesn't prevent the query: the server has the last word.
+            # Without a commit (tag or release), there is no snapshot to check against.
+            schema, _ = self.__schema(db_owner, db_name, ident)
+            if schema is not None:
+                err = schema.check(sqlparams.prepare(sql).bind(params))
+                if err:
+                    return None, err
+
+        data = self.__prepareVals(db_owner, db_name, ident)
+        data['sql'] = statement
+        res, err = httphub.send_request_json(self._connection.server + "/v1/query", data, transport=self._transport)
+        if err:
+            return None, res if res is not None else err
+
+        result = build(res)
+        if cache_key is not None:
+            self._query_cache.put(cache_key, result)
+
+        return result, None
+
+    def Query(self, db_owner: str, db_name: str, sql: str, params: sqlparams.Params = None, ident: Identifier = None,
+              pool_blobs: bool = False, preflight: bool = None, compact: bool = False) -> Tuple[List, str]:
         """
         Run a SQLite query (SELECT only) on the chosen database, returning the results.
         Ref: https://api.dbhub.io/#query
 
+        Parameters are bound client side: each placeholder ("?", "?NNN", ":name", "@name" or "$name")
+        is replaced by the quoted SQL literal of its value before the statement is sent.
+        Results are cached by the commit they were computed against. A query on a branch head
+        first checks the head commit of the branch, at most once per head_check_interval seconds,
+        so repeated executions of the same template with the same parameters are answered locally
+        while the branch doesn't move.
+
         Parameters
         ----------
         db_owner : str
@@ -442,6 +1211,24 @@ class Dbhub:
             The name of the database
         sql : str
             The SQLite query (SELECT only)
+        params : Sequence or Dict
+            The values bound to the placeholders of the query, a sequence for positional placeholders
+            or a dictionnary for named ones
+        ident : Identifier
+            Information used to identify a specific commit, tag, release, or the head of a specific branch
+        pool_blobs : bool
+            Decode the BLOB values of each column into one shared buffer, returning them as read-only
+            memoryview slices instead of bytes objects. This skips the ASCII copy of each value and keeps
+            large BLOBs in one allocation by column (see benchmarks/blob_decoding.py).
+        preflight : bool
+            Check the query locally before sending it, against an empty in-memory database built from the
+            schema of the database (see Schema()), so invalid SQL, unknown tables or columns and statements
+            other than SELECT are rejected without a round trip. Defaults to the preflight option of the configuration.
+            Queries on a tag or a release aren't checked: their commit isn't known without more requests.
+        compact : bool
+            Return the rows as a Rows object: one header of column names, and a tuple of values by row, which takes
+            several times less memory than a dictionnary by row (see benchmarks/compact_rows.py). Its rows are
+            read-only dictionnary views (Row), built on access, so code reading dictionnaries keeps working.
 
         Returns
         -------
@@ -453,28 +1240,164 @@ class Dbhub:
                     - The value of the field
                 - a string describe error if occurs
         """
-        data = self.__prepareVals(db_owner, db_name)
-        data['sql'] = base64.b64encode(sql.encode('ascii'))
-        res, err = httphub.send_request_json(self._connection.server + "/v1/query", data)
-        if err:
-            return None, res
-
-        rows = []
-        for result_row in res:
-            one_row = {}
-            for data in result_row:
-                result = {
-                    0: lambda v: base64.b64decode(v.encode('ascii')) if isinstance(v, str) else None,   # Binary
-                    1: lambda v: "",                                                                    # Image - just output as an empty string (for now)
-                    2: lambda v: None,                                                                  # Null
-                    3: lambda v: str(v) if isinstance(v, str) else "",                                  # Text
-                    4: lambda v: int(v),                                                                # Integer
-                    5: lambda v: float(v)                                                               # Float
-                }[data['Type']](data['Value'])
-                one_row.update({data['Name']: result})
-            rows.append(one_row)
-
-        return rows, None
+        if compact:
+            # Rows are immutable, so the cached result itself is returned
+            kind, build = ('pooled_compact_rows', functools.partial(_build_compact, pool_blobs=True)) if pool_blobs else ('compact_rows', _build_compact)
+            return self.__runQuery(db_owner, db_name, sql, params, ident, kind, build, preflight)
+        if pool_blobs:
+            rows, err = self.__runQuery(db_owner, db_name, sql, params, ident, 'pooled_rows', functools.partial(_build_rows, pool_blobs=True), preflight)
+        else:
+            rows, err = self.__runQuery(db_owner, db_name, sql, params, ident, 'rows', _build_rows, preflight)
+        if rows is None:
+            return None, err
+
+        # The cached rows are copied, so callers can change their results
+        return [dict(row) for row in rows], None
+
+    def QueryArrays(self, db_owner: str, db_name: str, sql: str, params: sqlparams.Params = None, ident: Identifier = None,
+                    preflight: bool = None) -> Tuple[Dict, str]:
+        """
+        Run a SQLite query (SELECT only) on the chosen database, returning the results as NumPy arrays, one by column.
+        The arrays are built directly from the response, without building rows first: integer columns are int64
+        arrays, float columns (or columns mixing integers and floats) float64 arrays, other columns object arrays.
+        Null values are masked. Requires numpy.
+
+        Parameters
+        ----------
+        db_owner : str
+            The owner of the database
+        db_name : str
+            The name of the database
+        sql : str
+            The SQLite query (SELECT only)
+        params : Sequence or Dict
+            The values bound to the placeholders of the query, see Query()
+        ident : Identifier
+            Information used to identify a specific commit, tag, release, or the head of a specific branch
+        preflight : bool
+            Check the query locally before sending it, see Query()
+
+        Returns
+        -------
+        Tuple[Dict[str, numpy.ma.MaskedArray], str]
+            The returned data is
+                - the values of each column, keyed by column name
+                - a string describe error if occurs
+        """
+        import pydbhub.columnar as columnar
+
+        arrays, err = self.__runQuery(db_owner, db_name, sql, params, ident, 'arrays', columnar.to_arrays, preflight)
+        if arrays is None:
+            return None, err
+
+        return {name: array.copy() for name, array in arrays.items()}, None
+
+    def QueryDataFrame(self, db_owner: str, db_name: str, sql: str, params: sqlparams.Params = None, ident: Identifier = None,
+                       preflight: bool = None) -> Tuple[object, str]:
+        """
+        Run a SQLite query (SELECT only) on the chosen database, returning the results as a pandas DataFrame.
+        The columns are built directly from the response, as in QueryArrays(): integer and float columns use
+        the nullable Int64 and Float64 dtypes, so Null values are missing values. Requires pandas.
+
+        Parameters
+        ----------
+        db_owner : str
+            The owner of the database
+        db_name : str
+            The name of the database
+        sql : str
+            The SQLite query (SELECT only)
+        params : Sequence or Dict
+            The values bound to the placeholders of the query, see Query()
+        ident : Identifier
+            Information used to identify a specific commit, tag, release, or the head of a specific branch
+        preflight : bool
+            Check the query locally before sending it, see Query()
+
+        Returns
+        -------
+        Tuple[pandas.DataFrame, str]
+            The returned data is
+                - the result of the query
+                - a string describe error if occurs
+        """
+        import pydbhub.columnar as columnar
+
+        frame, err = self.__runQuery(db_owner, db_name, sql, params, ident, 'dataframe', columnar.to_dataframe, preflight)
+        if frame is None:
+            return None, err
+
+        return frame.copy(), None
+
+    def QueryAsCompleted(self, targets: Iterable[Tuple[str, str]], sql: str, params: sqlparams.Params = None, max_workers: int = None) -> Iterator[Tuple[Tuple[str, str], List, str]]:
+        """
+        Run the same SQLite query (SELECT only) on several databases concurrently,
+        yielding the result of each database as soon as it is available.
+
+        Parameters
+        ----------
+        targets : Iterable[Tuple[str, str]]
+            The (owner, name) of each database to query
+        sql : str
+            The SQLite query (SELECT only)
+        params : Sequence or Dict
+            The values bound to the placeholders of the query
+        max_workers : int
+            The maximum number of queries running at the same time. Defaults to 8, or to the
+            max_concurrency option when adaptive concurrency leaves it to the limiter of the transport
+
+        Returns
+        -------
+        Iterator[Tuple[Tuple[str, str], List, str]]
+            For each database, in completion order
+                - the (owner, name) of the database
+                - the rows returned by the query, as returned by Query()
+                - a string describe error if occurs
+        """
+        def query(target):
+            try:
+                rows, err = self.Query(target[0], target[1], sql, params)
+            except Exception as e:
+                return None, str(e)
+            if rows is None and not err:
+                err = f"Query failed on {target[0]}/{target[1]}"
+            return rows, err
+
+        for target, (rows, err) in self._fanout(query, targets, self.__maxWorkers(max_workers, 8)):
+            yield tuple(target), rows, err
+
+    def QueryMany(self, targets: Iterable[Tuple[str, str]], sql: str, params: sqlparams.Params = None, max_workers: int = None) -> Tuple[Dict[Tuple[str, str], List], Dict[Tuple[str, str], str]]:
+        """
+        Run the same SQLite query (SELECT only) on several databases concurrently.
+        The results can be merged into a single list of rows with fanout.merge_results().
+
+        Parameters
+        ----------
+        targets : Iterable[Tuple[str, str]]
+            The (owner, name) of each database to query
+        sql : str
+            The SQLite query (SELECT only)
+        params : Sequence or Dict
+            The values bound to the placeholders of the query
+        max_workers : int
+            The maximum number of queries running at the same time. Defaults to 8, or to the
+            max_concurrency option when adaptive concurrency leaves it to the limiter of the transport
+
+        Returns
+        -------
+        Tuple[Dict, Dict]
+            The returned data is
+                - a dictionnary of the rows returned by each database, keyed by (owner, name)
+                - a dictionnary of the error of each database which failed, keyed by (owner, name)
+        """
+        results = {}
+        errors = {}
+        for target, rows, err in self.QueryAsCompleted(targets, sql, params, max_workers):
+            if err:
+                errors[target] = err
+            else:
+                results[target] = rows
+        return results, errors
 
     def Releases(self, db_owner: str, db_name: str) -> Tuple[List[Dict], str]:
         """
@@ -498,17 +1421,90 @@ class Dbhub:
         # Prepare the API parameters
         data = self.__prepareVals(db_owner, db_name)
         # Fetch the releases
-        res, err = httphub.send_request_json(self._connection.server + "/v1/releases", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/releases", data, transport=self._transport)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         releases = {index: _DbhubDictToObject(res[index]) for index in res}
         for release in releases:
-            releases[release].date = p.parse(releases[release].date)
+            releases[release].date = _parse_date(releases[release].date)
 
         return releases, None
 
-    def Tables(self, db_owner: str, db_name: str) -> Tuple[List[str], str]:
+    def Schema(self, db_owner: str, db_name: str, ident: Identifier = None, max_workers: int = None) -> Tuple[Schema, str]:
+        """
+        Returns the schema of a database: its tables and views with their columns, and its indexes.
+        The lists of tables, views and indexes are fetched concurrently, then the columns of every table
+        and view, so a snapshot takes about two round trips whatever the number of tables.
+        Snapshots are cached by commit: introspecting the same commit again is answered locally,
+        with a copy of the cached snapshot, so callers can change what they are given.
+
+        Parameters
+        ----------
+        db_owner : str
+            The owner of the database
+        db_name : str
+            The name of the database
+        ident : Identifier
+            Information used to identify a specific commit, tag, release, or the head of a specific branch
+        max_workers : int
+            The maximum number of requests running at the same time. Defaults to 8, or to the
+            max_concurrency option when adaptive concurrency leaves it to the limiter of the transport
+
+        Returns
+        -------
+        Tuple[Schema, str]
+            The returned data is
+                - the schema of the database, at the commit it was taken at
+                - a string describe error if occurs
+        """
+        schema, err = self.__schema(db_owner, db_name, ident, max_workers)
+        return schema.copy() if schema is not None else None, err
+
+    def __schema(self, db_owner: str, db_name: str, ident: Identifier = None, max_workers: int = None) -> Tuple[Schema, str]:
+        # The snapshot of Schema(), the cached one itself when there is one
+        commit, ident = self.__pinCommit(db_owner, db_name, ident)
+        cache_key = (self._connection.api_key, db_owner, db_name, commit)
+        if commit:
+            schema = self._schemas.get(cache_key)
+            if schema is not None:
+                return schema, None
+
+        lists = {
+            'tables': self.Tables,
+            'views': self.Views,
+            'indexes': self.Indexes,
+        }
+
+        def fetch_list(kind):
+            return lists[kind](db_owner, db_name, ident)
+
+        def fetch_columns(item):
+            return self.Columns(db_owner, db_name, item[1], ident)
+
+        found = {}
+        for kind, (res, err) in self._fanout(fetch_list, lists, self.__maxWorkers(max_workers, 8)):
+            if res is None:
+                return None, err or f"Failed to list the {kind} of {db_owner}/{db_name}"
+            found[kind] = res
+
+        schema = Schema(commit=commit or '', indexes=found['indexes'])
+        items = [('tables', name) for name in found['tables']] + [('views', name) for name in found['views']]
+        columns = {}
+        for item, (res, err) in self._fanout(fetch_columns, items, self.__maxWorkers(max_workers, 8)):
+            if res is None:
+                return None, err or f"Failed to get the columns of {item[1]}"
+            columns[item] = res
+        # Tables and views are kept in the order the API listed them
+        for kind, name in items:
+            getattr(schema, kind)[name] = columns[(kind, name)]
+
+        if commit:
+            self._schemas.put(cache_key, schema)
+        return schema, None
+
+    @_prefetchable
+    def Tables(self, db_owner: str, db_name: str, ident: Identifier = None) -> Tuple[List[str], str]:
         """
         Returns the list of tables in a SQLite database
         Ref: https://api.dbhub.io/#tables
@@ -519,6 +1515,8 @@ class Dbhub:
             The owner of the database
         db_name : str
             The name of the database
+        ident : Identifier
+            Information used to identify a specific commit, tag, release, or the head of a specific branch
 
         Returns
         -------
@@ -528,11 +1526,11 @@ class Dbhub:
                 - a string describe error if occurs
         """
         # Prepare the API parameters
-        data = self.__prepareVals(db_owner, db_name)
+        data = self.__prepareVals(db_owner, db_name, ident)
         # Fetch the list of tables
-        res, err = httphub.send_request_json(self._connection.server + "/v1/tables", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/tables", data, transport=self._transport)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         return res, None
 
@@ -558,21 +1556,51 @@ class Dbhub:
         # Prepare the API parameters
         data = self.__prepareVals(db_owner, db_name)
         # Fetch the releases
-        res, err = httphub.send_request_json(self._connection.server + "/v1/tags", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/tags", data, transport=self._transport)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         tags = {index: _DbhubDictToObject(res[index]) for index in res}
         for tag in tags:
-            tags[tag].date = p.parse(tags[tag].date)
+            tags[tag].date = _parse_date(tags[tag].date)
 
         return tags, None
 
-    def Upload(self, db_name: str, info: UploadInformation, db_bytes: io.BufferedReader) -> Tuple[Dict, str]:
+    def __unchangedHead(self, db_owner: str, db_name: str, branch: str, sha256: str) -> str:
+        # Returns the head commit of the branch if its database file has the given sha256, None otherwise.
+        # The API has no request for the tree of one commit, so the sha256 of the file of each head is kept:
+        # the commits are only listed for a head which wasn't seen, nor uploaded, by this client.
+        branches, default_branch, err = self.Branches(db_owner, db_name)
+        if err or not branches:
+            return None
+        head = branches.get(branch or default_branch)
+        if head is None:
+            return None
+        key = (self._connection.api_key, db_owner, db_name, head.commit)
+        head_sha256 = self._file_hashes.get(key)
+        if head_sha256 is None:
+            commits, err = self.Commits(db_owner, db_name)
+            if err or not commits:
+                return None
+            for commit in commits:
+                if commit.id == head.commit:
+                    head_sha256 = next((entry.sha256 for entry in commit.tree.entries if entry.name == db_name), None)
+                    break
+            if head_sha256 is None:
+                return None
+            self._file_hashes.put(key, head_sha256)
+        return head.commit if head_sha256 == sha256 else None
+
+    def Upload(self, db_name: str, info: UploadInformation, db_bytes: io.BufferedReader, skip_unchanged: bool = False) -> Tuple[Dict, str]:
         """
         Creates a new database in your account, or adds a new commit to an existing database
         Ref: https://api.dbhub.io/#upload
 
+        With skip_unchanged, the database file is hashed and compared with the one of the head commit
+        of the target branch first. When they match nothing is uploaded, and the returned dictionnary
+        holds the head commit ID along with "skipped": True. The check needs the name of the account
+        of the API key (account option): without it, the database is always uploaded.
+
         Parameters
         ----------
         db_name : str
@@ -581,6 +1609,8 @@ class Dbhub:
             Upload parameters
         db_bytes : io.BufferedReader
             A buffered binary stream of the database file.
+        skip_unchanged : bool
+            Don't upload the database if it is the same as the one of the head commit (needs the account option)
 
         Returns
         -------
@@ -589,6 +1619,24 @@ class Dbhub:
                 - a dictionnary containing the new commit ID and web page URL
                 - a string describe error if occurs
         """
+        res, err = self.__upload(db_name, info, db_bytes, skip_unchanged)
+        if err:
+            return None, res if res is not None else err
+
+        return res, None
+
+    def __upload(self, db_name: str, info: UploadInformation, db_bytes: io.BufferedReader, skip_unchanged: bool) -> Tuple[Dict, str]:
+        # Runs an upload, returning the answer of the server and the error of the request as send_upload() does,
+        # so UploadMany() can tell the errors worth a retry
+        sha256 = None
+        # Uploads go to the account of the API key, which db_owner (the owner of the databases to query) may not be
+        if skip_unchanged and self._account and db_bytes.seekable():
+            sha256 = _file_sha256(db_bytes)
+            branch = info.identifier.branch if info and info.identifier else ''
+            head = self.__unchangedHead(self._account, db_name, branch, sha256)
+            if head is not None:
+                return {'commit': head, 'skipped': True}, None
+
         # Prepare the API parameters
         data = self.__prepareVals(dbName=db_name, ident=info.identifier)
 
@@ -618,12 +1666,106 @@ class Dbhub:
             if info.dbshasum:
                 data['dbshasum'] = info.dbshasum
 
-        res, err = httphub.send_upload(self._connection.server + "/v1/upload", data, db_bytes)
-        if err:
-            return None, res
+        res, err = httphub.send_upload(self._connection.server + "/v1/upload", data, db_bytes, transport=self._transport)
+        if sha256 is not None and not err and res.get('commit'):
+            # The next check of this database doesn't need to list its commits
+            self._file_hashes.put((self._connection.api_key, self._account, db_name, res['commit']), sha256)
+        return res, err
 
-        return res, None
+    def UploadMany(self, jobs: Iterable[Tuple[str, UploadInformation, str]], max_workers: int = None, retries: int = 2, retry_delay: float = 1.0,
+                   max_inflight_bytes: int = 256 * 1024 * 1024, progress: Callable[[UploadResult, UploadReport], None] = None,
+                   skip_unchanged: bool = False) -> Tuple[UploadReport, str]:
+        """
+        Uploads many database files concurrently. Each file is streamed from disk, the total size of the files
+        being uploaded at the same time is bounded, and a failed upload is retried on its own.
 
+        Parameters
+        ----------
+        jobs : Iterable[Tuple[str, UploadInformation, str]]
+            The (database name, upload parameters, path of the database file) of each upload
+        max_workers : int
+            The maximum number of uploads running at the same time. Defaults to 4, or to the
+            max_concurrency option when adaptive concurrency leaves it to the limiter of the transport
+        retries : int
+            The number of times a failed upload is retried, when the server couldn't be reached,
+            was overloaded (429) or failed (5xx)
+        retry_delay : float
+            The delay in seconds before the first retry, doubled at each new attempt
+        max_inflight_bytes : int
+            The maximum total size of the files being uploaded at the same time
+        progress : Callable[[UploadResult, UploadReport], None]
+            Called after each upload is finished, with its result and the report so far
+        skip_unchanged : bool
+            Don't upload the databases which are the same as the one of their head commit (needs the account option)
+
+        Returns
+        -------
+        Tuple[UploadReport, str]
+            The returned data is
+                - the result of each upload, along with the aggregate throughput
+                - a string describe error if an upload failed
+        """
+        budget = fanout.ByteBudget(max_inflight_bytes)
+
+        def upload(job):
+            db_name, info, path = job
+            result = UploadResult(db_name=db_name, path=path)
+            try:
+                result.size = os.path.getsize(path)
+            except OSError as e:
+                result.err = str(e)
+                return result
+
+            reserved = budget.acquire(result.size)
+            start = time.monotonic()
+            try:
+                while result.attempts <= retries:
+                    if result.attempts > 0:
+                        delay = retry_delay * 2 ** (result.attempts - 1)
+                        current = deadline.current()
+                        if current is not None and current.remaining() <= delay:
+                            # The retry couldn't start before the deadline
+                            current.expire()
+                            result.err = str(deadline.DeadlineExceeded())
+                            break
+                        time.sleep(delay)
+                    result.attempts += 1
+                    try:
+                        with open(path, 'rb') as f:
+                            res, err = self.__upload(db_name, info, f, skip_unchanged)
+                    except Exception as e:
+                        # Not a failure of the request: sending it again wouldn't help
+                        result.err = str(e)
+                        break
+                    if not err:
+                        result.commit, result.err = res, None
+                        result.skipped = bool(res.get('skipped'))
+                        break
+                    result.err = str(res if res is not None else err)
+                    if not httphub.retryable(err):
+                        # The server refused the upload (4xx): it would refuse it again
+                        break
+            finally:
+                budget.release(reserved)
+                result.seconds = time.monotonic() - start
+            return result
+
+        report = UploadReport()
+        start = time.monotonic()
+        for _, result in self._fanout(upload, jobs, self.__maxWorkers(max_workers, 4)):
+            report.results.append(result)
+            if not result.err and not result.skipped:
+                report.bytes_sent += result.size
+            report.seconds = time.monotonic() - start
+            if progress is not None:
+                progress(result, report)
+
+        failed = report.failed
+        if failed:
+            return report, f"{len(failed)} of {len(report.results)} uploads failed"
+        return report, None
+
+    @_prefetchable
     def Views(self, db_owner: str, db_name: str, ident: Identifier = None) -> Tuple[List[Dict], str]:
         """
         Returns the list of views in a SQLite database
@@ -648,12 +1790,13 @@ class Dbhub:
         # Prepare the API parameters
         data = self.__prepareVals(db_owner, db_name, ident)
         # Fetch the list of views
-        res, err = httphub.send_request_json(self._connection.server + "/v1/views", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/views", data, transport=self._transport)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         return res, None
 
+    @_prefetchable
     def Webpage(self, db_owner: str, db_name: str) -> Tuple[str, str]:
         """
         Returns the address of the database in the webUI. eg. for web browsers.
@@ -676,8 +1819,8 @@ class Dbhub:
         # Prepare the API parameters
         data = self.__prepareVals(db_owner, db_name)
         # Fetch the address of the database in the webUI
-        res, err = httphub.send_request_json(self._connection.server + "/v1/webpage", data)
+        res, err = httphub.send_request_json(self._connection.server + "/v1/webpage", data, transport=self._transport)
         if err:
-            return None, res
+            return None, res if res is not None else err
 
         return res['web_page'], None
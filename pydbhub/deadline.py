@@ -0,0 +1,113 @@
+import contextlib
+import functools
+import threading
+import time
+from typing import Callable, Iterator, Tuple
+
+_local = threading.local()
+
+
+# DeadlineExceeded is raised by the transport when a request can't be sent, or answered, before the deadline
+class DeadlineExceeded(Exception):
+    def __init__(self, message: str = 'Deadline exceeded'):
+        super().__init__(message)
+
+
+class Deadline(object):
+    def __init__(self, seconds: float, on_expire: Callable[['Deadline'], None] = None):
+        """
+        A point in time by which a call, along with all its requests, retries and sub-requests, must be done.
+
+        Parameters
+        ----------
+        seconds : float
+            The time left, from now
+        on_expire : Callable[[Deadline], None]
+            Called once, the first time a request is stopped by the deadline
+        """
+        self.expires = time.monotonic() + seconds
+        self.on_expire = on_expire
+        self.expired = False
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeouts(self, connect_timeout: float = None, read_timeout: float = None) -> Tuple[float, float]:
+        """
+        Splits the time left into the connect and read timeouts of a request.
+
+        Parameters
+        ----------
+        connect_timeout : float
+            The longest wait for a connection, whatever the time left
+        read_timeout : float
+            The longest wait for the server between two bytes of the response, whatever the time left
+
+        Returns
+        -------
+        Tuple[float, float]
+            The connect and read timeouts
+
+        Raises
+        ------
+        DeadlineExceeded
+            When no time is left
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.expire()
+            raise DeadlineExceeded()
+        connect = remaining if connect_timeout is None else min(connect_timeout, remaining)
+        read = remaining if read_timeout is None else min(read_timeout, remaining)
+        return connect, read
+
+    def expire(self):
+        # Records that the deadline stopped a request
+        with self._lock:
+            first = not self.expired
+            self.expired = True
+        if first and self.on_expire is not None:
+            self.on_expire(self)
+
+
+def current() -> Deadline:
+    """
+    Returns the deadline of the calls of the current thread, the nearest one when deadlines are nested.
+    """
+    return getattr(_local, 'deadline', None)
+
+
+@contextlib.contextmanager
+def scope(seconds: float, on_expire: Callable[[Deadline], None] = None) -> Iterator[Deadline]:
+    """
+    Sets a deadline on the calls made in the block by the current thread, and by the parallel APIs it uses.
+    A deadline nested in another one can't end after it.
+    """
+    outer = current()
+    if outer is not None:
+        seconds = min(seconds, outer.remaining())
+    _local.deadline = Deadline(seconds, on_expire)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = outer
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Wraps a function so it runs under the deadline of the calling thread, whatever the thread it runs in.
+    """
+    deadline = current()
+    if deadline is None:
+        return func
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        outer = current()
+        _local.deadline = deadline
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.deadline = outer
+    return call
@@ -0,0 +1,220 @@
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pydbhub.values as values
+
+# Actions of schema and data changes
+ADD = 'add'
+DELETE = 'delete'
+MODIFY = 'modify'
+
+
+def _get(obj: Any, name: str, default: Any = None) -> Any:
+    # Diffs can be given as returned by the API (dictionnaries) or by Dbhub.Diff() (objects)
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _statements(sql: str) -> Iterator[str]:
+    # Splits a SQL script into its statements, as Connection.executescript() commits the current transaction
+    statement = ''
+    for line in sql.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+    if statement.strip():
+        yield statement
+
+
+# SchemaChange holds the change of the schema of a table, view, index or trigger
+@dataclass()
+class SchemaChange:
+    action: str = ''
+    sql: str = ''
+    before: str = ''
+    after: str = ''
+
+
+# DataChange holds the change of one row of a table
+@dataclass()
+class DataChange:
+    action: str = ''
+    sql: str = ''
+    pk: Dict[str, Any] = field(default_factory=dict)
+    before: List[Any] = None
+    after: List[Any] = None
+
+
+# ObjectDiff holds the changes of one database object
+@dataclass()
+class ObjectDiff:
+    name: str = ''
+    type: str = ''
+    schema: SchemaChange = None
+    data: List[DataChange] = field(default_factory=list)
+
+
+# Changeset holds all the changes between two databases, or two versions of a database
+@dataclass()
+class Changeset:
+    objects: List[ObjectDiff] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, diffs: Any) -> 'Changeset':
+        """
+        Builds the changeset of the result of Dbhub.Diff().
+
+        Parameters
+        ----------
+        diffs : Any
+            The result of Dbhub.Diff(), or the dictionnary returned by the diff API
+
+        Returns
+        -------
+        Changeset
+            The changes of each object
+        """
+        objects = []
+        for obj in _get(diffs, 'diff') or []:
+            schema = _get(obj, 'schema')
+            if schema is not None:
+                schema = SchemaChange(
+                    action=_get(schema, 'action_type', ''),
+                    sql=_get(schema, 'sql', '') or '',
+                    before=_get(schema, 'before', '') or '',
+                    after=_get(schema, 'after', '') or '',
+                )
+            data = []
+            for change in _get(obj, 'data') or []:
+                pk = {}
+                for value in _get(change, 'pk') or []:
+                    pk[_get(value, 'Name')] = values.decode(_get(value, 'Type'), _get(value, 'Value'))
+                data.append(DataChange(
+                    action=_get(change, 'action_type', ''),
+                    sql=_get(change, 'sql', '') or '',
+                    pk=pk,
+                    before=_get(change, 'data_before'),
+                    after=_get(change, 'data_after'),
+                ))
+            objects.append(ObjectDiff(
+                name=_get(obj, 'object_name', ''),
+                type=_get(obj, 'object_type', ''),
+                schema=schema,
+                data=data,
+            ))
+        return cls(objects=objects)
+
+    def apply(self, conn: sqlite3.Connection, batch_size: int = 1000) -> Tuple[Dict[str, int], str]:
+        """
+        Applies the changeset to a local SQLite database, as a whole or not at all: within a savepoint, so
+        a transaction the caller left open keeps its own changes either way, and is left open.
+        Schema changes are applied first. Consecutive data changes of the same kind on the same table
+        are then run as one parameterized statement with executemany(), by batches of batch_size rows.
+        A change which can't be expressed that way runs its own SQL statement, when the diff has one.
+
+        Parameters
+        ----------
+        conn : sqlite3.Connection
+            The local database
+        batch_size : int
+            The maximum number of rows given to one executemany() call
+
+        Returns
+        -------
+        Tuple[Dict[str, int], str]
+            The returned data is
+                - the number of schema and data changes applied, by action
+                - a string describe error if occurs, in which case nothing of the changeset is applied
+        """
+        counts = {'schema': 0, ADD: 0, DELETE: 0, MODIFY: 0}
+        for obj in self.objects:
+            for change in ([obj.schema] if obj.schema is not None else []) + obj.data:
+                if change.action not in (ADD, DELETE, MODIFY):
+                    return None, f"Unknown action {change.action!r} on {obj.name}"
+
+        began = not conn.in_transaction
+        conn.execute('SAVEPOINT pydbhub_changeset')
+        try:
+            for obj in self.objects:
+                if obj.schema is not None:
+                    self._apply_schema(conn, obj)
+                    counts['schema'] += 1
+
+            for obj in self.objects:
+                if not obj.data:
+                    continue
+                columns = [row[1] for row in conn.execute(f'PRAGMA table_info({_quote_identifier(obj.name)})')]
+                for statement, rows in self._batches(obj, columns, batch_size):
+                    if statement is None:
+                        for change in rows:
+                            if not change.sql:
+                                raise ValueError(f"Can't apply a {change.action} of {obj.name} without SQL statement")
+                            for sql in _statements(change.sql):
+                                conn.execute(sql)
+                            counts[change.action] += 1
+                    else:
+                        conn.executemany(statement, [params for _, params in rows])
+                        counts[rows[0][0]] += len(rows)
+        except (sqlite3.Error, ValueError) as e:
+            conn.execute('ROLLBACK TO pydbhub_changeset')
+            conn.execute('RELEASE pydbhub_changeset')
+            if began:
+                conn.commit()
+            return None, str(e)
+
+        conn.execute('RELEASE pydbhub_changeset')
+        if began:
+            conn.commit()
+        return counts, None
+
+    @staticmethod
+    def _apply_schema(conn: sqlite3.Connection, obj: ObjectDiff):
+        schema = obj.schema
+        if schema.sql:
+            script = schema.sql
+        elif schema.action == ADD:
+            script = schema.after
+        elif schema.action == DELETE:
+            script = f'DROP {obj.type.upper()} IF EXISTS {_quote_identifier(obj.name)};'
+        elif obj.type != 'table':
+            script = f'DROP {obj.type.upper()} IF EXISTS {_quote_identifier(obj.name)};\n{schema.after}'
+        else:
+            raise ValueError(f"Can't modify table {obj.name} without SQL statement")
+        for sql in _statements(script):
+            conn.execute(sql)
+
+    @staticmethod
+    def _batches(obj: ObjectDiff, columns: List[str], batch_size: int) -> Iterator[Tuple[str, List]]:
+        # Groups consecutive changes sharing the same parameterized statement.
+        # Changes which can't be parameterized are grouped under a None statement.
+        table = _quote_identifier(obj.name)
+        current, rows = None, []
+        for change in obj.data:
+            statement, params = None, None
+            where = ' AND '.join(f'{_quote_identifier(name)} = ?' for name in change.pk)
+            if change.action == ADD and change.after is not None and len(change.after) == len(columns):
+                names = ', '.join(_quote_identifier(c) for c in columns)
+                statement = f'INSERT INTO {table} ({names}) VALUES ({", ".join("?" * len(columns))})'
+                params = list(change.after)
+            elif change.action == DELETE and change.pk:
+                statement = f'DELETE FROM {table} WHERE {where}'
+                params = list(change.pk.values())
+            elif change.action == MODIFY and change.pk and change.after is not None and len(change.after) == len(columns):
+                assignments = ', '.join(f'{_quote_identifier(c)} = ?' for c in columns)
+                statement = f'UPDATE {table} SET {assignments} WHERE {where}'
+                params = list(change.after) + list(change.pk.values())
+
+            if rows and (statement != current or len(rows) >= batch_size):
+                yield current, rows
+                rows = []
+            current = statement
+            rows.append(change if statement is None else (change.action, params))
+        if rows:
+            yield current, rows
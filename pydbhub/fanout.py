@@ -0,0 +1,414 @@
+import collections
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+import pydbhub.deadline as deadline
+from pydbhub.cache import LRUCache
+
+
+# The executor whose call the current thread is running, if any
+_running = threading.local()
+
+
+def as_completed(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int = 8, executor: Any = None) -> Iterator[Tuple[Any, Any]]:
+    """
+    Calls a function on each item concurrently, with at most max_workers calls in flight,
+    yielding the results in completion order.
+    Items are consumed lazily, so a long (or endless) iterable is never fully materialized.
+
+    Parameters
+    ----------
+    func : Callable
+        The function called with each item
+    items : Iterable
+        The items to process
+    max_workers : int
+        The maximum number of concurrent calls
+    executor : concurrent.futures.Executor
+        Runs the calls, so its threads (and the connections they keep) serve one call after the other.
+        Without one, or when called from one of its threads, the calls get threads of their own,
+        so nested calls never wait for a thread held by their caller.
+
+    Returns
+    -------
+    Iterator[Tuple[Any, Any]]
+        Each item along with the value returned by func
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # The calls share the deadline of the caller, if any
+    func = deadline.propagate(func)
+    if executor is None or getattr(_running, 'executor', None) is executor:
+        with ThreadPoolExecutor(max_workers=max_workers) as own:
+            yield from _as_completed(func, iter(items), max_workers, own)
+    else:
+        yield from _as_completed(func, iter(items), max_workers, executor)
+
+
+def _as_completed(func: Callable[[Any], Any], items: Iterator[Any], max_workers: int, executor: Any) -> Iterator[Tuple[Any, Any]]:
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    def run(item):
+        _running.executor = executor
+        try:
+            return func(item)
+        finally:
+            _running.executor = None
+
+    pending = {}
+    try:
+        for item in itertools.islice(items, max_workers):
+            pending[executor.submit(run, item)] = item
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                for next_item in itertools.islice(items, 1):
+                    pending[executor.submit(run, next_item)] = next_item
+                yield item, future.result()
+    finally:
+        # The consumer stopped early: don't start the calls which are still queued
+        for future in pending:
+            future.cancel()
+
+
+# ByteBudget bounds the number of bytes being processed at the same time, blocking callers until enough is released
+class ByteBudget(object):
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int) -> int:
+        """
+        Waits until size bytes are available, and reserves them.
+        A size larger than the limit is capped, so it runs alone instead of never running.
+
+        Returns
+        -------
+        int
+            The number of bytes reserved, to be given back to release()
+        """
+        size = min(size, self.limit)
+        with self._cond:
+            while self.used + size > self.limit:
+                self._cond.wait()
+            self.used += size
+        return size
+
+    def release(self, size: int):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+# RateLimiter spreads calls over time: at most rate calls per second on average, in bursts of up to burst calls
+class RateLimiter(object):
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Reserves a call.
+
+        Returns
+        -------
+        float
+            The number of seconds to wait before making the call
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            # A negative balance is paid back by waiting
+            return max(0.0, -self._tokens / self.rate)
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# SingleFlight runs at most one call by key at a time: callers arriving while it runs wait for its result
+class SingleFlight(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: Any, func: Callable[[], Any]) -> Any:
+        """
+        Calls func, unless a call with the same key is already in flight, in which case its result is returned.
+
+        Parameters
+        ----------
+        key : Any
+            What identifies the call
+        func : Callable
+            The call
+
+        Returns
+        -------
+        Any
+            The value returned by func. An exception raised by func is raised to every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# AdaptiveLimiter bounds the number of requests in flight with a limit which adapts to the capacity of the server:
+# additive increase while requests succeed, multiplicative decrease on overload (429, 5xx, failure or latency rise)
+class AdaptiveLimiter(object):
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64, backoff: float = 0.5,
+                 tolerance: float = 2.0, slack: float = 0.05, window: int = 100, keys: int = 1024):
+        """
+        Parameters
+        ----------
+        initial : int
+            The limit before any request completes
+        minimum : int
+            The lowest the limit can go
+        maximum : int
+            The highest the limit can go
+        backoff : float
+            The factor applied to the limit on overload
+        tolerance : float
+            A request taking more than tolerance times the fastest recent request of the same key is an overload
+        slack : float
+            ... and more than slack seconds longer than it, so the jitter of fast requests isn't taken for an overload
+        window : int
+            The number of recent latencies kept by key
+        keys : int
+            The number of keys whose latencies are kept, the least recently used being dropped beyond
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.slack = slack
+        self.window = window
+        self.inflight = 0
+        self.queued = 0
+        self.decreases = 0
+        self._decreased_at = float('-inf')
+        self._latencies = LRUCache(maxsize=keys)
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = None) -> float:
+        """
+        Waits until a request can be sent.
+
+        Parameters
+        ----------
+        timeout : float
+            The longest wait, None to wait for as long as needed
+
+        Returns
+        -------
+        float
+            The time the request starts at, to be given back to release(), or None if the timeout expired first
+        """
+        with self._cond:
+            self.queued += 1
+            try:
+                if not self._cond.wait_for(lambda: self.inflight < int(self.limit), timeout):
+                    return None
+            finally:
+                self.queued -= 1
+            self.inflight += 1
+        return time.monotonic()
+
+    def release(self, started: float, overloaded: bool = False, key: Any = None, measured: bool = True):
+        """
+        Records the outcome of a request, and adapts the limit.
+
+        Parameters
+        ----------
+        started : float
+            The time returned by acquire()
+        overloaded : bool
+            Whether the server answered 429 or 5xx, or the request failed
+        key : Any
+            What the request does, its endpoint or its statement: latencies are only compared between requests
+            of the same key, as requests doing different things take different times whatever the load
+        measured : bool
+            Whether the latency of the request is meaningful, which isn't the case of uploads for instance
+        """
+        latency = time.monotonic() - started
+        with self._cond:
+            saturated = self.inflight >= int(self.limit)
+            self.inflight -= 1
+            if measured and not overloaded:
+                samples = self._latencies.get(key)
+                if samples is None:
+                    samples = collections.deque(maxlen=self.window)
+                    self._latencies.put(key, samples)
+                if len(samples) >= 10:
+                    fastest = min(samples)
+                    overloaded = latency > fastest * self.tolerance and latency > fastest + self.slack
+                samples.append(latency)
+
+            if overloaded:
+                # Requests sent before the last decrease saw the old limit: they don't decrease it again
+                if started > self._decreased_at:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._decreased_at = time.monotonic()
+                    self.decreases += 1
+            elif saturated:
+                # Grows by one every limit completed requests, so about one per round trip, and only while the limit is reached
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                'concurrency_limit': int(self.limit),
+                'inflight': self.inflight,
+                'queued': self.queued,
+                'limit_decreases': self.decreases,
+            }
+
+
+# Hedger decides when a slow read is worth a duplicate request: once it has been running for longer than a
+# percentile of the recent latencies of its endpoint, and while duplicates stay within a share of all requests
+class Hedger(object):
+    def __init__(self, percentile: float = 95.0, max_ratio: float = 0.05, burst: int = 10, min_samples: int = 20,
+                 min_delay: float = 0.0, window: int = 200):
+        """
+        Parameters
+        ----------
+        percentile : float
+            A request is hedged when it runs for longer than this percentile of the recent latencies of its endpoint
+        max_ratio : float
+            The highest number of hedges by request sent, so the extra load stays below max_ratio
+        burst : int
+            The number of hedges which can be sent in a row, when enough requests were sent before
+        min_samples : int
+            The number of latencies of an endpoint needed before any of its requests is hedged
+        min_delay : float
+            The shortest wait, in seconds, before a hedge is sent
+        window : int
+            The number of recent latencies kept by endpoint
+        """
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.window = window
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self._tokens = 0.0
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def delay(self, key: Any) -> float:
+        """
+        Counts a new request, and returns how long to wait for it before sending a hedge.
+
+        Returns
+        -------
+        float
+            The delay in seconds, or None when the endpoint has too few latencies to tell
+        """
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.burst, self._tokens + self.max_ratio)
+            samples = self._latencies.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100.0))
+        return max(self.min_delay, ordered[rank])
+
+    def allow(self) -> bool:
+        # Takes a hedge from the budget, if any is left
+        with self._lock:
+            # With a tolerance for the rounding errors of the sum of the ratios
+            if self._tokens < 1.0 - 1e-9:
+                return False
+            self._tokens -= 1.0
+            self.hedges += 1
+            return True
+
+    def record(self, key: Any, latency: float):
+        # Records the latency of a request of an endpoint, whether it is an original request or a hedge
+        with self._lock:
+            samples = self._latencies.get(key)
+            if samples is None:
+                samples = self._latencies[key] = collections.deque(maxlen=self.window)
+            samples.append(latency)
+
+    def won(self):
+        # Records that a hedge answered before the original request
+        with self._lock:
+            self.wins += 1
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'hedged_requests': self.hedges,
+                'hedge_wins': self.wins,
+                'hedge_ratio': self.hedges / self.requests if self.requests else 0.0,
+            }
+
+
+def merge_results(results: Dict[Tuple[str, str], List[Dict]], owner_field: str = 'db_owner', name_field: str = 'db_name') -> List[Dict]:
+    """
+    Merges the rows returned by the same query on several databases into a single list,
+    each row being tagged with the database it comes from.
+
+    Parameters
+    ----------
+    results : Dict[Tuple[str, str], List[Dict]]
+        The rows returned for each (owner, database name)
+    owner_field : str
+        The name of the field holding the owner of the database
+    name_field : str
+        The name of the field holding the name of the database
+
+    Returns
+    -------
+    List[Dict]
+        The rows of all databases
+    """
+    merged = []
+    for (db_owner, db_name), rows in results.items():
+        for row in rows:
+            tagged = {owner_field: db_owner, name_field: db_name}
+            tagged.update(row)
+            merged.append(tagged)
+    return merged
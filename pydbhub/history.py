@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, Set
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS commits (
+    db_owner TEXT NOT NULL,
+    db_name TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (db_owner, db_name, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS heads (
+    db_owner TEXT NOT NULL,
+    db_name TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    commit_id TEXT NOT NULL,
+    PRIMARY KEY (db_owner, db_name, branch)
+) WITHOUT ROWID;
+'''
+
+
+class HistoryStore(object):
+    def __init__(self, path: str):
+        """
+        Opens (or creates) a local SQLite file holding the commit history of databases, along with the
+        branch heads the history was last synchronized with.
+        Commits are stored as JSON, with their timestamps already normalized to ISO 8601.
+
+        Parameters
+        ----------
+        path : str
+            The path of the SQLite file, or ":memory:"
+        """
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def heads(self, db_owner: str, db_name: str) -> Dict[str, str]:
+        """
+        Returns the head commit of each branch, as of the last synchronization.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT branch, commit_id FROM heads WHERE db_owner = ? AND db_name = ?', (db_owner, db_name)
+            ).fetchall()
+        return dict(rows)
+
+    def commits(self, db_owner: str, db_name: str) -> Dict[str, Dict]:
+        """
+        Returns the stored commits of a database, keyed and ordered by ID like the commits API does.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, data FROM commits WHERE db_owner = ? AND db_name = ? ORDER BY id', (db_owner, db_name)
+            ).fetchall()
+        return {commit_id: json.loads(data) for commit_id, data in rows}
+
+    def sync(self, db_owner: str, db_name: str, new_commits: Dict[str, Dict], all_ids: Set[str], heads: Dict[str, str]):
+        """
+        Stores the commits not known yet, forgets the ones which aren't part of the history anymore,
+        and records the branch heads, in a single transaction.
+
+        Parameters
+        ----------
+        db_owner : str
+            The owner of the database
+        db_name : str
+            The name of the database
+        new_commits : Dict[str, Dict]
+            The commits to add, keyed by ID
+        all_ids : Set[str]
+            The IDs of all the commits of the database
+        heads : Dict[str, str]
+            The head commit of each branch
+        """
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO commits (db_owner, db_name, id, data) VALUES (?, ?, ?, ?)',
+                [(db_owner, db_name, commit_id, json.dumps(commit)) for commit_id, commit in new_commits.items()]
+            )
+            stale = [
+                (db_owner, db_name, row[0]) for row in self._db.execute(
+                    'SELECT id FROM commits WHERE db_owner = ? AND db_name = ?', (db_owner, db_name)
+                ) if row[0] not in all_ids
+            ]
+            self._db.executemany('DELETE FROM commits WHERE db_owner = ? AND db_name = ? AND id = ?', stale)
+            self._db.execute('DELETE FROM heads WHERE db_owner = ? AND db_name = ?', (db_owner, db_name))
+            self._db.executemany(
+                'INSERT INTO heads (db_owner, db_name, branch, commit_id) VALUES (?, ?, ?, ?)',
+                [(db_owner, db_name, branch, commit_id) for branch, commit_id in heads.items()]
+            )
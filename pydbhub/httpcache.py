@@ -0,0 +1,182 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    commit_id TEXT,
+    content BLOB,
+    file TEXT,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+'''
+
+
+# CachedResponse is the body of a response kept by an HttpCache, along with what tells whether it is still current.
+# A large body is kept in a file of the cache (path), only read when it is served.
+@dataclass
+class CachedResponse:
+    content: bytes
+    etag: str = None
+    last_modified: str = None
+    commit_id: str = None
+    path: str = None
+
+    def read(self) -> bytes:
+        # The body, None when its file was dropped from the cache since
+        if self.path is None:
+            return self.content
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        # The headers asking the server to answer 304 if the response didn't change
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache(object):
+    def __init__(self, path: str, max_size: int = 1024 * 1024 * 1024, max_inline_size: int = 1024 * 1024):
+        """
+        Opens (or creates) a local SQLite file keeping the bodies of responses along with their validators
+        (ETag, Last-Modified), or the commit they were sent for when the server gave no validator.
+        Entries are keyed by URL and form fields, API key included, so clients never see each other's responses.
+        Bodies larger than max_inline_size, like downloaded databases, are kept as files in the directory
+        "<path>.bodies" rather than in the SQLite file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the SQLite file, or ":memory:" (the large bodies then go to a temporary directory)
+        max_size : int
+            The total size in bytes of the bodies kept, the least recently used being dropped beyond
+        max_inline_size : int
+            The size in bytes of the largest body kept in the SQLite file
+        """
+        self.max_size = max_size
+        self.max_inline_size = max_inline_size
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+        if path in ('', ':memory:'):
+            self._directory = tempfile.mkdtemp(prefix='pydbhub-http-cache-')
+            self._temporary = True
+        else:
+            self._directory = path + '.bodies'
+            self._temporary = False
+            os.makedirs(self._directory, exist_ok=True)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        if self._temporary:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    @staticmethod
+    def key(url: str, data: Dict[str, Any]) -> str:
+        # A digest of the URL and the fields of a request, the API key being one of them
+        fields = sorted((name, value[1] if isinstance(value, tuple) else value) for name, value in data.items())
+        return hashlib.sha256(repr((url, fields)).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> CachedResponse:
+        # The stored response, whose body is only read from its file by CachedResponse.read()
+        with self._lock:
+            row = self._db.execute('SELECT content, file, etag, last_modified, commit_id FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+        content, file = row[0], row[1]
+        return CachedResponse(content=None if content is None else bytes(content), etag=row[2], last_modified=row[3], commit_id=row[4],
+                              path=None if file is None else os.path.join(self._directory, file))
+
+    def validated(self, key: str) -> bool:
+        # Whether the stored response has validators, so the server can tell whether it changed
+        with self._lock:
+            row = self._db.execute('SELECT etag IS NOT NULL OR last_modified IS NOT NULL FROM responses WHERE key = ?', (key,)).fetchone()
+        return bool(row and row[0])
+
+    def put(self, key: str, response: CachedResponse):
+        """
+        Stores a response, then drops the least recently used ones while the cache is over its size.
+        A response larger than the whole cache isn't stored.
+        """
+        size = len(response.content)
+        if size > self.max_size:
+            return
+        content, file = response.content, None
+        if size > self.max_inline_size:
+            # Written outside of the lock, under a name of its own, so readers of the previous body aren't disturbed
+            fd, file_path = tempfile.mkstemp(dir=self._directory, prefix=key[:16] + '-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(response.content)
+            content, file = None, os.path.basename(file_path)
+        stale = []
+        with self._lock, self._db:
+            stale.extend(row[0] for row in self._db.execute('SELECT file FROM responses WHERE key = ?', (key,)))
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, etag, last_modified, commit_id, content, file, size, used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.etag, response.last_modified, response.commit_id, content, file, size, time.time())
+            )
+            total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_size:
+                dropped = []
+                for old_key, old_file, old_size in self._db.execute('SELECT key, file, size FROM responses WHERE key != ? ORDER BY used',
+                                                                     (key,)):
+                    if total <= self.max_size:
+                        break
+                    dropped.append((old_key,))
+                    stale.append(old_file)
+                    total -= old_size
+                self._db.executemany('DELETE FROM responses WHERE key = ?', dropped)
+        for old_file in stale:
+            if old_file is not None:
+                try:
+                    os.remove(os.path.join(self._directory, old_file))
+                except OSError:
+                    pass
+
+    def served(self, key: str, commit_id: str = None, not_modified: bool = False):
+        """
+        Records that a stored response was served, either because it belongs to the commit asked for,
+        or because the server answered 304 Not Modified. The commit of the response is updated if given.
+        """
+        with self._lock, self._db:
+            if not_modified:
+                self.not_modified += 1
+            else:
+                self.hits += 1
+            if commit_id is None:
+                self._db.execute('UPDATE responses SET used = ? WHERE key = ?', (time.time(), key))
+            else:
+                self._db.execute('UPDATE responses SET used = ?, commit_id = ? WHERE key = ?', (time.time(), commit_id, key))
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'http_cache_hits': self.hits,
+                'http_cache_not_modified': self.not_modified,
+                'http_cache_misses': self.misses,
+            }
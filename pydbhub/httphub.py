@@ -1,11 +1,723 @@
 import pydbhub
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 from json.decoder import JSONDecodeError
-import requests
+import heapq
 import io
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
 
+import pydbhub.deadline as deadline
+from pydbhub.fanout import AdaptiveLimiter, Hedger
 
-def send_request_json(query_url: str, data: Dict[str, Any]) -> Tuple[List[Any], str]:
+# requests (and with it urllib3, charset detection and the SSL stack) is imported on the first request,
+# not when the module is imported
+
+# Endpoints which only read, so a duplicate request does no harm. Downloads are left out, as they are large.
+HEDGED_ENDPOINTS = frozenset((
+    'branches', 'columns', 'commits', 'databases', 'diff', 'indexes', 'metadata', 'query', 'releases', 'tables', 'tags', 'views', 'webpage',
+))
+
+# Endpoints running the statement they are given, whose latency depends on it
+STATEMENT_ENDPOINTS = frozenset(('execute', 'query'))
+
+
+def _cookie_jar():
+    # A cookie jar keeping no cookie: the API authenticates each request with its API key
+    import http.cookiejar
+    import requests
+
+    return requests.cookies.RequestsCookieJar(policy=http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+
+
+class Transport(object):
+    def __init__(self, pool_size: int = 10, limiter: AdaptiveLimiter = None, connect_timeout: float = None, read_timeout: float = None,
+                 hedger: Hedger = None):
+        """
+        Sends the requests to DBHub.io over pools of keep-alive connections.
+        A transport can be shared by many clients, whatever their API key: it holds no credentials,
+        and its sessions reject cookies, so nothing set by the server for one client is sent for another.
+        It is thread safe: as requests sessions aren't, each thread gets its own session (and pool).
+
+        Parameters
+        ----------
+        pool_size : int
+            The maximum number of connections kept open to the server, by thread
+        limiter : AdaptiveLimiter
+            Bounds the number of requests in flight through the transport, whatever the thread sending them.
+            It is fed the latency and status of every response.
+        connect_timeout : float
+            The longest wait for a connection to the server, None for no limit
+        read_timeout : float
+            The longest wait for the server between two bytes of a response, None for no limit.
+            Within a deadline (see pydbhub.deadline), both timeouts are also bounded by the time left.
+        hedger : Hedger
+            Sends a duplicate of the requests to HEDGED_ENDPOINTS which are slower than usual, the first answer winning.
+            The original is sent from the calling thread, and cut short when the hedge answers first.
+            Only the hedges are sent from threads of the transport.
+        """
+        self.pool_size = pool_size
+        self.limiter = limiter
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.hedger = hedger
+        self._hedges = None
+        self._timer = None
+        self._workers = None
+        # Number of requests stopped by a timeout
+        self.timed_out = 0
+        self._local = threading.local()
+        self._sessions = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # Sessions are only created (and requests imported) on the first request of each thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+
+            session = requests.Session()
+            session.cookies = _cookie_jar()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            if self.hedger is not None:
+                adapter.poolmanager.pool_classes_by_scheme = _abortable_pools(self)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            with self._lock:
+                self._sessions.add(session)
+            self._local.session = session
+        return session
+
+    def post(self, url: str, **kwargs):
+        import requests
+
+        current = deadline.current()
+        try:
+            if self.hedger is not None and url.rsplit('/', 1)[-1] in HEDGED_ENDPOINTS:
+                return self._hedged(url, current, **kwargs)
+            return self._limited(url, current, **kwargs)
+        except requests.exceptions.Timeout:
+            with self._lock:
+                self.timed_out += 1
+            if current is not None and current.remaining() <= 0:
+                current.expire()
+                raise deadline.DeadlineExceeded()
+            raise
+
+    def _hedged(self, url: str, current: deadline.Deadline, **kwargs):
+        # Sends the request, and a hedge if it takes longer than usual, returning the first successful answer
+        delay = self.hedger.delay(url)
+        if delay is None:
+            return self._measured(url, current, **kwargs)
+
+        request = _HedgedRequest()
+        self.timer.schedule(time.monotonic() + delay, lambda: self._hedge(request, url, current, kwargs))
+        return self._original(request, url, current, kwargs)
+
+    def _original(self, request: '_HedgedRequest', url: str, current: deadline.Deadline, kwargs: Dict[str, Any]):
+        # Sends the original of a hedged request from the calling thread. When the hedge answers first,
+        # the connection of the original is shut down (see _abortable_pools), so the calling thread is released.
+        self._local.hedged = request
+        try:
+            response, error = self._measured(url, current, **kwargs), None
+        except Exception as e:
+            response, error = None, e
+        finally:
+            self._local.hedged = None
+        request.offer(response, error)
+        return request.result()
+
+    def _hedge(self, request: '_HedgedRequest', url: str, current: deadline.Deadline, kwargs: Dict[str, Any]):
+        # Sends the hedge of a request still waiting for its answer, if the budget allows it, from the hedge threads
+        if request.answer is None and self.hedger.allow() and request.hedge():
+            self.hedges.submit(self._send_hedge, request, url, current, kwargs)
+
+    def _send_hedge(self, request: '_HedgedRequest', url: str, current: deadline.Deadline, kwargs: Dict[str, Any]):
+        try:
+            response, error = self._measured(url, current, **kwargs), None
+        except Exception as e:
+            response, error = None, e
+        if request.offer(response, error) and error is None and response.status_code < 500:
+            self.hedger.won()
+            request.abort()
+
+    def _measured(self, url: str, current: deadline.Deadline, **kwargs):
+        # Sends the request, feeding the latency of successful answers to the hedger. An original cut short by its
+        # hedge ran at least as long as it did, which is recorded too, so the slow requests still count.
+        started = time.monotonic()
+        try:
+            response = self._limited(url, current, **kwargs)
+        except Exception:
+            request = getattr(self._local, 'hedged', None)
+            if request is not None and request.aborted:
+                self.hedger.record(url, time.monotonic() - started)
+            raise
+        if response.status_code < 500 and response.status_code != 429:
+            self.hedger.record(url, time.monotonic() - started)
+        return response
+
+    @property
+    def hedges(self):
+        # The threads sending the hedges, created on the first one. The originals are sent from the calling threads,
+        # so these only carry the few hedges the hedger allows: as many as its burst.
+        if self._hedges is None:
+            with self._lock:
+                if self._hedges is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    self._hedges = ThreadPoolExecutor(max_workers=max(1, self.hedger.burst), thread_name_prefix='pydbhub-hedge')
+        return self._hedges
+
+    @property
+    def timer(self) -> '_Timer':
+        # Sends the hedges when they are due, on a thread of its own, created on the first one
+        if self._timer is None:
+            with self._lock:
+                if self._timer is None:
+                    self._timer = _Timer('pydbhub-hedge-timer')
+        return self._timer
+
+    @property
+    def workers(self):
+        # The threads of the parallel calls of the clients (see fanout.as_completed), created on the first one.
+        # They live as long as the transport, so their sessions, and the connections of these, serve call after call.
+        if self._workers is None:
+            with self._lock:
+                if self._workers is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    threads = max(64, self.limiter.maximum if self.limiter is not None else 0)
+                    self._workers = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='pydbhub-fanout')
+        return self._workers
+
+    def _limited(self, url: str, current: deadline.Deadline, **kwargs):
+        if self.limiter is None:
+            return self._post(url, timeout=self._timeouts(current), **kwargs)
+
+        started = self.limiter.acquire(timeout=current.remaining() if current is not None else None)
+        if started is None:
+            current.expire()
+            raise deadline.DeadlineExceeded()
+        overloaded = True
+        try:
+            response = self._post(url, timeout=self._timeouts(current), **kwargs)
+            overloaded = response.status_code == 429 or response.status_code >= 500
+            return response
+        except deadline.DeadlineExceeded:
+            # Not sent: the server has nothing to do with it
+            overloaded = False
+            raise
+        except Exception:
+            # Cut short by its hedge: it was slow, which its latency tells, but didn't fail
+            request = getattr(self._local, 'hedged', None)
+            overloaded = request is None or not request.aborted
+            raise
+        finally:
+            # The duration of an upload depends on its size, not on the load of the server
+            measured = 'files' not in kwargs and not isinstance(kwargs.get('data'), _MultipartStream)
+            self.limiter.release(started, overloaded, key=_latency_key(url, kwargs.get('data')), measured=measured)
+
+    def _timeouts(self, current: deadline.Deadline) -> Tuple[float, float]:
+        # The (connect, read) timeouts of a request, or None for no timeout
+        if current is not None:
+            return current.timeouts(self.connect_timeout, self.read_timeout)
+        if self.connect_timeout is None and self.read_timeout is None:
+            return None
+        return self.connect_timeout, self.read_timeout
+
+    def _post(self, url: str, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions = weakref.WeakSet()
+            self._local = threading.local()
+            executors = (self._hedges, self._workers)
+            timer = self._timer
+            self._hedges = self._workers = self._timer = None
+        if timer is not None:
+            timer.close()
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False)
+        for session in sessions:
+            session.close()
+
+
+# _HedgedRequest is a request and its hedge, if one is sent: the first successful answer wins, a failure being
+# the answer only when the other request failed too, or was never sent
+class _HedgedRequest(object):
+    def __init__(self):
+        self.answer = None
+        self.aborted = False
+        self._pending = 1
+        self._connection = None
+        self._cond = threading.Condition()
+
+    def hedge(self) -> bool:
+        # Counts the hedge in flight, unless the request already has its answer
+        with self._cond:
+            if self.answer is not None:
+                return False
+            self._pending += 1
+            return True
+
+    def offer(self, response: Any, error: Exception) -> bool:
+        # Records the outcome of the original or of the hedge, returning whether it is the answer
+        failed = error is not None or response.status_code >= 500
+        with self._cond:
+            self._pending -= 1
+            if self.answer is not None or (failed and self._pending > 0):
+                return False
+            self.answer = (response, error)
+            self._cond.notify_all()
+            return True
+
+    def result(self):
+        with self._cond:
+            while self.answer is None:
+                self._cond.wait()
+        response, error = self.answer
+        if error is not None:
+            raise error
+        return response
+
+    def attach(self, connection: Any):
+        # Called from the thread of the original while it waits for its response on connection
+        with self._cond:
+            if self.aborted:
+                raise ConnectionAbortedError('The hedge answered first')
+            self._connection = connection
+
+    def detach(self):
+        with self._cond:
+            self._connection = None
+
+    def abort(self):
+        # Cuts the original short, its thread then raising a connection error. Under the lock, so the connection
+        # can't be shut down once the original is done with it.
+        import socket
+
+        with self._cond:
+            self.aborted = True
+            sock = getattr(self._connection, 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def _abortable_pools(transport: Transport) -> Dict[str, type]:
+    # The urllib3 connection pools of the sessions of a transport with hedging: their connections attach themselves
+    # to the hedged request of their thread while waiting for the response, so its hedge can shut them down
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def abortable(pool_class: type) -> type:
+        class Connection(pool_class.ConnectionCls):
+            def getresponse(self, *args, **kwargs):
+                request = getattr(transport._local, 'hedged', None)
+                if request is None:
+                    return super().getresponse(*args, **kwargs)
+                request.attach(self)
+                try:
+                    return super().getresponse(*args, **kwargs)
+                finally:
+                    request.detach()
+
+        return type(pool_class.__name__, (pool_class,), {'ConnectionCls': Connection})
+
+    return {'http': abortable(HTTPConnectionPool), 'https': abortable(HTTPSConnectionPool)}
+
+
+# _Timer runs callbacks at given times, from one thread started on the first one
+class _Timer(object):
+    def __init__(self, name: str):
+        self.name = name
+        self._due = []
+        self._sequence = itertools.count()
+        self._thread = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def schedule(self, when: float, callback: Callable[[], None]):
+        with self._cond:
+            heapq.heappush(self._due, (when, next(self._sequence), callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._due or self._due[0][0] > time.monotonic()):
+                    self._cond.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                if self._closed:
+                    return
+                callback = heapq.heappop(self._due)[2]
+            try:
+                callback()
+            except Exception:
+                # A hedge which can't be sent (transport closed meanwhile) leaves the original alone
+                pass
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._due = []
+            self._cond.notify()
+
+
+def _latency_key(url: str, data: Any) -> Any:
+    # What the latency of a request is compared with by the limiter: the latency of a statement depends on the
+    # statement far more than on the load of the server, so statements are only compared with themselves
+    if url.rsplit('/', 1)[-1] in STATEMENT_ENDPOINTS and isinstance(data, dict) and 'sql' in data:
+        sql = data['sql']
+        return url, sql[1] if isinstance(sql, tuple) else sql
+    return url
+
+
+def _form(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Form fields as requests encodes them: a field can have several values, None values are left out
+    form = {}
+    for field, values in data.items():
+        if isinstance(values, (str, bytes)) or not hasattr(values, '__iter__'):
+            values = [values]
+        values = [v.decode('utf-8') if isinstance(v, bytes) else str(v) for v in values if v is not None]
+        if values:
+            form[field] = values if len(values) > 1 else values[0]
+    return form
+
+
+class _Http2Response(object):
+    """
+    The part of the interface of requests responses used by this module, over an httpx response.
+    """
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.http_version = response.http_version
+        self._response = response
+
+    @property
+    def content(self) -> bytes:
+        # Read on first access for streamed responses
+        return self._response.read()
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        import httpx
+        import requests
+
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def close(self):
+        self._response.close()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        import requests
+
+        if 400 <= self.status_code < 600:
+            kind = 'Client' if self.status_code < 500 else 'Server'
+            raise requests.exceptions.HTTPError(f'{self.status_code} {kind} Error: {self.reason} for url: {self.url}', response=self)
+
+
+class Http2Transport(Transport):
+    def __init__(self, pool_size: int = 10, limiter: AdaptiveLimiter = None, connect_timeout: float = None, read_timeout: float = None,
+                 hedger: Hedger = None, prior_knowledge: bool = False):
+        """
+        Sends the requests to DBHub.io over HTTP/2 with httpx, multiplexing the concurrent requests of all
+        threads over one connection by host. Servers which don't negotiate HTTP/2 (ALPN) are spoken to in HTTP/1.1.
+        Requires httpx and h2 (pip install httpx[http2]).
+
+        Parameters
+        ----------
+        pool_size : int
+            The maximum number of connections kept open to the server
+        limiter : AdaptiveLimiter
+            Bounds the number of requests in flight through the transport, see Transport
+        connect_timeout : float
+            The longest wait for a connection to the server, see Transport
+        read_timeout : float
+            The longest wait for the server between two bytes of a response, see Transport
+        hedger : Hedger
+            Sends a duplicate of slow reads, see Transport
+        prior_knowledge : bool
+            Speak HTTP/2 right away to http:// addresses (h2c), without negotiation
+        """
+        super().__init__(pool_size=pool_size, limiter=limiter, connect_timeout=connect_timeout, read_timeout=read_timeout, hedger=hedger)
+        self.prior_knowledge = prior_knowledge
+        self._client = None
+
+    def _original(self, request: _HedgedRequest, url: str, current: deadline.Deadline, kwargs: Dict[str, Any]):
+        # httpx can't cut one HTTP/2 stream short: the original of a hedged request is sent from a thread of its own,
+        # the calling thread returning the first answer. Threads are cheap here, all sharing the connections of the client.
+        def send():
+            try:
+                response, error = self._measured(url, current, **kwargs), None
+            except Exception as e:
+                response, error = None, e
+            request.offer(response, error)
+
+        threading.Thread(target=send, name='pydbhub-hedged', daemon=True).start()
+        return request.result()
+
+    @property
+    def client(self):
+        # The httpx client, thread safe and shared by all threads, is created on the first request
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+
+                    limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                    self._client = httpx.Client(http1=not self.prior_knowledge, http2=True, limits=limits, timeout=None,
+                                                cookies=_cookie_jar())
+        return self._client
+
+    def _post(self, url: str, data: Any = None, headers: Dict[str, str] = None, files: Dict[str, Any] = None, timeout: Tuple[float, float] = None,
+              stream: bool = False):
+        import httpx
+        import requests
+
+        headers = dict(headers or {})
+        kwargs = {}
+        if timeout is not None:
+            connect, read = timeout
+            kwargs['timeout'] = httpx.Timeout(connect=connect, read=read, write=read, pool=connect)
+        if isinstance(data, _MultipartStream):
+            headers['Content-Length'] = str(len(data))
+            kwargs['content'] = iter(data)
+        else:
+            kwargs['data'] = _form(data or {})
+            if files:
+                kwargs['files'] = files
+        try:
+            if stream:
+                # The body is read by the caller, through iter_content()
+                request = self.client.build_request('POST', url, headers=headers, **kwargs)
+                return _Http2Response(self.client.send(request, stream=True))
+            return _Http2Response(self.client.post(url, headers=headers, **kwargs))
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            # Callers handle the errors of requests
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+        super().close()
+
+
+def create_transport(pool_size: int = 10, limiter: AdaptiveLimiter = None, connect_timeout: float = None, read_timeout: float = None,
+                     hedger: Hedger = None, http2: bool = False, prior_knowledge: bool = False) -> Transport:
+    """
+    Creates a transport, over HTTP/2 if asked and httpx and h2 are installed, over HTTP/1.1 with requests otherwise.
+
+    Parameters
+    ----------
+    pool_size : int
+        The maximum number of connections kept open to the server
+    limiter : AdaptiveLimiter
+        Bounds the number of requests in flight through the transport
+    connect_timeout : float
+        The longest wait for a connection to the server
+    read_timeout : float
+        The longest wait for the server between two bytes of a response
+    hedger : Hedger
+        Sends a duplicate of slow reads
+    http2 : bool
+        Use HTTP/2 when available
+    prior_knowledge : bool
+        Speak HTTP/2 right away to http:// addresses, see Http2Transport
+    """
+    if http2:
+        try:
+            import h2  # noqa: F401
+            import httpx  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            return Http2Transport(pool_size=pool_size, limiter=limiter, connect_timeout=connect_timeout, read_timeout=read_timeout,
+                                  hedger=hedger, prior_knowledge=prior_knowledge)
+    return Transport(pool_size=pool_size, limiter=limiter, connect_timeout=connect_timeout, read_timeout=read_timeout, hedger=hedger)
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def default_transport() -> Transport:
+    """
+    Returns the transport shared by the clients which weren't given one.
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport
+
+
+class _MultipartStream(object):
+    """
+    A multipart/form-data request body which reads the uploaded file chunk by chunk,
+    so the database is never held in memory as a whole.
+    """
+
+    def __init__(self, data: Dict[str, Any], name: str, fileobj: io.BufferedReader, size: int, chunk_size: int = 64 * 1024):
+        import uuid
+
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        self.chunk_size = chunk_size
+        self.sent = 0
+
+        head = []
+        for field, values in data.items():
+            if isinstance(values, (str, bytes)) or not hasattr(values, '__iter__'):
+                values = [values]
+            for value in values:
+                if value is None:
+                    continue
+                if not isinstance(value, bytes):
+                    value = str(value).encode('utf-8')
+                head.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"\r\n\r\n'.encode('utf-8'))
+                head.append(value + b'\r\n')
+        filename = os.path.basename(getattr(fileobj, 'name', None) or name)
+        head.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8')
+        )
+        tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+        head = b''.join(head)
+        self._parts = [head, fileobj, tail]
+        self._length = len(head) + size + len(tail)
+        self._index = 0
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        out = bytearray()
+        while len(out) < size and self._index < len(self._parts):
+            part = self._parts[self._index]
+            if isinstance(part, bytes):
+                chunk = part[self._offset:self._offset + size - len(out)]
+                self._offset += len(chunk)
+                if self._offset >= len(part):
+                    self._index += 1
+                    self._offset = 0
+            else:
+                chunk = part.read(size - len(out))
+                if not chunk:
+                    self._index += 1
+            out += chunk
+        self.sent += len(out)
+        return bytes(out)
+
+
+def _remaining_size(fileobj: io.BufferedReader) -> int:
+    # Number of bytes left to read in a file object, or None if it can't be known without reading it
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    try:
+        position = fileobj.tell()
+        size = fileobj.seek(0, io.SEEK_END) - position
+        fileobj.seek(position)
+        return size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def _post_cached(transport: Transport, query_url: str, data: Dict[str, Any], headers: Dict[str, str], cache: Any, commit_id: str):
+    # Sends a request through an HttpCache (see pydbhub.httpcache), returning the body of the response, along with
+    # the response itself when the body was transferred. A stored body is served without any request when it was
+    # sent for the commit asked for, and after a 304 answer to a conditional request otherwise.
+    if cache is None:
+        response = transport.post(query_url, data=data, headers=headers)
+        response.raise_for_status()
+        return response.content, response
+
+    from pydbhub.httpcache import CachedResponse
+
+    key = cache.key(query_url, data)
+    stored = cache.get(key)
+    if stored is not None and commit_id is not None and stored.commit_id == commit_id:
+        content = stored.read()
+        if content is not None:
+            cache.served(key)
+            return content, None
+    if stored is None:
+        response = transport.post(query_url, data=data, headers=headers)
+    else:
+        response = transport.post(query_url, data=data, headers=dict(headers, **stored.conditional_headers()))
+        if response.status_code == 304:
+            content = stored.read()
+            if content is not None:
+                cache.served(key, commit_id=commit_id, not_modified=True)
+                return content, None
+            # The body was dropped from the cache meanwhile
+            response = transport.post(query_url, data=data, headers=headers)
+    response.raise_for_status()
+    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+    # Without validators nor commit, nothing would tell whether the stored body is still current
+    if etag or last_modified or commit_id is not None:
+        cache.put(key, CachedResponse(content=response.content, etag=etag, last_modified=last_modified, commit_id=commit_id))
+    return response.content, response
+
+
+# StatusError is the error of a request the server answered with an error status, which it keeps
+class StatusError(str):
+    status_code: int = None
+
+    def __new__(cls, message: str, status_code: int):
+        error = super().__new__(cls, message)
+        error.status_code = status_code
+        return error
+
+
+def retryable(err: str) -> bool:
+    # Whether a request which failed with err can succeed when sent again: the server wasn't reached,
+    # is overloaded (429) or failed on its side (5xx)
+    status_code = getattr(err, 'status_code', None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+def send_request_json(query_url: str, data: Dict[str, Any], transport: Transport = None, cache: Any = None,
+                      commit_id: str = None) -> Tuple[List[Any], str]:
     """
     send_request_json sends a request to DBHub.io, formatting the returned result as JSON
 
@@ -15,6 +727,12 @@ def send_request_json(query_url: str, data: Dict[str, Any]) -> Tuple[List[Any],
         url of the API endpoint
     data : Dict[str, Any]
         data to be processed to the server.
+    transport : Transport
+        the transport sending the request, the shared default one if not given
+    cache : HttpCache
+        keeps the response, to be sent again only if it changed (see pydbhub.httpcache)
+    commit_id : str
+        the commit the response depends on, if any: a response kept for the same commit is served without request
 
     Returns
     -------
@@ -24,26 +742,34 @@ def send_request_json(query_url: str, data: Dict[str, Any]) -> Tuple[List[Any],
         - a string describe error if occurs
     """
 
+    import requests
+
+    transport = transport or default_transport()
     try:
         headers = {'User-Agent': f'pydbhub v{pydbhub.__version__}'}
-        response = requests.post(query_url, data=data, headers=headers)
-        response.raise_for_status()
-        return response.json(), None
+        if cache is None:
+            response = transport.post(query_url, data=data, headers=headers)
+            response.raise_for_status()
+            return response.json(), None
+        content, response = _post_cached(transport, query_url, data, headers, cache, commit_id)
+        return json.loads(content), None
     except JSONDecodeError as e:
         return None, e.args[0]
     except TypeError as e:
         return None, e.args[0]
     except requests.exceptions.HTTPError as e:
         try:
-            return response.json(), e.args[0]
+            return e.response.json(), e.args[0]
         except JSONDecodeError:
             return None, e.args[0]
     except requests.exceptions.RequestException as e:
-        cause = e.args(0)
-        return None, str(cause.args[0])
+        return None, str(e)
+    except deadline.DeadlineExceeded as e:
+        return None, str(e)
 
 
-def send_request(query_url: str, data: Dict[str, Any]) -> Tuple[List[bytes], str]:
+def send_request(query_url: str, data: Dict[str, Any], transport: Transport = None, cache: Any = None,
+                 commit_id: str = None) -> Tuple[List[bytes], str]:
     """
     send_request sends a request to DBHub.io.
 
@@ -52,6 +778,12 @@ def send_request(query_url: str, data: Dict[str, Any]) -> Tuple[List[bytes], str
         url of the API endpoint
     data : Dict[str, Any]
         data to be processed to the server.------
+    transport : Transport
+        the transport sending the request, the shared default one if not given
+    cache : HttpCache
+        keeps the response, to be sent again only if it changed (see pydbhub.httpcache)
+    commit_id : str
+        the commit the response depends on, if any: a response kept for the same commit is served without request
 
 
     Returns
@@ -59,19 +791,71 @@ def send_request(query_url: str, data: Dict[str, Any]) -> Tuple[List[bytes], str
     List[bytes]
         database file is returned as a list of bytes
     """
+    import requests
+
+    transport = transport or default_transport()
     try:
         headers = {'User-Agent': f'pydbhub v{pydbhub.__version__}'}
-        response = requests.post(query_url, data=data, headers=headers)
-        response.raise_for_status()
-        return response.content, None
+        content, _ = _post_cached(transport, query_url, data, headers, cache, commit_id)
+        return content, None
+    except requests.exceptions.HTTPError as e:
+        return None, e.args[0]
+    except requests.exceptions.RequestException as e:
+        return None, str(e)
+    except deadline.DeadlineExceeded as e:
+        return None, str(e)
+
+
+def send_download(query_url: str, data: Dict[str, Any], fileobj: io.BufferedWriter, transport: Transport = None,
+                  chunk_size: int = 1024 * 1024) -> Tuple[int, str]:
+    """
+    send_download sends a request to DBHub.io, streaming the returned file into a file object chunk by chunk,
+    instead of holding it in memory.
+
+    Parameters
+    ----------
+    query_url : str
+        url of the API endpoint
+    data : Dict[str, Any]
+        data to be processed to the server.
+    fileobj : io.BufferedWriter
+        where the file is written
+    transport : Transport
+        the transport sending the request, the shared default one if not given
+    chunk_size : int
+        the size of the chunks read from the connection
+
+    Returns
+    -------
+    Tuple[int, str]
+    The returned data is
+        - the number of bytes written
+        - a string describe error if occurs
+    """
+    import requests
+
+    transport = transport or default_transport()
+    try:
+        headers = {'User-Agent': f'pydbhub v{pydbhub.__version__}'}
+        response = transport.post(query_url, data=data, headers=headers, stream=True)
+        try:
+            response.raise_for_status()
+            size = 0
+            for chunk in response.iter_content(chunk_size):
+                fileobj.write(chunk)
+                size += len(chunk)
+            return size, None
+        finally:
+            response.close()
     except requests.exceptions.HTTPError as e:
         return None, e.args[0]
     except requests.exceptions.RequestException as e:
-        cause = e.args(0)
-        return None, str(cause.args[0])
+        return None, str(e)
+    except deadline.DeadlineExceeded as e:
+        return None, str(e)
 
 
-def send_upload(query_url: str, data: Dict[str, Any], db_bytes: io.BufferedReader) -> Tuple[List[Any], str]:
+def send_upload(query_url: str, data: Dict[str, Any], db_bytes: io.BufferedReader, transport: Transport = None) -> Tuple[List[Any], str]:
     """
     send_upload uploads a database to DBHub.io.
 
@@ -81,6 +865,8 @@ def send_upload(query_url: str, data: Dict[str, Any], db_bytes: io.BufferedReade
         url of the API endpoint.
     data : Dict[str, Any]
         data to be processed to the server.
+    transport : Transport
+        the transport sending the request, the shared default one if not given
     db_bytes : io.BufferedReader
         A buffered binary stream of the database file.
 
@@ -91,23 +877,36 @@ def send_upload(query_url: str, data: Dict[str, Any], db_bytes: io.BufferedReade
         - a list of JSON object.
         - a string describe error if occurs
     """
+    import requests
+
+    transport = transport or default_transport()
     try:
         headers = {'User-Agent': f'pydbhub v{pydbhub.__version__}'}
-        files = {"file": db_bytes}
-        response = requests.post(query_url, data=data, headers=headers, files=files)
+        size = _remaining_size(db_bytes)
+        if size is None:
+            files = {"file": db_bytes}
+            response = transport.post(query_url, data=data, headers=headers, files=files)
+        else:
+            # Stream the database file instead of building the whole request body in memory
+            body = _MultipartStream(data, "file", db_bytes, size)
+            headers['Content-Type'] = body.content_type
+            response = transport.post(query_url, data=body, headers=headers)
         response.raise_for_status()
         if response.status_code != 201:
             # The returned status code indicates something went wrong
+            err = StatusError(str(response.status_code), response.status_code)
             try:
-                return response.json(), str(response.status_code)
+                return response.json(), err
             except JSONDecodeError:
-                return None, str(response.status_code)
+                return None, err
         return response.json(), None
     except requests.exceptions.HTTPError as e:
+        err = StatusError(e.args[0], e.response.status_code)
         try:
-            return response.json(), e.args[0]
+            return response.json(), err
         except JSONDecodeError:
-            return None, e.args[0]
+            return None, err
     except requests.exceptions.RequestException as e:
-        cause = e.args(0)
-        return None, str(cause.args[0])
+        return None, str(e)
+    except deadline.DeadlineExceeded as e:
+        return None, str(e)
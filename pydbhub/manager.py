@@ -0,0 +1,66 @@
+from typing import Dict
+
+from pydbhub.cache import LRUCache
+from pydbhub.dbhub import Dbhub, _transport, load_config
+
+
+class ClientManager(object):
+    def __init__(self, config_data: str = None, config_file: str = None, max_clients: int = 1024):
+        """
+        Creates the clients of many tenants, each with their own API key, from a single configuration.
+        The configuration is only parsed once, and all the clients share one transport (so one pool of
+        connections, and one adaptive concurrency limiter) along with the query result, branch head and
+        schema caches. Cache entries are keyed by API key, so the credentials, and the data they give
+        access to, stay isolated between tenants.
+        The local history store and HTTP cache aren't shared: the clients of a manager don't use them.
+
+        Parameters
+        ----------
+        config_data : str
+            INI configuration data from a string
+        config_file : str
+            INI configuration file
+        max_clients : int
+            The maximum number of clients kept for reuse
+        """
+        self._options = load_config(config_data, config_file)
+        self.transport = _transport(self._options)
+        self._query_cache = LRUCache(maxsize=int(self._options.get('query_cache_size', 128)))
+        self._heads = LRUCache(maxsize=1024)
+        self._schemas = LRUCache(maxsize=int(self._options.get('schema_cache_size', 64)))
+        self._clients = LRUCache(maxsize=max_clients)
+
+    def client(self, api_key: str, account: str = '') -> Dbhub:
+        """
+        Returns the client of a tenant.
+
+        Parameters
+        ----------
+        api_key : str
+            The API key of the tenant
+        account : str
+            The name of the account of the API key, like the account option of a configuration
+
+        Returns
+        -------
+        Dbhub
+            A client using the API key, reused as long as it is among the max_clients most recently used
+        """
+        client = self._clients.get((api_key, account))
+        if client is None:
+            client = Dbhub._shared(self._options, api_key, self.transport, self._query_cache, self._heads, self._schemas, account=account)
+            self._clients.put((api_key, account), client)
+        return client
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'clients': len(self._clients),
+            'cached_queries': len(self._query_cache),
+        }
+
+    def close(self):
+        self._clients.clear()
+        self._query_cache.clear()
+        self._heads.clear()
+        self._schemas.clear()
+        self.transport.close()
@@ -0,0 +1,241 @@
+import datetime
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from pydbhub.dbhub import Identifier
+
+
+# MirrorReport holds the outcome of a mirror of databases
+@dataclass()
+class MirrorReport:
+    databases: int = 0
+    unchanged: int = 0
+    commits: int = 0
+    files: int = 0
+    downloaded: int = 0
+    bytes_downloaded: int = 0
+    seconds: float = 0.0
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+class _HashingWriter(object):
+    # Hashes what is written to a file on the way
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> int:
+        self.sha.update(chunk)
+        return self.fileobj.write(chunk)
+
+
+class ObjectStore(object):
+    def __init__(self, root: str):
+        """
+        A local directory keeping database files by their sha256, so a file shared by several commits
+        or databases is stored once:
+
+            objects/<first 2 hex digits>/<sha256>    the database files
+            databases/<owner>/<name>.json           the branch heads and commits of each database
+            tmp/                                    the files being written
+
+        Parameters
+        ----------
+        root : str
+            The directory of the store, created if needed
+        """
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, 'objects', sha256[:2], sha256)
+
+    def has(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def clean(self):
+        # Removes the files left by an interrupted mirror
+        for path in glob.glob(os.path.join(self.root, 'tmp', '*.part')):
+            os.remove(path)
+
+    def add(self, sha256: str, write: Callable[[Any], Tuple[int, str]]) -> Tuple[int, str]:
+        """
+        Streams a file into the store. It only appears in the store once fully written and checked against its sha256.
+
+        Parameters
+        ----------
+        sha256 : str
+            The expected sha256 of the file
+        write : Callable[[Any], Tuple[int, str]]
+            Writes the file to the file object it is given, returning the number of bytes written and an error if any
+
+        Returns
+        -------
+        Tuple[int, str]
+            The returned data is
+                - the size of the file
+                - a string describe error if occurs
+        """
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer = _HashingWriter(f)
+                size, err = write(writer)
+                if err:
+                    return None, err
+                f.flush()
+                os.fsync(f.fileno())
+            if writer.sha.hexdigest() != sha256:
+                return None, f"Downloaded file doesn't match its sha256 {sha256}"
+            os.makedirs(os.path.dirname(self.path(sha256)), exist_ok=True)
+            os.replace(tmp, self.path(sha256))
+            tmp = None
+            return size, None
+        finally:
+            if tmp is not None:
+                os.remove(tmp)
+
+    def _ref_path(self, db_owner: str, db_name: str) -> str:
+        return os.path.join(self.root, 'databases', _quote(db_owner), _quote(db_name) + '.json')
+
+    def read_ref(self, db_owner: str, db_name: str) -> Dict:
+        # The branch heads and commits of a database as of its last complete mirror, None if never mirrored
+        try:
+            with open(self._ref_path(db_owner, db_name), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_ref(self, db_owner: str, db_name: str, ref: Dict):
+        path = self._ref_path(db_owner, db_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'), suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(ref, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+def _quote(name: str) -> str:
+    # A file name for an owner or database name
+    return urllib.parse.quote(name, safe=" ()+,-.=@_")
+
+
+def _plain(value: Any) -> Any:
+    # The JSON counterpart of the objects returned by Dbhub
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if hasattr(value, '__dict__'):
+        return {k: _plain(v) for k, v in vars(value).items()}
+    return value
+
+
+def _files(ref: Dict) -> Dict[str, str]:
+    # The sha256 of each database file of the commits of a database, along with one commit holding it
+    files = {}
+    for commit in ref['commits']:
+        for entry in commit.get('tree', {}).get('entries', []):
+            if entry.get('sha256') and entry.get('entry_type', 'db') == 'db':
+                files.setdefault(entry['sha256'], commit['id'])
+    return files
+
+
+def mirror(client, root: str, databases: Iterable[Tuple[str, str]], max_workers: int = 4,
+           progress: Callable[[MirrorReport], None] = None) -> MirrorReport:
+    """
+    Mirrors the database files of all the commits of databases into an ObjectStore.
+
+    Each database costs one request to its branches while its heads don't move since its last mirror.
+    Otherwise its commits are listed, and only the files whose sha256 isn't in the store yet are downloaded,
+    each file once whatever the number of commits and databases holding it, streamed to disk and checked.
+    A database is recorded once all its files are stored, so an interrupted mirror resumes where it stopped.
+
+    Parameters
+    ----------
+    client : Dbhub
+        The client sending the requests
+    root : str
+        The directory of the store
+    databases : Iterable[Tuple[str, str]]
+        The (owner, name) of the databases to mirror
+    max_workers : int
+        The maximum number of requests running at the same time
+    progress : Callable[[MirrorReport], None]
+        Called after each file downloaded, with the report so far
+
+    Returns
+    -------
+    MirrorReport
+        The numbers of databases, commits and files, the files downloaded and the errors, by database or sha256
+    """
+    store = ObjectStore(root)
+    store.clean()
+    report = MirrorReport()
+    start = time.monotonic()
+
+    def examine(db):
+        db_owner, db_name = db
+        branches, default_branch, err = client.Branches(db_owner, db_name)
+        if branches is None:
+            return None, False, err or "Failed to list the branches"
+        heads = {name: branch.commit for name, branch in branches.items()}
+        ref = store.read_ref(db_owner, db_name)
+        if ref is not None and ref['heads'] == heads and all(store.has(sha256) for sha256 in _files(ref)):
+            return ref, True, None
+        commits, err = client.Commits(db_owner, db_name)
+        if commits is None:
+            return None, False, err or "Failed to list the commits"
+        ref = {'db_owner': db_owner, 'db_name': db_name, 'default_branch': default_branch, 'heads': heads, 'commits': _plain(commits)}
+        return ref, False, None
+
+    refs = {}
+    for db, (ref, unchanged, err) in client._fanout(examine, databases, max_workers):
+        report.databases += 1
+        if err:
+            report.errors[f'{db[0]}/{db[1]}'] = str(err)
+            continue
+        report.commits += len(ref['commits'])
+        if unchanged:
+            report.unchanged += 1
+        else:
+            refs[db] = ref
+
+    # Each missing file is downloaded once, from one of the commits holding it
+    sources = {}
+    for db, ref in refs.items():
+        for sha256, commit_id in _files(ref).items():
+            sources.setdefault(sha256, (db, commit_id))
+    report.files = len(sources)
+    missing = [(sha256, db, commit_id) for sha256, (db, commit_id) in sources.items() if not store.has(sha256)]
+
+    def download(item):
+        sha256, (db_owner, db_name), commit_id = item
+        return store.add(sha256, lambda f: client.DownloadTo(db_owner, db_name, f, ident=Identifier(commit_id=commit_id)))
+
+    for (sha256, _, _), (size, err) in client._fanout(download, missing, max_workers):
+        if err:
+            report.errors[sha256] = str(err)
+        else:
+            report.downloaded += 1
+            report.bytes_downloaded += size
+        report.seconds = time.monotonic() - start
+        if progress is not None:
+            progress(report)
+
+    for (db_owner, db_name), ref in refs.items():
+        if all(store.has(sha256) for sha256 in _files(ref)):
+            store.write_ref(db_owner, db_name, ref)
+    report.seconds = time.monotonic() - start
+    return report
+
@@ -0,0 +1,88 @@
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+# Row is a read-only dictionnary view of one row of Rows, created on access
+class Row(Mapping):
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, index: Dict[str, int], values: tuple):
+        self._index = index
+        self._values = values
+
+    def __getitem__(self, name: str) -> Any:
+        return self._values[self._index[name]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._index
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    @property
+    def values_tuple(self) -> tuple:
+        # The values of the row, in the order of the columns
+        return self._values
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: self._values[i] for name, i in self._index.items()}
+
+
+# Rows holds the result of a query as one header of column names shared by all the rows, each row being a tuple
+class Rows(Sequence):
+    __slots__ = ('columns', 'tuples', '_index')
+
+    def __init__(self, columns: Tuple[str, ...], tuples: Iterable[tuple]):
+        """
+        A compact query result: rows are plain tuples instead of dictionnaries repeating the column names,
+        which takes several times less memory. Indexing or iterating gives a Row, a read-only dictionnary view
+        of the row, so code written for the dictionnaries returned by Query() keeps working.
+        The rows are kept in a tuple: as nothing can change them, a Rows can be shared, like the cached results of Query().
+
+        Parameters
+        ----------
+        columns : Tuple[str, ...]
+            The names of the columns. When a name is repeated, looking it up gives its last column, like a dictionnary.
+        tuples : Iterable[tuple]
+            The values of each row, in the order of the columns
+        """
+        self.columns = columns
+        self.tuples = tuple(tuples)
+        self._index = {name: i for i, name in enumerate(columns)}
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Rows(self.columns, self.tuples[i])
+        return Row(self._index, self.tuples[i])
+
+    def __len__(self) -> int:
+        return len(self.tuples)
+
+    def __iter__(self) -> Iterator[Row]:
+        index = self._index
+        return (Row(index, values) for values in self.tuples)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Rows):
+            return self.columns == other.columns and self.tuples == other.tuples
+        if isinstance(other, list):
+            return len(self) == len(other) and all(row == item for row, item in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Rows(columns={self.columns!r}, {len(self.tuples)} rows)"
+
+    def column(self, name: str) -> list:
+        # The values of one column
+        i = self._index[name]
+        return [values[i] for values in self.tuples]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        # The rows as dictionnaries, like Query() returns them
+        return [row.to_dict() for row in self]
@@ -0,0 +1,137 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set
+
+# Actions a read-only statement may need, as reported to the SQLite authorizer
+_READ_ACTIONS = {
+    20,  # SQLITE_READ
+    21,  # SQLITE_SELECT
+    31,  # SQLITE_FUNCTION
+    33,  # SQLITE_RECURSIVE
+}
+
+# Errors which may come from the local SQLite lacking what the server has (extension functions, virtual tables,
+# indexes the snapshot doesn't describe fully), rather than from the statement itself
+_UNCERTAIN_ERRORS = ('no such function', 'no such collation', 'no such module', 'no such index', 'no query solution')
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _authorize(action: int, arg1, arg2, db_name, trigger) -> int:
+    # SQLITE_OK or SQLITE_DENY
+    return 0 if action in _READ_ACTIONS else 1
+
+
+# Schema holds the structure of a database at a given commit: its tables and views along with their columns, and its indexes
+@dataclass()
+class Schema:
+    commit: str = ''
+    tables: Dict[str, List[Any]] = field(default_factory=dict)
+    views: Dict[str, List[Any]] = field(default_factory=dict)
+    indexes: List[Any] = field(default_factory=list)
+    _db: Any = field(default=None, init=False, repr=False, compare=False)
+    # Lower case names of the tables and views the local database couldn't create (eg sqlite_sequence)
+    _missing: Set[str] = field(default_factory=set, init=False, repr=False, compare=False)
+    _lock: Any = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def columns(self, name: str) -> List[Any]:
+        """
+        Returns the columns of a table or view, as returned by Dbhub.Columns().
+
+        Parameters
+        ----------
+        name : str
+            The name of the table or view
+
+        Returns
+        -------
+        List
+            The details of each column
+        """
+        if name in self.tables:
+            return self.tables[name]
+        if name in self.views:
+            return self.views[name]
+        raise KeyError(name)
+
+    def copy(self) -> 'Schema':
+        """
+        Returns a copy of the schema, down to its columns and indexes, which can be changed without changing this one.
+        """
+        import copy
+
+        return Schema(commit=self.commit, tables=copy.deepcopy(self.tables), views=copy.deepcopy(self.views),
+                      indexes=copy.deepcopy(self.indexes))
+
+    def _database(self):
+        # An empty in-memory database with the tables and indexes of the schema. Views are created as tables
+        # of the same columns: their definition isn't known, only what they return.
+        import sqlite3
+
+        db = sqlite3.connect(':memory:', check_same_thread=False)
+        for name, columns in list(self.tables.items()) + list(self.views.items()):
+            definition = ', '.join(
+                f'{_quote_identifier(c.name)} {getattr(c, "data_type", "") or ""}'.rstrip() for c in columns
+            )
+            try:
+                db.execute(f'CREATE TABLE {_quote_identifier(name)} ({definition or "_"})')
+            except sqlite3.DatabaseError:
+                # Reserved (sqlite_sequence, sqlite_stat1...) or otherwise odd: statements using it are left to the server
+                self._missing.add(name.lower())
+        for index in self.indexes:
+            # For INDEXED BY clauses. Indexes on expressions, whose columns have no name, are left out.
+            columns = [getattr(c, 'name', None) for c in getattr(index, 'columns', None) or []]
+            if not columns or not all(columns) or getattr(index, 'table', '') not in self.tables:
+                continue
+            try:
+                db.execute(f'CREATE INDEX {_quote_identifier(index.name)} ON {_quote_identifier(index.table)} '
+                           f'({", ".join(_quote_identifier(c) for c in columns)})')
+            except sqlite3.DatabaseError:
+                pass
+        db.set_authorizer(_authorize)
+        return db
+
+    def check(self, sql: str) -> str:
+        """
+        Checks a statement locally, by preparing it against an empty database of the same schema.
+        Nothing is sent to DBHub.io, and nothing is run: the statement is only compiled, with EXPLAIN.
+
+        Parameters
+        ----------
+        sql : str
+            The SQL statement, with its parameters already bound
+
+        Returns
+        -------
+        str
+            Why the statement would be rejected (syntax error, unknown table or column, statement other
+            than a single SELECT), or None if it looks valid
+        """
+        import sqlite3
+
+        with self._lock:
+            if self._db is None:
+                self._db = self._database()
+            try:
+                self._db.execute('EXPLAIN ' + sql).fetchall()
+            except sqlite3.Warning as e:
+                # Raised for more than one statement
+                return str(e)
+            except sqlite3.DatabaseError as e:
+                message = str(e)
+                if message.startswith(_UNCERTAIN_ERRORS):
+                    return None
+                if message.startswith('no such table: '):
+                    name = message[len('no such table: '):].split('.')[-1]
+                    if name.lower() in self._missing:
+                        return None
+                    # A table-valued function the local SQLite lacks (generate_series...)
+                    if re.search(r'(?<![\w$])' + re.escape(name) + r'["`\]]?\s*\(', sql, re.IGNORECASE):
+                        return None
+                if message == 'not authorized':
+                    return 'Only SELECT statements are allowed'
+                return message
+        return None
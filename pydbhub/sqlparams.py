@@ -0,0 +1,200 @@
+import re
+import math
+import base64
+import datetime
+import decimal
+import functools
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Optional, Sequence, Union
+
+# Parameters bound to a SQL template, either positional ("?", "?NNN") or named (":name", "@name", "$name")
+Params = Union[Sequence[Any], Dict[str, Any]]
+
+# Everything that may contain a "?" or ":" which is not a placeholder is matched first, and skipped
+_TOKENS = re.compile(r"""
+      '(?:[^']|'')*'                  # string or blob literal
+    | "(?:[^"]|"")*"                  # quoted identifier
+    | `(?:[^`]|``)*`                  # MySQL style quoted identifier
+    | \[[^\]]*\]                      # MS Access style quoted identifier
+    | --[^\n]*                        # line comment
+    | /\*.*?(?:\*/|\Z)                # block comment
+    | \?(?P<index>\d*)                # positional placeholder
+    | [:@$](?P<name>[A-Za-z0-9_]+)    # named placeholder
+""", re.VERBOSE | re.DOTALL)
+
+
+def quote(value: Any) -> str:
+    """
+    Returns the SQLite literal representation of a Python value.
+
+    Parameters
+    ----------
+    value : Any
+        None, bool, int, float, Decimal, str, bytes, date or datetime
+
+    Returns
+    -------
+    str
+        The SQL literal, safe to embed in a statement
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NULL'
+        if math.isinf(value):
+            return '9e999' if value > 0 else '-9e999'
+        return repr(value)
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            raise ValueError(f"Can't bind non finite decimal value: {value}")
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "X'" + bytes(value).hex() + "'"
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        value = value.isoformat(sep=' ') if isinstance(value, datetime.datetime) else value.isoformat()
+    if isinstance(value, str):
+        if '\x00' in value:
+            raise ValueError("Can't bind a string containing a NUL character")
+        return "'" + value.replace("'", "''") + "'"
+    raise TypeError(f"Can't bind a value of type {type(value).__name__}")
+
+
+class Statement(object):
+    def __init__(self, sql: str):
+        """
+        Splits a SQL template into literal text chunks and parameter slots, so it can be bound many times.
+
+        Parameters
+        ----------
+        sql : str
+            The SQL template
+        """
+        self.sql = sql
+        chunks = []
+        slots = []
+        start = 0
+        highest = 0
+        for match in _TOKENS.finditer(sql):
+            index, name = match.group('index'), match.group('name')
+            if index is None and name is None:
+                continue
+            if name is not None:
+                slot = name
+            else:
+                slot = int(index) if index else highest + 1
+                if slot < 1:
+                    raise ValueError(f"Invalid parameter index ?{index}")
+                highest = max(highest, slot)
+                slot -= 1
+            chunks.append(sql[start:match.start()])
+            slots.append(slot)
+            start = match.end()
+        chunks.append(sql[start:])
+        self.chunks = tuple(chunks)
+        self.slots = tuple(slots)
+        self.param_count = highest
+
+    def bind(self, params: Optional[Params] = None) -> str:
+        """
+        Returns the SQL text with every placeholder replaced by the quoted value of its parameter.
+
+        Parameters
+        ----------
+        params : Params
+            A sequence for positional placeholders or a mapping for named ones
+
+        Returns
+        -------
+        str
+            The bound SQL statement
+        """
+        if not self.slots:
+            if params:
+                raise ValueError("The SQL statement has no placeholder but parameters were given")
+            return self.sql
+        if params is None:
+            raise ValueError(f"The SQL statement expects {len(self.slots)} parameter(s), none given")
+
+        named = isinstance(params, Mapping)
+        if not named and len(params) != self.param_count:
+            raise ValueError(f"The SQL statement expects {self.param_count} parameter(s), {len(params)} given")
+
+        parts = [self.chunks[0]]
+        for slot, chunk in zip(self.slots, self.chunks[1:]):
+            if isinstance(slot, str) != named:
+                raise ValueError("Positional and named parameters can't be mixed")
+            try:
+                value = params[slot]
+            except KeyError:
+                raise ValueError(f"Missing value for parameter :{slot}")
+            parts.append(quote(value))
+            parts.append(chunk)
+        return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=256)
+def prepare(sql: str) -> Statement:
+    """
+    Returns the prepared statement of a SQL template. Prepared statements are cached by template.
+    """
+    return Statement(sql)
+
+
+def params_key(params: Optional[Params]) -> Optional[Hashable]:
+    """
+    Returns a hashable key identifying a set of parameters, or None if a value isn't hashable.
+    Value types are part of the key, as 1, 1.0 and True don't bind to the same literal.
+    """
+    if params is None:
+        return ()
+    if isinstance(params, Mapping):
+        items = sorted(params.items(), key=lambda item: item[0])
+        key = ('named',) + tuple((k, type(v), v) for k, v in items)
+    else:
+        key = tuple((type(v), v) for v in params)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+@functools.lru_cache(maxsize=1024)
+def _encode_cached(sql: str, key: Hashable) -> bytes:
+    if key and key[0] == 'named':
+        params = {k: v for k, _, v in key[1:]}
+    else:
+        params = [v for _, v in key]
+    return _encode(sql, params)
+
+
+def _encode(sql: str, params: Optional[Params]) -> bytes:
+    return base64.b64encode(prepare(sql).bind(params).encode('utf-8'))
+
+
+def encode(sql: str, params: Optional[Params] = None) -> bytes:
+    """
+    Binds the parameters to a SQL template and returns the statement base64 encoded, as expected by the API.
+    Encoded statements are cached by template and parameters.
+
+    Parameters
+    ----------
+    sql : str
+        The SQL template
+    params : Params
+        A sequence for positional placeholders or a mapping for named ones
+
+    Returns
+    -------
+    bytes
+        The base64 encoded UTF-8 statement
+    """
+    key = params_key(params)
+    if key is None:
+        return _encode(sql, params)
+    return _encode_cached(sql, key)
@@ -0,0 +1,101 @@
+import array
+import base64
+import binascii
+from typing import Iterator, List, Tuple
+
+# Type codes of the values returned by DBHub.io
+BINARY = 0
+IMAGE = 1
+NULL = 2
+TEXT = 3
+INTEGER = 4
+FLOAT = 5
+
+# Converts a value returned by DBHub.io to its Python counterpart, by type code
+DECODERS = {
+    BINARY: lambda v: base64.b64decode(v.encode('ascii')) if isinstance(v, str) else None,
+    IMAGE: lambda v: "",                                                  # Image - just output as an empty string (for now)
+    NULL: lambda v: None,
+    TEXT: lambda v: str(v) if isinstance(v, str) else "",
+    INTEGER: lambda v: int(v),
+    FLOAT: lambda v: float(v),
+}
+
+
+def decode(type_code: int, value):
+    """
+    Returns the Python value of a value returned by DBHub.io, given its type code.
+    """
+    return DECODERS[type_code](value)
+
+
+def _decoded_size(encoded: str) -> int:
+    # Number of bytes of a base64 encoded value, without decoding it
+    if len(encoded) % 4:
+        return len(binascii.a2b_base64(encoded))
+    return len(encoded) // 4 * 3 - (encoded[-2:].count('=') if encoded else 0)
+
+
+# BlobColumn holds the BLOB values of one column, decoded into a single buffer
+class BlobColumn(object):
+    def __init__(self, encoded: List[str]):
+        """
+        Decodes base64 encoded BLOB values into one contiguous buffer, instead of one bytes object by value.
+        Each value is then a read-only memoryview slice of the buffer, or a (start, end) pair of offsets in it.
+
+        Parameters
+        ----------
+        encoded : List[str]
+            The base64 encoded values
+        """
+        sizes = [_decoded_size(value) for value in encoded]
+        if not self.__fill(encoded, sizes, binascii.a2b_base64):
+            # A value with unusual padding (eg "QQ==QQ==") decodes to another size than its length tells:
+            # the values are decoded one by one first
+            decoded = [binascii.a2b_base64(value) for value in encoded]
+            self.__fill(decoded, [len(value) for value in decoded], bytes)
+
+    def __fill(self, values: list, sizes: List[int], decode) -> bool:
+        # Decodes the values into the buffer, returning False if one of them doesn't have its expected size
+        self.buffer = bytearray(sum(sizes))
+        self.offsets = array.array('Q', [0]) * (len(values) + 1)
+        view = memoryview(self.buffer)
+        end = 0
+        for i, (value, size) in enumerate(zip(values, sizes)):
+            start, end = end, end + size
+            # a2b_base64() reads the str as is, without an encoded copy
+            data = decode(value)
+            if len(data) != size:
+                view.release()
+                return False
+            view[start:end] = data
+            self.offsets[i + 1] = end
+        if hasattr(view, 'toreadonly'):
+            self._view = view.toreadonly()
+        else:
+            # Before Python 3.8, a read-only view needs a read-only buffer
+            view.release()
+            self.buffer = bytes(self.buffer)
+            self._view = memoryview(self.buffer)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> memoryview:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('BlobColumn index out of range')
+        return self._view[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[memoryview]:
+        view, offsets = self._view, self.offsets
+        for i in range(len(offsets) - 1):
+            yield view[offsets[i]:offsets[i + 1]]
+
+    def span(self, index: int) -> Tuple[int, int]:
+        """
+        Returns the offsets of a value in the buffer.
+        """
+        return self.offsets[index], self.offsets[index + 1]
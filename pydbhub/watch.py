@@ -0,0 +1,198 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Tuple
+
+import pydbhub.fanout as fanout
+
+
+# Watcher polls the branch heads of many databases, calling back when one of them moves
+class Watcher(object):
+    def __init__(self, client, databases: Iterable[Tuple[str, str]], callback: Callable[[Tuple[str, str], str, str, str], None],
+                 min_interval: float = 10.0, max_interval: float = 600.0, backoff: float = 2.0, jitter: float = 0.1,
+                 requests_per_second: float = 5.0, max_workers: int = 8):
+        """
+        Watches the branch heads of many databases, calling back on each change.
+
+        Each database is checked with the branches endpoint, the smallest answer telling its heads (and with the
+        http_cache option, a 304 answer when the server supports validators). A database is checked every
+        min_interval seconds after a change, and less and less often while it doesn't change, up to every
+        max_interval seconds. So the requests mostly go to the databases which change, idle ones costing about
+        one request every max_interval seconds. All the checks share a budget of requests_per_second.
+
+        Parameters
+        ----------
+        client : Dbhub
+            The client sending the requests
+        databases : Iterable[Tuple[str, str]]
+            The (owner, name) of the databases to watch
+        callback : Callable[[Tuple[str, str], str, str, str], None]
+            Called with the (owner, name) of the database, the branch, its old head and its new head, on each change.
+            The old head is None for a new branch, the new head is None for a deleted branch.
+            The first check of a database only records its heads. An exception raised by the callback is kept in
+            errors, like a failed check, and the watcher goes on: the change is recorded all the same, and isn't
+            called back again.
+        min_interval : float
+            The delay in seconds between two checks of a database which just changed
+        max_interval : float
+            The longest delay in seconds between two checks of a database
+        backoff : float
+            The factor applied to the delay of a database after a check without change, or a failed one
+        jitter : float
+            The delays are spread randomly by this share, so checks of many databases don't come in waves
+        requests_per_second : float
+            The most requests sent by second on average, for all the databases
+        max_workers : int
+            The maximum number of checks running at the same time
+        """
+        self.client = client
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.max_workers = max_workers
+        # Branch heads of each database, as of their last check
+        self.heads = {}
+        # Error of the last check of each database which failed, or of its callback
+        self.errors = {}
+        self.requests = 0
+        self.changes = 0
+        self._intervals = {}
+        # Sequence number of the entry of each database in _due: entries left by a removed database are stale
+        self._entries = {}
+        self._due = []
+        self._sequence = itertools.count()
+        self._budget = fanout.RateLimiter(requests_per_second, burst=max_workers)
+        self._random = random.Random()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        for db in databases:
+            self.add(*db)
+
+    def add(self, db_owner: str, db_name: str):
+        # Watches one more database, checked at once
+        with self._lock:
+            if (db_owner, db_name) in self._intervals:
+                return
+            self._intervals[(db_owner, db_name)] = self.min_interval
+            self.__schedule((db_owner, db_name), time.monotonic())
+        self._wake.set()
+
+    def remove(self, db_owner: str, db_name: str):
+        # Stops watching a database
+        with self._lock:
+            self._intervals.pop((db_owner, db_name), None)
+            self._entries.pop((db_owner, db_name), None)
+            self.heads.pop((db_owner, db_name), None)
+            self.errors.pop((db_owner, db_name), None)
+
+    def poll(self) -> int:
+        """
+        Checks the databases which are due, calling back on their changes.
+
+        Returns
+        -------
+        int
+            The number of changes found
+        """
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._due and self._due[0][0] <= now:
+                _, sequence, db = heapq.heappop(self._due)
+                # Entries of removed databases, even added again since, are dropped here
+                if self._entries.get(db) == sequence:
+                    due.append(db)
+
+        changes = 0
+        for db, (heads, err) in self.client._fanout(self.__check, due, self.max_workers):
+            if self._stop.is_set():
+                break
+            with self._lock:
+                if db not in self._intervals:
+                    continue
+                interval = self._intervals[db]
+                old = self.heads.get(db)
+                if heads is None:
+                    self.errors[db] = err
+                    changed = []
+                else:
+                    self.errors.pop(db, None)
+                    self.heads[db] = heads
+                    changed = [] if old is None else _changes(old, heads)
+                if changed:
+                    interval = self.min_interval
+                elif old is not None or heads is None:
+                    interval = min(self.max_interval, interval * self.backoff)
+                self._intervals[db] = interval
+                spread = interval * self._random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+                self.__schedule(db, time.monotonic() + spread)
+                self.changes += len(changed)
+            changes += len(changed)
+            for branch, old_head, new_head in changed:
+                try:
+                    self.callback(db, branch, old_head, new_head)
+                except Exception as e:
+                    with self._lock:
+                        if db in self._intervals:
+                            self.errors[db] = f"Callback failed for {db[0]}/{db[1]} ({branch}): {e!r}"
+        return changes
+
+    def __schedule(self, db: Tuple[str, str], when: float):
+        # Queues the next check of a database, replacing its previous entry. Called with the lock held.
+        sequence = next(self._sequence)
+        self._entries[db] = sequence
+        heapq.heappush(self._due, (when, sequence, db))
+
+    def __check(self, db: Tuple[str, str]) -> Tuple[Dict[str, str], str]:
+        # Returns the head of each branch of a database, within the request budget
+        if self._stop.wait(self._budget.reserve()):
+            return None, "Watcher stopped"
+        with self._lock:
+            self.requests += 1
+        try:
+            branches, _, err = self.client.Branches(*db)
+        except Exception as e:
+            return None, f"Failed to check the branches of {db[0]}/{db[1]}: {e!r}"
+        if branches is None:
+            return None, err or f"Failed to check the branches of {db[0]}/{db[1]}"
+        return {name: branch.commit for name, branch in branches.items()}, None
+
+    def run(self):
+        # Checks the databases as they are due, until stop() is called
+        while not self._stop.is_set():
+            with self._lock:
+                delay = self._due[0][0] - time.monotonic() if self._due else None
+            if delay is None or delay > 0:
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            self.poll()
+
+    def start(self) -> 'Watcher':
+        # Runs the watcher in a background thread
+        self._thread = threading.Thread(target=self.run, name='pydbhub-watch', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def __enter__(self) -> 'Watcher':
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def _changes(old: Dict[str, str], new: Dict[str, str]) -> list:
+    # The (branch, old head, new head) of each branch which moved, appeared or disappeared
+    return [(branch, old.get(branch), new.get(branch)) for branch in sorted(set(old) | set(new)) if old.get(branch) != new.get(branch)]
@@ -22,6 +22,14 @@ setuptools.setup(
         'python_dateutil',
         'rich'
     ],
+    extras_require={
+        'numpy': ['numpy'],
+        'pandas': ['pandas'],
+        'http2': ['httpx[http2]'],
+    },
+    entry_points={
+        'console_scripts': ['pydbhub=pydbhub.cli:main'],
+    },
     python_requires='>=3.7',
     classifiers=[
         "Programming Language :: Python :: 3.7",
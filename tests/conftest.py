@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from standin import StandInServer  # noqa: E402
+
+
+@pytest.fixture()
+def standin():
+    server = StandInServer().start()
+    yield server
+    server.stop()
@@ -0,0 +1,143 @@
+"""
+A local stand-in for the DBHub.io API, answering the endpoints used by the tests and benchmarks
+with deterministic data. Routes and latency can be overridden per test.
+"""
+import base64
+import hashlib
+import email.parser
+import json
+import threading
+import sys
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _parse_form(content_type: str, body: bytes) -> dict:
+    if content_type.startswith('multipart/form-data'):
+        message = email.parser.BytesParser().parsebytes(b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+        fields = {}
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            payload = part.get_payload(decode=True)
+            fields[name] = payload if part.get_filename() else payload.decode('utf-8')
+        return fields
+    return {k: v[-1] for k, v in urllib.parse.parse_qs(body.decode('utf-8'), keep_blank_values=True).items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server.standin
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        fields = _parse_form(self.headers.get('Content-Type', ''), body)
+        endpoint = self.path.rsplit('/', 1)[-1]
+        with server.lock:
+            server.hits[endpoint] += 1
+            server.headers[endpoint] = dict(self.headers)
+        delay = server.latency(endpoint, fields)
+        if delay:
+            time.sleep(delay)
+        route = server.routes.get(endpoint, getattr(server, 'route_' + endpoint, None))
+        if route is None:
+            status, payload, headers = 404, {'error': f'Unknown endpoint {endpoint}'}, {}
+        else:
+            answer = route(fields)
+            status, payload, headers = answer if len(answer) == 3 else answer + ({},)
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream' if isinstance(payload, bytes) else 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose, like the originals cut short by their hedge
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInServer(object):
+    def __init__(self):
+        self.head = 'a' * 64
+        self.routes = {}
+        self.latency = lambda endpoint, fields: 0
+        self.hits = Counter()
+        # Headers of the last request to each endpoint
+        self.headers = {}
+        self.lock = threading.Lock()
+        self._httpd = _HTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.standin = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._httpd.server_port}'
+
+    def config(self, **options) -> str:
+        lines = ['[dbhub]', 'api_key = standin', 'db_owner = standin', 'db_name = standin.sqlite', f'server = {self.url}']
+        lines += [f'{name} = {value}' for name, value in options.items()]
+        return '\n'.join(lines) + '\n'
+
+    def start(self) -> 'StandInServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def route_branches(self, fields):
+        return 200, {'branches': {'master': {'commit': self.head, 'commit_count': 1, 'description': ''}}, 'default_branch': 'master'}
+
+    def route_databases(self, fields):
+        return 200, ['standin.sqlite']
+
+    def route_tables(self, fields):
+        return 200, ['table1', 'table2']
+
+    def route_views(self, fields):
+        return 200, ['view1']
+
+    def route_indexes(self, fields):
+        return 200, [{'name': 'table1_idx', 'table': 'table1', 'columns': [{'id': 0, 'name': 'id'}]}]
+
+    def route_columns(self, fields):
+        return 200, [
+            {'column_id': 0, 'name': 'id', 'data_type': 'INTEGER', 'default_value': '', 'not_null': False, 'primary_key': 1},
+            {'column_id': 1, 'name': 'name', 'data_type': 'TEXT', 'default_value': '', 'not_null': False, 'primary_key': 0},
+        ]
+
+    def route_webpage(self, fields):
+        return 200, {'web_page': f"https://dbhub.io/{fields.get('dbowner')}/{fields.get('dbname')}"}
+
+    def route_query(self, fields):
+        # Echoes the statement, so callers can check they got the answer to their own query
+        sql = base64.b64decode(fields['sql']).decode('utf-8')
+        return 200, [[
+            {'Name': 'db', 'Type': 3, 'Value': fields.get('dbname', '')},
+            {'Name': 'sql', 'Type': 3, 'Value': sql},
+        ]]
+
+    def route_commits(self, fields):
+        # The head, holding the file answered by route_download()
+        content = self.route_download(fields)[1]
+        entry = {'name': fields.get('dbname', ''), 'entry_type': 'db', 'sha256': hashlib.sha256(content).hexdigest(),
+                 'size': len(content), 'last_modified': '2021-04-01T10:00:00Z'}
+        return 200, {self.head: {'id': self.head, 'timestamp': '2021-04-01T10:00:00Z', 'message': '', 'tree': {'entries': [entry]}}}
+
+    def route_download(self, fields):
+        return 200, b'SQLite format 3\x00' + bytes(4080)
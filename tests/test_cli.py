@@ -0,0 +1,87 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import pydbhub.cli as cli
+import pydbhub.httphub as httphub
+
+
+def test_lazy_imports():
+    code = "import sys, pydbhub.cli; print(sorted(m for m in ('requests', 'dateutil', 'pydbhub.dbhub') if m in sys.modules))"
+    out = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    assert out.strip() == '[]'
+
+
+def test_query(monkeypatch, capsys, tmp_path):
+    def send_request_json(query_url, data, **kwargs):
+        return [[{'Name': 'id', 'Type': 4, 'Value': '1'}], [{'Name': 'id', 'Type': 4, 'Value': '2'}]], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    args = ['-c', str(tmp_path / 'missing.ini'), '-k', 'key', '-f', 'jsonl', 'query', 'justinclift', 'Join Testing.sqlite',
+            'SELECT id FROM table1 WHERE id > ?', '-p', '0', '--commit', 'a' * 64]
+    assert cli.main(args) == 0
+    assert [json.loads(line) for line in capsys.readouterr().out.splitlines()] == [{'id': 1}, {'id': 2}]
+
+
+def test_query_params(capsys, tmp_path):
+    # Positional and named values can't be mixed
+    args = ['-c', str(tmp_path / 'missing.ini'), '-k', 'key', 'query', 'justinclift', 'a.sqlite', 'SELECT ?', '-p', '0', '-n', 'a=1']
+    with pytest.raises(SystemExit) as e:
+        cli.main(args)
+    assert e.value.code == 2
+    assert 'not allowed with argument' in capsys.readouterr().err
+
+
+def test_download(capsysbinary, tmp_path, standin):
+    config = tmp_path / 'pydbhub.ini'
+    config.write_text(standin.config())
+    output = tmp_path / 'a.sqlite'
+    assert cli.main(['-c', str(config), '-o', str(output), 'download', 'standin', 'a.sqlite']) == 0
+    assert output.read_bytes().startswith(b'SQLite format 3')
+    assert cli.main(['-c', str(config), 'download', 'standin', 'a.sqlite']) == 0
+    assert capsysbinary.readouterr().out == output.read_bytes()
+
+    # No partial file is left behind
+    standin.routes['download'] = lambda fields: (404, {'error': 'No such database'})
+    output.unlink()
+    assert cli.main(['-c', str(config), '-o', str(output), 'download', 'standin', 'a.sqlite']) == 1
+    assert not output.exists()
+
+
+def test_diff_defaults(monkeypatch, capsys, tmp_path):
+    sent = []
+
+    def send_request_json(query_url, data, **kwargs):
+        sent.append({name: value[1] if isinstance(value, tuple) else value for name, value in data.items()})
+        return {'diff': []}, None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    args = ['-c', str(tmp_path / 'missing.ini'), '-k', 'key', 'diff', 'justinclift', 'a.sqlite', '--commit-a', '1' * 64, '--commit-b', '2' * 64]
+    assert cli.main(args) == 0
+    assert (sent[0]['dbowner_b'], sent[0]['dbname_b']) == ('justinclift', 'a.sqlite')
+
+
+def test_missing_api_key(capsys, tmp_path, monkeypatch):
+    monkeypatch.delenv('DBHUB_API_KEY', raising=False)
+    assert cli.main(['-c', str(tmp_path / 'missing.ini'), 'databases']) == 1
+    assert 'No API key' in capsys.readouterr().err
+
+
+def test_mirror(capsys, tmp_path, standin):
+    config = tmp_path / 'pydbhub.ini'
+    # The databases of the API key belong to its account, whatever the owner of the configuration
+    config.write_text(standin.config().replace('db_owner = standin', 'db_owner = other'))
+    assert cli.main(['-c', str(config), 'mirror', str(tmp_path / 'mirror')]) == 1
+    assert 'account' in capsys.readouterr().err
+    assert cli.main(['-c', str(config), 'mirror', str(tmp_path / 'mirror'), '-j', '2', '--owner', 'standin']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert (report['databases'], report['downloaded'], report['errors']) == (1, 1, {})
+    assert standin.hits['databases'] == 1
+    assert standin.hits['download'] == 1
+
+    config.write_text(standin.config(account='standin').replace('db_owner = standin', 'db_owner = other'))
+    assert cli.main(['-c', str(config), 'mirror', str(tmp_path / 'mirror')]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert (report['databases'], report['downloaded'], report['errors']) == (1, 0, {})
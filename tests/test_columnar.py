@@ -0,0 +1,90 @@
+import base64
+
+import pytest
+
+import pydbhub.columnar as columnar
+import pydbhub.dbhub as dbhub
+import pydbhub.httphub as httphub
+
+np = pytest.importorskip('numpy')
+
+CONFIG = '''
+    [dbhub]
+    api_key = YOUR_DBHub.io_API_KEY_Here
+    db_owner = justinclift
+    db_name = Join Testing.sqlite
+'''
+
+RESPONSE = [
+    [
+        {'Name': 'id', 'Type': 4, 'Value': '1'},
+        {'Name': 'score', 'Type': 5, 'Value': '1.5'},
+        {'Name': 'name', 'Type': 3, 'Value': 'Foo'},
+        {'Name': 'blob', 'Type': 0, 'Value': base64.b64encode(b'\x00\x01').decode('ascii')},
+    ],
+    [
+        {'Name': 'id', 'Type': 4, 'Value': '2'},
+        {'Name': 'score', 'Type': 4, 'Value': '3'},
+        {'Name': 'name', 'Type': 2, 'Value': None},
+        {'Name': 'blob', 'Type': 2, 'Value': None},
+    ],
+    [
+        {'Name': 'id', 'Type': 2, 'Value': None},
+        {'Name': 'score', 'Type': 2, 'Value': None},
+        {'Name': 'name', 'Type': 3, 'Value': 'Bar'},
+        {'Name': 'blob', 'Type': 0, 'Value': ''},
+    ],
+]
+
+
+def test_to_arrays():
+    arrays = columnar.to_arrays(RESPONSE)
+    assert list(arrays) == ['id', 'score', 'name', 'blob']
+    assert arrays['id'].dtype == np.int64
+    assert arrays['id'].tolist() == [1, 2, None]
+    assert arrays['score'].dtype == np.float64
+    assert arrays['score'].tolist() == [1.5, 3.0, None]
+    assert arrays['name'].dtype == object
+    assert arrays['name'].tolist() == ['Foo', None, 'Bar']
+    assert arrays['blob'].tolist() == [b'\x00\x01', None, b'']
+    assert columnar.to_arrays([]) == {}
+
+
+def test_to_arrays_overflow():
+    arrays = columnar.to_arrays([[{'Name': 'big', 'Type': 4, 'Value': str(2 ** 70)}]])
+    assert arrays['big'].dtype == object
+    assert arrays['big'].tolist() == [2 ** 70]
+
+
+def test_to_dataframe():
+    pd = pytest.importorskip('pandas')
+    frame = columnar.to_dataframe(RESPONSE)
+    assert list(frame.columns) == ['id', 'score', 'name', 'blob']
+    assert str(frame['id'].dtype) == 'Int64'
+    assert str(frame['score'].dtype) == 'Float64'
+    assert frame['id'].tolist()[:2] == [1, 2]
+    assert frame['id'].isna().tolist() == [False, False, True]
+    assert frame['name'].tolist() == ['Foo', None, 'Bar']
+    assert columnar.to_dataframe([]).empty
+    assert isinstance(frame, pd.DataFrame)
+
+
+def test_query_arrays(monkeypatch):
+    connection = dbhub.Dbhub(config_data=CONFIG)
+    calls = []
+
+    def send_request_json(query_url, data, **kwargs):
+        calls.append(query_url)
+        return RESPONSE, None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    ident = dbhub.Identifier(commit_id='c' * 64)
+    for _ in range(2):
+        arrays, err = connection.QueryArrays('justinclift', 'a.sqlite', 'SELECT * FROM t', ident=ident)
+        assert err is None, err
+        assert arrays['id'].tolist() == [1, 2, None]
+        arrays['id'][0] = 10
+    rows, err = connection.Query('justinclift', 'a.sqlite', 'SELECT * FROM t', ident=ident)
+    assert rows[0]['id'] == 1
+    # Each result kind is cached on its own, and cached results aren't changed by the caller
+    assert len(calls) == 2
@@ -0,0 +1,59 @@
+import pytest
+
+from pydbhub.commitgraph import CommitGraph
+
+
+class Commit(object):
+    def __init__(self, id, parent='', other_parents=None):
+        self.id = id
+        self.parent = parent
+        self.other_parents = other_parents
+
+
+#   a - b - c - f - g     (master)
+#        \     /
+#         d - e - h       (feature)
+@pytest.fixture()
+def graph():
+    return CommitGraph([
+        Commit('g', 'f'), Commit('h', 'e'), Commit('f', 'c', ['e']), Commit('e', 'd'),
+        Commit('d', 'b'), Commit('c', 'b'), Commit('b', 'a'), Commit('a'),
+    ])
+
+
+def test_generation(graph):
+    assert len(graph) == 8
+    assert graph.roots() == ['a']
+    assert graph.generation('a') == 1
+    assert graph.generation('f') == 5
+    assert graph.parents('f') == ['c', 'e']
+    assert sorted(graph.children('b')) == ['c', 'd']
+
+
+def test_is_ancestor(graph):
+    assert graph.is_ancestor('e', 'g')
+    assert graph.is_ancestor('g', 'g')
+    assert not graph.is_ancestor('h', 'g')
+    assert not graph.is_ancestor('c', 'h')
+    assert graph.ancestors('e') == {'a', 'b', 'd', 'e'}
+
+
+def test_merge_base(graph):
+    assert graph.merge_base('g', 'h') == 'e'
+    assert graph.merge_base('c', 'd') == 'b'
+    assert graph.merge_base('g', 'c') == 'c'
+    assert graph.merge_bases('h', 'h') == ['h']
+
+
+def test_criss_cross_merge_bases():
+    graph = CommitGraph([
+        Commit('a'), Commit('b', 'a'), Commit('c', 'a'),
+        Commit('d', 'b', ['c']), Commit('e', 'c', ['b']),
+    ])
+    assert sorted(graph.merge_bases('d', 'e')) == ['b', 'c']
+
+
+def test_range(graph):
+    assert graph.range('h', 'g') == ['g', 'f', 'c']
+    assert graph.range('c', 'h') == ['h', 'e', 'd']
+    assert graph.range('g', 'c') == []
@@ -1,8 +1,15 @@
 import pytest
 import configparser
 import os
+import base64
+import datetime
+import hashlib
+import json
+import threading
+import time
 
 import pydbhub.dbhub as dbhub
+import pydbhub.httphub as httphub
 
 CONFIG = '''
     [dbhub]
@@ -175,3 +182,315 @@ def test_webpage(connection):
     webpage, err = connection.Webpage("justinclift", "Join Testing.sqlite")
     assert err is None, err
     assert webpage == 'https://dbhub.io/justinclift/Join Testing.sqlite'
+
+
+def test_query_params_cache(connection, monkeypatch):
+    calls = []
+
+    def send_request_json(query_url, data, **kwargs):
+        calls.append(base64.b64decode(data['sql']).decode('utf-8'))
+        return [[{'Name': 'name', 'Type': 3, 'Value': 'Foo'}]], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    ident = dbhub.Identifier(commit_id='7beb90a62a842dcb095592a5083f22533552da17eb72891d26c87ae48070885d')
+    for _ in range(3):
+        result, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT name FROM table1 WHERE id = ?", [1], ident=ident)
+        assert err is None, err
+        assert result == [{'name': 'Foo'}]
+        # Changing a result doesn't change the cached one
+        result[0]['name'] = 'Bar'
+    assert calls == ["SELECT name FROM table1 WHERE id = 1"]
+
+    result, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT name FROM table1 WHERE id = ?", [])
+    assert result is None
+    assert err is not None
+
+
+def test_query_pool_blobs(connection, monkeypatch):
+    blobs = [b'', b'\x00', b'\x00\x01', b'\x00\x01\x02', bytes(range(256)) * 4]
+
+    def send_request_json(query_url, data, **kwargs):
+        res = [[{'Name': 'id', 'Type': 4, 'Value': str(i)}, {'Name': 'data', 'Type': 0, 'Value': base64.b64encode(b).decode('ascii')}] for i, b in enumerate(blobs)]
+        return res + [[{'Name': 'id', 'Type': 4, 'Value': '9'}, {'Name': 'data', 'Type': 2, 'Value': None}]], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    ident = dbhub.Identifier(commit_id='b' * 64)
+    rows, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id, data FROM blobs", ident=ident, pool_blobs=True)
+    assert err is None, err
+    assert [list(row) for row in rows] == [['id', 'data']] * 6
+    assert [bytes(row['data']) for row in rows[:-1]] == blobs
+    assert rows[-1]['data'] is None
+    assert all(isinstance(row['data'], memoryview) and row['data'].readonly for row in rows[:-1])
+    assert rows[1]['data'].obj is rows[4]['data'].obj
+
+    rows, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id, data FROM blobs", ident=ident)
+    assert [row['data'] for row in rows[:-1]] == blobs
+
+    compact, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id, data FROM blobs", ident=ident, compact=True, pool_blobs=True)
+    assert err is None, err
+    assert compact.columns == ('id', 'data')
+    assert [bytes(data) for data in compact.column('data')[:-1]] == blobs
+    assert compact[1]['data'].obj is compact[4]['data'].obj
+
+
+def test_query_compact(connection, monkeypatch):
+    def send_request_json(query_url, data, **kwargs):
+        return [
+            [{'Name': 'id', 'Type': 4, 'Value': '1'}, {'Name': 'name', 'Type': 3, 'Value': 'a'}, {'Name': 'score', 'Type': 5, 'Value': '1.5'}],
+            [{'Name': 'id', 'Type': 4, 'Value': '2'}, {'Name': 'name', 'Type': 2, 'Value': None}, {'Name': 'score', 'Type': 5, 'Value': '2'}],
+        ], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    ident = dbhub.Identifier(commit_id='c' * 64)
+    rows, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id, name, score FROM t", ident=ident, compact=True)
+    assert err is None, err
+    assert rows.columns == ('id', 'name', 'score')
+    assert rows.tuples == ((1, 'a', 1.5), (2, None, 2.0))
+    # Read like the dictionnaries of Query()
+    dicts, _ = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id, name, score FROM t", ident=ident)
+    assert rows == dicts
+    assert rows.to_dicts() == dicts
+    assert [dict(row) for row in rows] == dicts
+    assert rows[0]['name'] == 'a' and rows[-1].get('name') is None and rows[0].get('other', 0) == 0
+    assert list(rows[0].items()) == [('id', 1), ('name', 'a'), ('score', 1.5)]
+    assert rows[1:].tuples == ((2, None, 2.0),)
+    # The cached result is shared, as it can't be changed
+    assert connection.Query("justinclift", "Join Testing.sqlite", "SELECT id, name, score FROM t", ident=ident, compact=True)[0] is rows
+
+    monkeypatch.setattr(httphub, 'send_request_json', lambda query_url, data, **kwargs: ([], None))
+    rows, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT 1 WHERE 0", ident=ident, compact=True)
+    assert len(rows) == 0 and rows.columns == ()
+
+
+def test_query_head_cache(monkeypatch):
+    connection = dbhub.Dbhub(config_data=CONFIG + '    head_check_interval = 0\n')
+    head = {'commit': 'a' * 64}
+    calls = []
+
+    def send_request_json(query_url, data, **kwargs):
+        calls.append(query_url.rsplit('/', 1)[-1])
+        if query_url.endswith('/v1/branches'):
+            return {'branches': {'master': {'commit': head['commit']}}, 'default_branch': 'master'}, None
+        assert data['commit'] == (None, head['commit'])
+        return [[{'Name': 'id', 'Type': 4, 'Value': '1'}]], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    for _ in range(2):
+        result, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id FROM table1")
+        assert err is None, err
+        assert result == [{'id': 1}]
+    assert calls == ['branches', 'query', 'branches']
+
+    head['commit'] = 'b' * 64
+    result, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id FROM table1")
+    assert err is None, err
+    assert calls[3:] == ['branches', 'query']
+
+
+def test_query_head_check_failure(monkeypatch):
+    connection = dbhub.Dbhub(config_data=CONFIG + '    head_check_interval = 60\n')
+    calls = []
+
+    def send_request_json(query_url, data, **kwargs):
+        calls.append(query_url.rsplit('/', 1)[-1])
+        if query_url.endswith('/v1/branches'):
+            return None, 'Connection refused'
+        assert 'commit' not in data
+        return [[{'Name': 'id', 'Type': 4, 'Value': '1'}]], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    for _ in range(3):
+        result, err = connection.Query("justinclift", "Join Testing.sqlite", "SELECT id FROM table1")
+        assert err is None, err
+        assert result == [{'id': 1}]
+    # The failed check isn't sent again before head_check_interval
+    assert calls == ['branches', 'query', 'query', 'query']
+
+
+def test_query_many(monkeypatch):
+    connection = dbhub.Dbhub(config_data=CONFIG + '    query_cache_size = 0\n')
+
+    def send_request_json(query_url, data, **kwargs):
+        if data['dbname'][1] == 'missing.sqlite':
+            return {'error': 'Database not found'}, '404 Client Error'
+        return [[{'Name': 'db', 'Type': 3, 'Value': data['dbname'][1]}]], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    targets = [('justinclift', f'db{i}.sqlite') for i in range(10)] + [('justinclift', 'missing.sqlite')]
+    results, errors = connection.QueryMany(targets, "SELECT 1", max_workers=4)
+    assert len(results) == 10
+    assert results[('justinclift', 'db3.sqlite')] == [{'db': 'db3.sqlite'}]
+    assert list(errors) == [('justinclift', 'missing.sqlite')]
+
+
+def test_upload_many(connection, monkeypatch, tmp_path):
+    attempts = {}
+
+    def send_upload(query_url, data, db_bytes, **kwargs):
+        name = data['dbname'][1]
+        attempts[name] = attempts.get(name, 0) + 1
+        assert len(db_bytes.read()) == 8192
+        if name == 'flaky.sqlite' and attempts[name] == 1:
+            return None, httphub.StatusError('500 Server Error', 500)
+        if name == 'offline.sqlite' and attempts[name] == 1:
+            return None, 'Connection refused'
+        if name == 'bad.sqlite':
+            return {'error': 'Invalid database'}, httphub.StatusError('400 Client Error', 400)
+        return {'commit': 'c' * 64, 'url': ''}, None
+
+    monkeypatch.setattr(httphub, 'send_upload', send_upload)
+    path = tmp_path / 'example.db'
+    path.write_bytes(b'\0' * 8192)
+    jobs = [(name, dbhub.UploadInformation(), str(path)) for name in ('a.sqlite', 'flaky.sqlite', 'offline.sqlite', 'bad.sqlite')]
+    progress = []
+    report, err = connection.UploadMany(jobs, retries=1, retry_delay=0, progress=lambda result, report: progress.append(result.db_name))
+    assert err == '1 of 4 uploads failed'
+    assert sorted(progress) == ['a.sqlite', 'bad.sqlite', 'flaky.sqlite', 'offline.sqlite']
+    # Refused uploads aren't retried
+    assert attempts == {'a.sqlite': 1, 'flaky.sqlite': 2, 'offline.sqlite': 2, 'bad.sqlite': 1}
+    assert [r.db_name for r in report.failed] == ['bad.sqlite']
+    assert report.failed[0].err == "{'error': 'Invalid database'}"
+    assert report.bytes_sent == 3 * 8192
+
+
+def test_upload_skip_unchanged(connection, monkeypatch, tmp_path):
+    path = tmp_path / 'example.db'
+    path.write_bytes(b'\0' * 4096)
+    sha256 = hashlib.sha256(b'\0' * 4096).hexdigest()
+    heads = {'somedb.sqlite': 'd' * 64, 'otherdb.sqlite': 'f' * 64}
+    uploads = []
+    calls = []
+
+    def send_request_json(query_url, data, **kwargs):
+        calls.append((query_url.rsplit('/', 1)[-1], data['dbowner'][1]))
+        head = heads[data['dbname'][1]]
+        if query_url.endswith('/v1/branches'):
+            return {'branches': {'master': {'commit': head}}, 'default_branch': 'master'}, None
+        tree = {'entries': [{'name': 'somedb.sqlite', 'sha256': sha256, 'last_modified': '2021-06-01T10:00:00Z'}]}
+        return {head: {'id': head, 'timestamp': '2021-06-01T10:00:00Z', 'tree': tree}}, None
+
+    def send_upload(query_url, data, db_bytes, **kwargs):
+        uploads.append(data['dbname'][1])
+        heads[data['dbname'][1]] = 'e' * 64
+        return {'commit': 'e' * 64}, None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    monkeypatch.setattr(httphub, 'send_upload', send_upload)
+    # Without the account of the API key, databases are always uploaded
+    with open(path, 'rb') as f:
+        res, err = connection.Upload('somedb.sqlite', dbhub.UploadInformation(), f, skip_unchanged=True)
+    assert res == {'commit': 'e' * 64}
+    assert calls == []
+
+    heads['somedb.sqlite'] = 'd' * 64
+    connection = dbhub.Dbhub(config_data=CONFIG + '    account = uploader\n')
+    for _ in range(2):
+        with open(path, 'rb') as f:
+            res, err = connection.Upload('somedb.sqlite', dbhub.UploadInformation(), f, skip_unchanged=True)
+        assert err is None, err
+        assert res == {'commit': 'd' * 64, 'skipped': True}
+    # The account is checked, not db_owner, and the commits are only listed for a new head
+    assert calls == [('branches', 'uploader'), ('commits', 'uploader'), ('branches', 'uploader')]
+
+    for _ in range(2):
+        with open(path, 'rb') as f:
+            res, err = connection.Upload('otherdb.sqlite', dbhub.UploadInformation(), f, skip_unchanged=True)
+    # The sha256 of an uploaded file is known without listing the commits
+    assert res == {'commit': 'e' * 64, 'skipped': True}
+    assert uploads == ['somedb.sqlite', 'otherdb.sqlite']
+    assert [call[0] for call in calls[3:]] == ['branches', 'commits', 'branches']
+
+
+def test_commits_history_store(monkeypatch, tmp_path):
+    connection = dbhub.Dbhub(config_data=CONFIG + f'    history_store = {tmp_path / "history.sqlite"}\n    head_check_interval = 0\n')
+    entries = {'entries': [{'name': 'a.sqlite', 'sha256': '', 'last_modified': '2021-06-01T10:00:00Z'}]}
+    history = {'1' * 64: {'id': '1' * 64, 'parent': '', 'timestamp': '2021-06-01T10:00:00Z', 'tree': entries}}
+    head = {'commit': '1' * 64}
+    calls = []
+
+    def send_request_json(query_url, data, **kwargs):
+        calls.append(query_url.rsplit('/', 1)[-1])
+        if query_url.endswith('/v1/branches'):
+            return {'branches': {'master': {'commit': head['commit']}}, 'default_branch': 'master'}, None
+        return dict(history), None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    for _ in range(2):
+        commits, err = connection.Commits("justinclift", "a.sqlite")
+        assert err is None, err
+        assert [c.id for c in commits] == ['1' * 64]
+        assert commits[0].timestamp.year == 2021
+    assert calls == ['branches', 'commits', 'branches']
+
+    head['commit'] = '2' * 64
+    history[head['commit']] = {'id': head['commit'], 'parent': '1' * 64, 'timestamp': '2021-06-02T10:00:00Z', 'tree': entries}
+    commits, err = connection.Commits("justinclift", "a.sqlite")
+    assert [c.id for c in commits] == ['1' * 64, '2' * 64]
+    assert commits[1].tree.entries[0].last_modified.year == 2021
+    assert calls[3:] == ['branches', 'commits']
+
+
+def test_metadata_timestamps(monkeypatch, tmp_path):
+    entries = {'entries': [{'name': 'a.sqlite', 'sha256': '', 'last_modified': '2021-06-01T10:00:00Z'}]}
+    commit = {'id': '1' * 64, 'parent': '', 'timestamp': '2021-06-01T10:00:00Z', 'tree': entries}
+    metadata = {'branches': {'master': {'commit': '1' * 64}}, 'commits': {'1' * 64: commit}, 'releases': {}, 'tags': {},
+                'default_branch': 'master', 'web_page': ''}
+
+    def send_request_json(query_url, data, **kwargs):
+        return json.loads(json.dumps(metadata)), None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    # The timestamps have the same type with and without a history store
+    for options in ('', f'    history_store = {tmp_path / "history.sqlite"}\n'):
+        connection = dbhub.Dbhub(config_data=CONFIG + options)
+        res, err = connection.Metadata("justinclift", "a.sqlite")
+        assert err is None, err
+        assert isinstance(res.commits[0].timestamp, datetime.datetime)
+        assert isinstance(res.commits[0].tree.entries[0].last_modified, datetime.datetime)
+
+
+def test_prefetch(standin):
+    # The databases of the API key belong to its account, whatever the owner of the configuration
+    connection = dbhub.Dbhub(config_data=standin.config(prefetch_ttl=60).replace('db_owner = standin', 'db_owner = other'))
+    assert connection.Prefetch(endpoints=('tables',))[1].startswith("The account of the API key is unknown")
+    assert standin.hits == {}
+
+    connection = dbhub.Dbhub(config_data=standin.config(prefetch_ttl=60, account='standin').replace('db_owner = standin', 'db_owner = other'))
+    standin.latency = lambda endpoint, fields: 0.2 if endpoint == 'webpage' else 0
+
+    job, err = connection.Prefetch(endpoints=('tables', 'webpage'))
+    assert err is None
+    # Joins the prefetch request in flight instead of sending another one
+    time.sleep(0.05)
+    assert connection.Webpage('standin', 'standin.sqlite') == ('https://dbhub.io/standin/standin.sqlite', None)
+    assert job.wait(5)
+    assert job.errors == {}
+    assert job.fetched == 2
+
+    # Served from memory, each caller getting its own copy
+    tables, err = connection.Tables('standin', 'standin.sqlite')
+    assert tables == ['table1', 'table2']
+    tables.append('changed')
+    assert connection.Tables('standin', 'standin.sqlite') == (['table1', 'table2'], None)
+    assert connection.Webpage('standin', 'standin.sqlite')[0] == 'https://dbhub.io/standin/standin.sqlite'
+    assert standin.hits == {'databases': 1, 'tables': 1, 'webpage': 1}
+    # Other databases, or versions, aren't
+    assert connection.Tables('standin', 'other.sqlite')[0] == ['table1', 'table2']
+    assert connection.Tables('standin', 'standin.sqlite', dbhub.Identifier(commit_id='c' * 64))[0] == ['table1', 'table2']
+    assert standin.hits['tables'] == 3
+
+    # Callers joining the same request get their own copy too
+    standin.latency = lambda endpoint, fields: 0.2 if endpoint == 'tables' else 0
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(connection.Tables('standin', 'joined.sqlite')[0])) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results[0] == results[1] and results[0] is not results[1]
+    assert standin.hits['tables'] == 4
+
+    job, err = connection.Prefetch([('standin', 'a.sqlite'), 'b.sqlite'], endpoints=('metadata',))
+    assert job.wait(5)
+    assert set(job.errors) == {('standin', 'a.sqlite', 'metadata'), ('other', 'b.sqlite', 'metadata')}
+    assert connection.Prefetch(endpoints=('commits',)) == (None, "Can't prefetch commits")
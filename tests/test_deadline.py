@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+import pydbhub.deadline as deadline
+import pydbhub.dbhub as dbhub
+import pydbhub.fanout as fanout
+
+
+def test_scope():
+    assert deadline.current() is None
+    with deadline.scope(10) as outer:
+        assert deadline.current() is outer
+        assert 9 < outer.remaining() <= 10
+        # A nested deadline can't end after the outer one
+        with deadline.scope(60) as inner:
+            assert deadline.current() is inner
+            assert inner.remaining() <= 10
+        with deadline.scope(1) as inner:
+            assert inner.remaining() <= 1
+        assert deadline.current() is outer
+    assert deadline.current() is None
+
+
+def test_timeouts():
+    expired = []
+    current = deadline.Deadline(2, on_expire=expired.append)
+    connect, read = current.timeouts()
+    assert 1.9 < connect <= 2 and 1.9 < read <= 2
+    assert current.timeouts(connect_timeout=0.5, read_timeout=30)[0] == 0.5
+    assert current.timeouts(connect_timeout=0.5, read_timeout=30)[1] <= 2
+
+    current = deadline.Deadline(0, on_expire=expired.append)
+    with pytest.raises(deadline.DeadlineExceeded):
+        current.timeouts()
+    with pytest.raises(deadline.DeadlineExceeded):
+        current.timeouts()
+    # Only counted once
+    assert expired == [current]
+    assert current.expired
+
+
+def test_propagate():
+    seen = []
+    with deadline.scope(10) as current:
+        list(fanout.as_completed(lambda item: seen.append(deadline.current()), range(4), max_workers=2))
+    assert seen == [current] * 4
+    thread = threading.Thread(target=lambda: seen.append(deadline.current()))
+    thread.start()
+    thread.join()
+    assert seen[-1] is None
+
+
+def test_query_deadline(standin):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60))
+    standin.latency = lambda endpoint, fields: 1.0 if endpoint == 'query' else 0
+
+    start = time.monotonic()
+    with connection.Deadline(0.3):
+        rows, err = connection.Query('standin', 'a.sqlite', 'SELECT 1')
+    assert time.monotonic() - start < 0.9
+    assert rows is None
+    assert err == 'Deadline exceeded'
+
+    # No request is sent once the deadline is reached
+    hits = standin.hits['query']
+    with connection.Deadline(0):
+        rows, err = connection.Query('standin', 'a.sqlite', 'SELECT 2')
+    assert err == 'Deadline exceeded'
+    assert standin.hits['query'] == hits
+
+    metrics = connection.Metrics()
+    assert metrics['deadline_expirations'] == 2
+    assert metrics['request_timeouts'] >= 1
+
+    # Without a deadline, the query waits for the server
+    rows, err = connection.Query('standin', 'a.sqlite', 'SELECT 3')
+    assert err is None, err
+
+
+def test_query_many_deadline(standin):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60))
+    standin.latency = lambda endpoint, fields: 1.0 if fields.get('dbname') == 'slow.sqlite' else 0
+
+    targets = [('standin', 'a.sqlite'), ('standin', 'slow.sqlite'), ('standin', 'b.sqlite')]
+    start = time.monotonic()
+    with connection.Deadline(0.4):
+        results, errors = connection.QueryMany(targets, 'SELECT 1')
+    assert time.monotonic() - start < 0.9
+    assert set(results) == {('standin', 'a.sqlite'), ('standin', 'b.sqlite')}
+    assert list(errors) == [('standin', 'slow.sqlite')]
+    # One deadline, counted once whatever the number of requests it stopped
+    assert connection.Metrics()['deadline_expirations'] == 1
+
+
+def test_timeout_option(standin):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, timeout=0.2, connect_timeout=1))
+    assert connection._transport.read_timeout == 0.2
+    assert connection._transport.connect_timeout == 1
+    standin.latency = lambda endpoint, fields: 1.0 if endpoint == 'query' else 0
+
+    rows, err = connection.Query('standin', 'a.sqlite', 'SELECT 1')
+    assert rows is None
+    assert 'timed out' in err
+    metrics = connection.Metrics()
+    assert metrics['request_timeouts'] == 1
+    assert metrics['deadline_expirations'] == 0
+
+
+def test_limiter_deadline(standin):
+    # A request waiting for the limiter gives up at the deadline
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, adaptive_concurrency='true', initial_concurrency=1))
+    limiter = connection._transport.limiter
+    started = limiter.acquire()
+    try:
+        with connection.Deadline(0.2):
+            rows, err = connection.Tables('standin', 'a.sqlite')
+    finally:
+        limiter.release(started, measured=False)
+    assert err == 'Deadline exceeded'
+    assert limiter.metrics()['queued'] == 0
+    assert limiter.metrics()['inflight'] == 0
+    assert connection.Tables('standin', 'a.sqlite') == (['table1', 'table2'], None)
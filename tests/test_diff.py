@@ -0,0 +1,87 @@
+import sqlite3
+
+from pydbhub.diff import Changeset, ADD, DELETE, MODIFY
+
+DIFFS = {
+    'diff': [
+        {
+            'object_name': 'people',
+            'object_type': 'table',
+            'data': [
+                {'action_type': 'add', 'pk': [{'Name': 'id', 'Type': 4, 'Value': '3'}], 'data_after': [3, 'Carol']},
+                {'action_type': 'add', 'pk': [{'Name': 'id', 'Type': 4, 'Value': '4'}], 'data_after': [4, 'Dave']},
+                {'action_type': 'modify', 'pk': [{'Name': 'id', 'Type': 4, 'Value': '1'}], 'data_before': [1, 'Al'], 'data_after': [1, 'Alice']},
+                {'action_type': 'delete', 'pk': [{'Name': 'id', 'Type': 4, 'Value': '2'}], 'data_before': [2, 'Bob']},
+            ],
+        },
+        {
+            'object_name': 'people_name',
+            'object_type': 'index',
+            'schema': {'action_type': 'add', 'before': '', 'after': 'CREATE INDEX people_name ON people(name)'},
+        },
+    ]
+}
+
+
+def connect():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE people (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.executemany('INSERT INTO people VALUES (?, ?)', [(1, 'Al'), (2, 'Bob')])
+    conn.commit()
+    return conn
+
+
+def test_parse():
+    changeset = Changeset.parse(DIFFS)
+    assert [o.name for o in changeset.objects] == ['people', 'people_name']
+    assert [c.action for c in changeset.objects[0].data] == [ADD, ADD, MODIFY, DELETE]
+    assert changeset.objects[0].data[0].pk == {'id': 3}
+    assert changeset.objects[1].schema.after.startswith('CREATE INDEX')
+
+
+def test_apply():
+    conn = connect()
+    counts, err = Changeset.parse(DIFFS).apply(conn, batch_size=1)
+    assert err is None, err
+    assert counts == {'schema': 1, ADD: 2, DELETE: 1, MODIFY: 1}
+    assert conn.execute('SELECT id, name FROM people ORDER BY id').fetchall() == [(1, 'Alice'), (3, 'Carol'), (4, 'Dave')]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == [('people_name',)]
+
+
+def test_apply_rollback():
+    conn = connect()
+    changeset = Changeset.parse(DIFFS)
+    changeset.objects[0].data.append(changeset.objects[0].data[0])
+    counts, err = changeset.apply(conn)
+    assert counts is None
+    assert 'UNIQUE' in err
+    assert conn.execute('SELECT id, name FROM people ORDER BY id').fetchall() == [(1, 'Al'), (2, 'Bob')]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == []
+    assert not conn.in_transaction
+
+
+def test_apply_open_transaction():
+    # The transaction of the caller keeps its changes, without those of the failed changeset, and stays open
+    conn = connect()
+    conn.execute("INSERT INTO people (id, name) VALUES (9, 'Zoe')")
+    assert conn.in_transaction
+    changeset = Changeset.parse(DIFFS)
+    changeset.objects[0].data.append(changeset.objects[0].data[0])
+    counts, err = changeset.apply(conn)
+    assert counts is None and 'UNIQUE' in err
+    assert conn.in_transaction
+    assert conn.execute('SELECT id, name FROM people ORDER BY id').fetchall() == [(1, 'Al'), (2, 'Bob'), (9, 'Zoe')]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == []
+    conn.rollback()
+    assert conn.execute('SELECT id FROM people ORDER BY id').fetchall() == [(1,), (2,)]
+
+
+def test_apply_unknown_action():
+    conn = connect()
+    changeset = Changeset.parse(DIFFS)
+    changeset.objects[0].data[-1].action = 'rename'
+    counts, err = changeset.apply(conn)
+    assert counts is None and "Unknown action 'rename'" in err
+    assert conn.execute('SELECT id, name FROM people ORDER BY id').fetchall() == [(1, 'Al'), (2, 'Bob')]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == []
+    assert not conn.in_transaction
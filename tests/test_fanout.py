@@ -0,0 +1,174 @@
+import threading
+import time
+
+import pydbhub.dbhub as dbhub
+import pydbhub.fanout as fanout
+
+
+def test_as_completed():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(item):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+        time.sleep(0.01 * (5 - item % 5))
+        with lock:
+            running.remove(item)
+        return item * 2
+
+    results = dict(fanout.as_completed(work, range(20), max_workers=4))
+    assert results == {i: i * 2 for i in range(20)}
+    assert max(peak) <= 4
+
+
+def test_as_completed_executor():
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor = ThreadPoolExecutor(max_workers=4)
+    threads = set()
+
+    def work(item):
+        threads.add(threading.current_thread())
+        # A nested call from a thread of the executor gets threads of its own, instead of waiting for busy ones
+        return sum(value for _, value in fanout.as_completed(lambda i: i, range(item), max_workers=4, executor=executor))
+
+    for _ in range(3):
+        results = dict(fanout.as_completed(work, range(8), max_workers=4, executor=executor))
+        assert results == {i: sum(range(i)) for i in range(8)}
+    # The threads of the executor serve all the calls
+    assert len(threads) <= 4
+    executor.shutdown()
+
+
+def test_merge_results():
+    merged = fanout.merge_results({('a', 'x.sqlite'): [{'id': 1}], ('b', 'y.sqlite'): [{'id': 2}, {'id': 3}]})
+    assert merged == [
+        {'db_owner': 'a', 'db_name': 'x.sqlite', 'id': 1},
+        {'db_owner': 'b', 'db_name': 'y.sqlite', 'id': 2},
+        {'db_owner': 'b', 'db_name': 'y.sqlite', 'id': 3},
+    ]
+
+
+def test_adaptive_limiter():
+    limiter = fanout.AdaptiveLimiter(initial=2, maximum=4)
+    started = [limiter.acquire(), limiter.acquire()]
+    assert limiter.metrics() == {'concurrency_limit': 2, 'inflight': 2, 'queued': 0, 'limit_decreases': 0}
+
+    # Additive increase while the limit is reached
+    limiter.release(started[0])
+    assert limiter.limit == 2.5
+    limiter.release(started[1])
+    assert limiter.limit == 2.5
+
+    # Multiplicative decrease on overload, once for all the requests sent before it
+    started = [limiter.acquire(), limiter.acquire()]
+    limiter.release(started[0], overloaded=True)
+    limiter.release(started[1], overloaded=True)
+    assert limiter.limit == 1.25
+    assert limiter.metrics()['limit_decreases'] == 1
+    limiter.release(limiter.acquire(), overloaded=True)
+    assert limiter.limit == 1
+
+
+def test_adaptive_limiter_latency():
+    limiter = fanout.AdaptiveLimiter(initial=8, slack=0.01)
+    for _ in range(10):
+        limiter.release(limiter.acquire(), key='query')
+    assert limiter.limit == 8
+    started = limiter.acquire()
+    limiter.release(started - 0.5, key='query')
+    assert limiter.limit == 4
+    # Latencies of other endpoints aren't compared to those of the query endpoint
+    limiter.release(limiter.acquire() - 0.5, key='download')
+    assert limiter.limit == 4
+
+
+def test_adaptive_limiter_statements(standin):
+    # A heavy statement among light ones isn't an overload: statements are only compared with themselves
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, query_cache_size=0, adaptive_concurrency='true',
+                                                         initial_concurrency=8))
+    standin.latency = lambda endpoint, fields: 0.3 if fields.get('sql') == 'U0VMRUNUIDI=' else 0
+    for _ in range(10):
+        assert connection.Query('standin', 'a.sqlite', 'SELECT 1')[1] is None
+    assert connection.Query('standin', 'a.sqlite', 'SELECT 2')[1] is None
+    limiter = connection._transport.limiter
+    assert limiter.decreases == 0
+
+    # The same statement getting slower still is
+    standin.latency = lambda endpoint, fields: 0.3
+    assert connection.Query('standin', 'a.sqlite', 'SELECT 1')[1] is None
+    assert limiter.decreases == 1
+    connection._transport.close()
+
+
+def test_adaptive_limiter_queue():
+    limiter = fanout.AdaptiveLimiter(initial=1)
+    started = limiter.acquire()
+    waiter = threading.Thread(target=lambda: limiter.release(limiter.acquire()))
+    waiter.start()
+    for _ in range(100):
+        if limiter.metrics()['queued'] == 1:
+            break
+        time.sleep(0.01)
+    assert limiter.metrics()['queued'] == 1
+    limiter.release(started)
+    waiter.join()
+    assert limiter.metrics()['queued'] == 0
+    assert limiter.metrics()['inflight'] == 0
+
+
+def test_single_flight():
+    flights = fanout.SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return len(calls)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do('key', fetch))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for _ in range(100):
+        if len(flights) == 1 and len(calls) == 1:
+            break
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert results == [1] * 8
+    assert len(flights) == 0
+    assert flights.do('key', lambda: 'again') == 'again'
+
+
+def test_hedger():
+    hedger = fanout.Hedger(percentile=90, max_ratio=0.1, burst=2, min_samples=10)
+    # Not enough latencies yet
+    assert hedger.delay('query') is None
+    for i in range(1, 101):
+        hedger.record('query', i / 1000)
+    assert hedger.delay('query') == 0.091
+    assert hedger.delay('tables') is None
+
+    # One hedge every ten requests, up to a burst of two
+    hedger = fanout.Hedger(max_ratio=0.1, burst=2)
+    assert not hedger.allow()
+    for _ in range(9):
+        hedger.delay('query')
+    assert not hedger.allow()
+    hedger.delay('query')
+    assert hedger.allow()
+    assert not hedger.allow()
+    for _ in range(100):
+        hedger.delay('query')
+    assert hedger.allow() and hedger.allow()
+    assert not hedger.allow()
+    hedger.won()
+    assert hedger.metrics() == {'hedged_requests': 3, 'hedge_wins': 1, 'hedge_ratio': 3 / 110}
@@ -0,0 +1,147 @@
+import os
+
+import pydbhub.dbhub as dbhub
+from pydbhub.httpcache import CachedResponse, HttpCache
+
+
+def test_http_cache(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = HttpCache(path, max_size=100)
+    key = HttpCache.key('https://api.dbhub.io/v1/download', {'apikey': (None, 'a'), 'dbname': (None, 'x.sqlite')})
+    # The API key is part of the key
+    assert key != HttpCache.key('https://api.dbhub.io/v1/download', {'apikey': (None, 'b'), 'dbname': (None, 'x.sqlite')})
+    assert key == HttpCache.key('https://api.dbhub.io/v1/download', {'dbname': (None, 'x.sqlite'), 'apikey': (None, 'a')})
+
+    assert cache.get(key) is None
+    cache.put(key, CachedResponse(content=b'x' * 40, etag='"v1"'))
+    assert cache.get(key) == CachedResponse(content=b'x' * 40, etag='"v1"')
+    assert cache.get(key).conditional_headers() == {'If-None-Match': '"v1"'}
+    cache.put('b', CachedResponse(content=b'b' * 40, commit_id='c1'))
+    cache.served(key, not_modified=True)
+
+    # Over 100 bytes, the least recently used response is dropped, and a response larger than the cache isn't kept
+    cache.put('c', CachedResponse(content=b'c' * 40))
+    assert cache.get('b') is None
+    assert cache.get(key) is not None
+    cache.put('d', CachedResponse(content=b'd' * 101))
+    assert cache.get('d') is None
+    cache.close()
+
+    # The cache outlives the process
+    cache = HttpCache(path, max_size=100)
+    assert cache.get(key).content == b'x' * 40
+    assert cache.metrics() == {'http_cache_hits': 0, 'http_cache_not_modified': 0, 'http_cache_misses': 0}
+    cache.close()
+
+
+def test_download_commit(standin, tmp_path):
+    # Without validators, a downloaded file is served from the cache while the head commit stays the same
+    config = standin.config(head_check_interval=0, http_cache=str(tmp_path / 'cache.sqlite'))
+    connection = dbhub.Dbhub(config_data=config)
+    data, err = connection.Download('standin', 'a.sqlite')
+    assert err is None and data.startswith(b'SQLite format 3')
+    assert connection.Download('standin', 'a.sqlite') == (data, None)
+    assert standin.hits['download'] == 1
+
+    # From another process
+    assert dbhub.Dbhub(config_data=config).Download('standin', 'a.sqlite') == (data, None)
+    assert standin.hits['download'] == 1
+
+    standin.head = 'b' * 64
+    standin.routes['download'] = lambda fields: (200, b'SQLite format 3\x00' + bytes(8176))
+    data, err = connection.Download('standin', 'a.sqlite')
+    assert len(data) == 8192
+    assert standin.hits['download'] == 2
+    assert 'If-None-Match' not in standin.headers['download']
+    assert connection.Metrics()['http_cache_hits'] == 1
+
+
+def test_conditional_request(standin, tmp_path):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=0, http_cache=str(tmp_path / 'cache.sqlite')))
+    content = b'SQLite format 3\x00' + bytes(65520)
+
+    def download(fields):
+        if standin.headers['download'].get('If-None-Match') == '"v1"':
+            return 304, b''
+        return 200, content, {'ETag': '"v1"', 'Last-Modified': 'Mon, 19 Oct 2026 10:00:00 GMT'}
+
+    standin.routes['download'] = download
+    assert connection.Download('standin', 'a.sqlite') == (content, None)
+
+    # A new commit: the file is checked with the server, which answers it didn't change
+    standin.head = 'b' * 64
+    assert connection.Download('standin', 'a.sqlite') == (content, None)
+    assert standin.hits['download'] == 2
+    assert standin.headers['download']['If-Modified-Since'] == 'Mon, 19 Oct 2026 10:00:00 GMT'
+    metrics = connection.Metrics()
+    assert metrics['http_cache_not_modified'] == 1
+    assert metrics['http_cache_hits'] == 0
+
+    # The commit of the file is now known
+    assert connection.Download('standin', 'a.sqlite') == (content, None)
+    assert standin.hits['download'] == 2
+
+    # Errors aren't cached
+    standin.head = 'c' * 64
+    standin.routes['download'] = lambda fields: (404, {'error': 'No such database'})
+    data, err = connection.Download('standin', 'a.sqlite')
+    assert data is None and '404' in err
+
+
+def test_json_validators(standin, tmp_path):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=0, http_cache=str(tmp_path / 'cache.sqlite')))
+    commits = {'c' * 64: {'id': 'c' * 64, 'timestamp': '2026-10-19T10:00:00Z', 'tree': {'entries': []}}}
+
+    def route(fields):
+        if standin.headers['commits'].get('If-None-Match') == '"c1"':
+            return 304, b''
+        return 200, commits, {'ETag': '"c1"'}
+
+    standin.routes['commits'] = route
+    first, err = connection.Commits('standin', 'a.sqlite')
+    assert err is None, err
+    standin.head = 'b' * 64
+    second, err = connection.Commits('standin', 'a.sqlite')
+    assert err is None, err
+    assert [c.id for c in second] == [c.id for c in first] == ['c' * 64]
+    assert standin.hits['commits'] == 2
+    assert connection.Metrics()['http_cache_not_modified'] == 1
+    # With validators, the branch heads aren't needed
+    assert standin.hits['branches'] == 1
+
+
+def test_large_bodies(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = HttpCache(path, max_size=100, max_inline_size=10)
+    cache.put('a', CachedResponse(content=b'a' * 40, etag='"v1"'))
+    stored = cache.get('a')
+    assert stored.content is None and stored.read() == b'a' * 40
+    assert len(os.listdir(path + '.bodies')) == 1
+
+    # The file of a replaced or dropped body is removed, while the old one can't be read anymore
+    cache.put('a', CachedResponse(content=b'b' * 40, etag='"v2"'))
+    assert stored.read() is None
+    assert cache.get('a').read() == b'b' * 40
+    cache.put('c', CachedResponse(content=b'c' * 80))
+    assert cache.get('a') is None
+    assert len(os.listdir(path + '.bodies')) == 1
+    cache.close()
+
+
+def test_download_large_file(standin, tmp_path):
+    # A stored file dropped meanwhile is transferred again after a 304 answer
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=0, http_cache=str(tmp_path / 'cache.sqlite')))
+    content = b'SQLite format 3\x00' + bytes(2 * 1024 * 1024)
+
+    def download(fields):
+        if standin.headers['download'].get('If-None-Match') == '"v1"':
+            return 304, b''
+        return 200, content, {'ETag': '"v1"'}
+
+    standin.routes['download'] = download
+    assert connection.Download('standin', 'a.sqlite') == (content, None)
+    for name in os.listdir(str(tmp_path / 'cache.sqlite.bodies')):
+        os.remove(str(tmp_path / 'cache.sqlite.bodies' / name))
+    standin.head = 'b' * 64
+    assert connection.Download('standin', 'a.sqlite') == (content, None)
+    assert standin.hits['download'] == 3
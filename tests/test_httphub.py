@@ -0,0 +1,147 @@
+import io
+import sys
+import threading
+import time
+
+import pytest
+
+import pydbhub.dbhub as dbhub
+import pydbhub.httphub as httphub
+
+
+def test_form():
+    assert httphub._form({'apikey': (None, 'key'), 'branch': (None, None), 'sql': b'U0VMRUNU', 'ids': [1, 2]}) == {
+        'apikey': 'key',
+        'sql': 'U0VMRUNU',
+        'ids': ['1', '2'],
+    }
+
+
+def test_create_transport(monkeypatch):
+    assert type(httphub.create_transport()) is httphub.Transport
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    assert type(httphub.create_transport(http2=True)) is httphub.Http2Transport
+
+    # Without httpx and h2, HTTP/1.1 is used
+    monkeypatch.setitem(sys.modules, 'h2', None)
+    assert type(httphub.create_transport(http2=True)) is httphub.Transport
+
+
+@pytest.mark.parametrize('http2', [False, True])
+def test_transport_rejects_cookies(standin, http2):
+    if http2:
+        pytest.importorskip('httpx')
+        pytest.importorskip('h2')
+    transport = httphub.create_transport(http2=http2)
+    standin.routes['tables'] = lambda fields: (200, ['table1'], {'Set-Cookie': f"session={fields['apikey']}; Path=/"})
+    # Two tenants sharing the transport: the cookie set for the first one isn't sent for the second one
+    for api_key in ('alice', 'bob'):
+        res, err = httphub.send_request_json(standin.url + '/v1/tables', {'apikey': (None, api_key)}, transport=transport)
+        assert err is None, err
+        assert 'Cookie' not in standin.headers['tables']
+    transport.close()
+
+
+def test_http2_transport(standin):
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, http2='true'))
+    assert isinstance(connection._transport, httphub.Http2Transport)
+
+    # The stand-in server only speaks HTTP/1.1: the transport falls back to it
+    rows, err = connection.Query('standin', 'a.sqlite', 'SELECT ?', ['x'])
+    assert err is None, err
+    assert rows == [{'db': 'a.sqlite', 'sql': "SELECT 'x'"}]
+    assert connection.Tables('standin', 'a.sqlite') == (['table1', 'table2'], None)
+    data, err = connection.Download('standin', 'a.sqlite')
+    assert err is None and data.startswith(b'SQLite format 3')
+
+    uploaded = {}
+
+    def upload(fields):
+        uploaded.update(fields)
+        return 201, {'commit_id': 'c' * 64}
+
+    standin.routes['upload'] = upload
+    res, err = connection.Upload('a.sqlite', dbhub.UploadInformation(commitmsg='test'), io.BytesIO(b'database'))
+    assert err is None, err
+    assert res == {'commit_id': 'c' * 64}
+    assert uploaded['file'] == b'database'
+    assert uploaded['commitmsg'] == 'test'
+
+    standin.routes['tables'] = lambda fields: (404, {'error': 'No such database'})
+    tables, err = connection.Tables('standin', 'a.sqlite')
+    assert tables is None
+    assert err == {'error': 'No such database'}
+    connection._transport.close()
+
+
+@pytest.mark.parametrize('http2', [False, True])
+def test_hedged_requests(standin, http2):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, query_cache_size=0, hedge='true', hedge_max_ratio=0.5,
+                                                         http2=str(http2).lower()))
+    assert connection._transport.hedger is not None
+    slow = []
+    stall = 1.0
+
+    def latency(endpoint, fields):
+        # Only the first request of a slow query is stuck
+        if endpoint == 'query' and fields['sql'] in slow:
+            slow.remove(fields['sql'])
+            return stall
+        return 0.005
+
+    standin.latency = latency
+
+    for i in range(30):
+        assert connection.Query('standin', 'a.sqlite', 'SELECT ?', [i])[1] is None
+    before = connection.Metrics()
+
+    # The first request of this query is stuck: its hedge answers
+    slow.append('U0VMRUNUICd4Jw==')
+    start = time.monotonic()
+    rows, err = connection.Query('standin', 'a.sqlite', 'SELECT ?', ['x'])
+    # Answered before the stuck request could have been
+    assert time.monotonic() - start < stall
+    assert err is None, err
+    assert rows == [{'db': 'a.sqlite', 'sql': "SELECT 'x'"}]
+    metrics = connection.Metrics()
+    assert metrics['hedged_requests'] == before['hedged_requests'] + 1
+    assert metrics['hedge_wins'] == before['hedge_wins'] + 1
+
+    # Uploads are never hedged
+    assert 'upload' not in httphub.HEDGED_ENDPOINTS and 'download' not in httphub.HEDGED_ENDPOINTS
+    connection._transport.close()
+
+
+def test_hedged_concurrency(standin):
+    # The originals are sent from the calling threads: more of them than the pool size run at the same time
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, query_cache_size=0, hedge='true', pool_size=2))
+    for i in range(30):
+        assert connection.Query('standin', 'a.sqlite', 'SELECT ?', [i])[1] is None
+    assert connection._transport.hedger.delay(standin.url + '/v1/query') is not None
+
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def latency(endpoint, fields):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.2)
+        with lock:
+            running[0] -= 1
+        return 0
+
+    standin.latency = latency
+    errors = []
+    threads = [threading.Thread(target=lambda i=i: errors.append(connection.Query('standin', 'a.sqlite', 'SELECT ?', [i])[1]))
+               for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == [None] * 16
+    assert running[1] >= 8
+    connection._transport.close()
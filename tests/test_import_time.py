@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+import pytest
+
+# Modules which must only be imported on first use of the transport, timestamps parsing or configuration
+DEFERRED = ('requests', 'urllib3', 'ssl', 'dateutil', 'configparser', 'sqlite3', 'concurrent.futures', 'hashlib', 'uuid')
+
+
+def importtime(module: str) -> dict:
+    # Runs "python -X importtime" and returns the cumulative import time (in microseconds) of each imported module
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        stderr=subprocess.PIPE, check=True, universal_newlines=True
+    ).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_deferred_imports():
+    times = importtime('pydbhub.dbhub')
+    assert 'pydbhub.dbhub' in times
+    assert [m for m in DEFERRED if m in times] == []
+
+
+def test_import_time():
+    pytest.importorskip('requests')
+    # Importing the client must stay well below the cost of the HTTP stack it defers. Timings vary from run to run
+    # on a loaded machine: the modules imported are compared instead.
+    client = importtime('pydbhub.dbhub')
+    transport = importtime('requests')
+    assert 'requests' not in client
+    assert len(client) < len(transport), f"pydbhub.dbhub imports {len(client)} modules, requests {len(transport)}"
@@ -0,0 +1,31 @@
+import pydbhub.httphub as httphub
+from pydbhub.dbhub import Identifier
+from pydbhub.manager import ClientManager
+
+CONFIG = '''
+    [dbhub]
+    api_key = default
+    db_owner = justinclift
+    db_name = Join Testing.sqlite
+'''
+
+
+def test_clients(monkeypatch):
+    manager = ClientManager(config_data=CONFIG)
+    calls = []
+
+    def send_request_json(query_url, data, transport=None):
+        assert transport is manager.transport
+        calls.append(data['apikey'][1])
+        return [[{'Name': 'key', 'Type': 3, 'Value': data['apikey'][1]}]], None
+
+    monkeypatch.setattr(httphub, 'send_request_json', send_request_json)
+    alice, bob = manager.client('alice'), manager.client('bob')
+    assert manager.client('alice') is alice
+    ident = Identifier(commit_id='c' * 64)
+    for _ in range(2):
+        assert alice.Query('justinclift', 'a.sqlite', 'SELECT 1', ident=ident) == ([{'key': 'alice'}], None)
+        assert bob.Query('justinclift', 'a.sqlite', 'SELECT 1', ident=ident) == ([{'key': 'bob'}], None)
+    # Results are shared by the clients of a tenant, never across tenants
+    assert calls == ['alice', 'bob']
+    assert manager.stats() == {'clients': 2, 'cached_queries': 2}
@@ -0,0 +1,132 @@
+import hashlib
+import io
+import os
+
+import pydbhub.dbhub as dbhub
+from pydbhub.mirror import ObjectStore
+
+
+def database(content: bytes) -> bytes:
+    return b'SQLite format 3\x00' + content * 1000
+
+
+# Files of each commit, a commit holding one database file
+FILES = {
+    'c1': database(b'one'),
+    'c2': database(b'two'),
+    # Same file as c1, in another database
+    'c3': database(b'one'),
+}
+
+
+def commit(commit_id: str, name: str) -> dict:
+    content = FILES[commit_id]
+    return {
+        'id': commit_id, 'timestamp': '2021-04-01T10:00:00Z', 'message': '',
+        'tree': {'entries': [{'name': name, 'entry_type': 'db', 'sha256': hashlib.sha256(content).hexdigest(),
+                              'size': len(content), 'last_modified': '2021-04-01T10:00:00Z'}]},
+    }
+
+
+def serve(standin, dbs):
+    # dbs maps each database name to its commits, the last one being the head of master
+    def branches(fields):
+        head = dbs[fields['dbname']][-1]
+        return 200, {'branches': {'master': {'commit': head, 'commit_count': 1, 'description': ''}}, 'default_branch': 'master'}
+
+    def commits(fields):
+        return 200, {cid: commit(cid, fields['dbname']) for cid in dbs[fields['dbname']]}
+
+    def download(fields):
+        return 200, FILES[fields['commit']]
+
+    standin.routes.update(branches=branches, commits=commits, download=download)
+
+
+def test_download_to(standin):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    f = io.BytesIO()
+    size, err = connection.DownloadTo('standin', 'standin.sqlite', f)
+    assert err is None
+    assert size == 4096
+    assert f.getvalue() == b'SQLite format 3\x00' + bytes(4080)
+
+    standin.routes['download'] = lambda fields: (404, {'error': 'Database not found'})
+    size, err = connection.DownloadTo('standin', 'missing.sqlite', io.BytesIO())
+    assert size is None
+    assert err
+
+
+def test_mirror(standin, tmp_path):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    dbs = {'a.sqlite': ['c1', 'c2'], 'b.sqlite': ['c3']}
+    serve(standin, dbs)
+    progress = []
+
+    report, err = connection.Mirror(str(tmp_path), ['a.sqlite', ('standin', 'b.sqlite')], progress=progress.append)
+    assert err is None
+    assert (report.databases, report.unchanged, report.commits, report.files, report.downloaded) == (2, 0, 3, 2, 2)
+    assert report.bytes_downloaded == len(FILES['c1']) + len(FILES['c2'])
+    assert len(progress) == 2
+    # The file shared by c1 and c3 is downloaded once
+    assert standin.hits['download'] == 2
+    store = ObjectStore(str(tmp_path))
+    for content in FILES.values():
+        with open(store.path(hashlib.sha256(content).hexdigest()), 'rb') as f:
+            assert f.read() == content
+    assert store.read_ref('standin', 'a.sqlite')['heads'] == {'master': 'c2'}
+    assert os.listdir(tmp_path / 'tmp') == []
+
+    # Unchanged databases cost one request each
+    report, err = connection.Mirror(str(tmp_path), ['a.sqlite', 'b.sqlite'])
+    assert err is None
+    assert (report.databases, report.unchanged, report.downloaded) == (2, 2, 0)
+    assert standin.hits['commits'] == 2
+    assert standin.hits['download'] == 2
+
+    # A new commit holding a file already stored downloads nothing
+    dbs['b.sqlite'] = ['c3', 'c1']
+    report, err = connection.Mirror(str(tmp_path), ['a.sqlite', 'b.sqlite'])
+    assert err is None
+    assert (report.unchanged, report.downloaded) == (1, 0)
+    assert standin.hits['commits'] == 3
+    assert store.read_ref('standin', 'b.sqlite')['heads'] == {'master': 'c1'}
+
+
+def test_mirror_resume(standin, tmp_path):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    serve(standin, {'a.sqlite': ['c1', 'c2']})
+    download = standin.routes['download']
+    standin.routes['download'] = lambda fields: (500, {'error': 'failed'}) if fields['commit'] == 'c2' else download(fields)
+    # A file left by an interrupted mirror
+    os.makedirs(tmp_path / 'tmp')
+    (tmp_path / 'tmp' / 'left.part').write_bytes(b'SQLite')
+
+    report, err = connection.Mirror(str(tmp_path), ['a.sqlite'])
+    assert err == "1 databases or files failed to mirror"
+    assert report.downloaded == 1
+    assert list(report.errors) == [hashlib.sha256(FILES['c2']).hexdigest()]
+    # The database isn't recorded until all its files are stored
+    store = ObjectStore(str(tmp_path))
+    assert store.read_ref('standin', 'a.sqlite') is None
+    assert os.listdir(tmp_path / 'tmp') == []
+
+    standin.routes['download'] = download
+    report, err = connection.Mirror(str(tmp_path), ['a.sqlite'])
+    assert err is None
+    assert (report.unchanged, report.files, report.downloaded) == (0, 2, 1)
+    assert standin.hits['download'] == 3
+    assert store.read_ref('standin', 'a.sqlite') is not None
+
+
+def test_mirror_checks_sha256(standin, tmp_path):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    serve(standin, {'a.sqlite': ['c1']})
+    standin.routes['download'] = lambda fields: (200, database(b'corrupted'))
+
+    report, err = connection.Mirror(str(tmp_path), ['a.sqlite'])
+    assert err
+    assert report.downloaded == 0
+    sha256 = hashlib.sha256(FILES['c1']).hexdigest()
+    assert "doesn't match" in report.errors[sha256]
+    assert not ObjectStore(str(tmp_path)).has(sha256)
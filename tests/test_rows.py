@@ -0,0 +1,44 @@
+import pytest
+
+from pydbhub.rows import Row, Rows
+
+
+def test_rows():
+    rows = Rows(('id', 'name'), [(1, 'a'), (2, 'b')])
+    assert len(rows) == 2
+    assert rows == [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}]
+    assert rows != [{'id': 1, 'name': 'a'}]
+    assert rows == Rows(('id', 'name'), [(1, 'a'), (2, 'b')])
+    assert rows.column('name') == ['a', 'b']
+    assert [row['id'] for row in rows] == [1, 2]
+    assert list(reversed(rows))[0]['id'] == 2
+    assert repr(rows) == "Rows(columns=('id', 'name'), 2 rows)"
+    # Shared results can't be changed
+    assert isinstance(rows.tuples, tuple) and isinstance(rows[:1].tuples, tuple)
+
+
+def test_row():
+    row = Rows(('id', 'name'), [(1, 'a')])[0]
+    assert isinstance(row, Row)
+    assert row == {'id': 1, 'name': 'a'}
+    assert {'id': 1, 'name': 'a'} == row
+    assert row != {'id': 1}
+    assert list(row) == list(row.keys()) == ['id', 'name']
+    assert list(row.values()) == [1, 'a']
+    assert 'name' in row and 'other' not in row
+    assert row.values_tuple == (1, 'a')
+    assert repr(row) == "{'id': 1, 'name': 'a'}"
+    with pytest.raises(KeyError):
+        row['other']
+    with pytest.raises(TypeError):
+        row['id'] = 2
+    # No per row dictionnary
+    with pytest.raises(AttributeError):
+        row.__dict__
+
+
+def test_repeated_columns():
+    # Like a dictionnary, the last column of a name wins
+    rows = Rows(('a', 'b', 'a'), [(1, 2, 3)])
+    assert rows[0] == {'a': 3, 'b': 2}
+    assert rows.tuples == ((1, 2, 3),)
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+import pydbhub.dbhub as dbhub
+from pydbhub.schema import Schema
+
+
+def test_schema_snapshot(standin):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60))
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+    pinned = []
+    route_columns = standin.route_columns
+
+    def columns(fields):
+        with lock:
+            pinned.append(fields.get('commit'))
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.1)
+        with lock:
+            state['running'] -= 1
+        return route_columns(fields)
+
+    standin.routes['columns'] = columns
+
+    schema, err = connection.Schema('standin', 'standin.sqlite')
+    assert err is None, err
+    assert isinstance(schema, Schema)
+    assert schema.commit == standin.head
+    assert list(schema.tables) == ['table1', 'table2']
+    assert list(schema.views) == ['view1']
+    assert [c.name for c in schema.columns('table2')] == ['id', 'name']
+    assert schema.indexes[0].name == 'table1_idx'
+    with pytest.raises(KeyError):
+        schema.columns('missing')
+    # The snapshot is consistent: every request is pinned on the head commit
+    assert pinned == [standin.head] * 3
+    # The columns of the tables and views are fetched concurrently
+    assert state['peak'] > 1
+
+    # Changing a snapshot doesn't change the cached one
+    del schema.tables['table1']
+    schema.columns('table2')[0].name = 'changed'
+    again, err = connection.Schema('standin', 'standin.sqlite')
+    assert list(again.tables) == ['table1', 'table2']
+    assert [c.name for c in again.columns('table2')] == ['id', 'name']
+    assert standin.hits['columns'] == 3
+    assert standin.hits['tables'] == 1
+
+
+def test_schema_error(standin):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60))
+    standin.routes['views'] = lambda fields: (400, {'error': 'No such database'})
+    schema, err = connection.Schema('standin', 'standin.sqlite')
+    assert schema is None
+    assert err
+    assert connection.Schema('standin', 'standin.sqlite')[0] is None
+    assert standin.hits['views'] == 2
+
+
+def test_check():
+    columns = [type('Column', (), {'name': 'id', 'data_type': 'INTEGER'}), type('Column', (), {'name': 'name', 'data_type': 'TEXT'})]
+    schema = Schema(commit='c' * 64, tables={'table1': columns}, views={'view1': columns[:1]})
+    assert schema.check('SELECT id, name FROM table1 WHERE id > 1') is None
+    assert schema.check('SELECT v.id FROM view1 v JOIN table1 t ON t.id = v.id') is None
+    assert 'syntax error' in schema.check('SELEC id FROM table1')
+    assert 'no such column' in schema.check('SELECT missing FROM table1')
+    assert 'no such table' in schema.check('SELECT id FROM missing')
+    assert schema.check('DELETE FROM table1') == 'Only SELECT statements are allowed'
+    assert schema.check('SELECT 1; SELECT 2')
+    # Functions the local SQLite may lack are left to the server
+    assert schema.check('SELECT some_extension(id) FROM table1') is None
+
+
+def test_check_indexes_and_functions():
+    columns = [type('Column', (), {'name': 'id', 'data_type': 'INTEGER'}), type('Column', (), {'name': 'name', 'data_type': 'TEXT'})]
+    index = type('Index', (), {'name': 'table1_name', 'table': 'table1', 'columns': [type('Column', (), {'name': 'name'})]})
+    schema = Schema(commit='c' * 64, tables={'table1': columns}, views={'view1': columns[:1]}, indexes=[index])
+    assert schema.check("SELECT id FROM table1 INDEXED BY table1_name WHERE name = 'a'") is None
+    assert schema._db.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == [('table1_name',)]
+    # Indexes the snapshot doesn't describe (on expressions...) are left to the server
+    assert schema.check("SELECT id FROM table1 INDEXED BY table1_other WHERE name = 'a'") is None
+    # So are table-valued functions the local SQLite may lack, but not unknown tables
+    assert schema.check('SELECT value FROM generate_series(1, 10)') is None
+    assert schema.check('SELECT t.id FROM table1 t JOIN "generate_series" (1, 3) s ON s.value = t.id') is None
+    assert 'no such table' in schema.check('SELECT id FROM generate_series')
+
+
+def test_check_reserved_table():
+    columns = [type('Column', (), {'name': 'name', 'data_type': ''}), type('Column', (), {'name': 'seq', 'data_type': ''})]
+    schema = Schema(commit='c' * 64, tables={'table1': columns, 'sqlite_sequence': columns})
+    # The local database can't have a sqlite_sequence table: statements using it are left to the server
+    assert schema.check('SELECT seq FROM sqlite_sequence') is None
+    assert schema.check('SELECT s.seq FROM main.sqlite_sequence s JOIN table1 t ON t.name = s.name') is None
+    assert schema.check('SELECT seq FROM table1') is None
+    assert 'no such column' in schema.check('SELECT missing FROM table1')
+    assert 'no such table' in schema.check('SELECT seq FROM missing')
+
+
+def test_query_preflight(standin):
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, preflight='true'))
+    rows, err = connection.Query('standin', 'standin.sqlite', 'SELECT nme FROM table1 WHERE id = ?', [1])
+    assert rows is None
+    assert err == 'no such column: nme'
+    rows, err = connection.Query('standin', 'standin.sqlite', 'SELECT name FROM table1 WHERE id = ?', [2])
+    assert err is None, err
+    rows, err = connection.Query('standin', 'standin.sqlite', 'UPDATE table1 SET name = ?', ['x'])
+    assert err == 'Only SELECT statements are allowed'
+    assert standin.hits['query'] == 1
+    # The schema is only fetched once for the commit
+    assert standin.hits['tables'] == 1
+
+    rows, err = connection.Query('standin', 'standin.sqlite', 'SELECT nme FROM table1', preflight=False)
+    assert err is None, err
+    assert standin.hits['query'] == 2
@@ -0,0 +1,41 @@
+import base64
+
+import pytest
+
+import pydbhub.sqlparams as sqlparams
+
+
+def test_quote():
+    assert sqlparams.quote(None) == 'NULL'
+    assert sqlparams.quote(True) == '1'
+    assert sqlparams.quote(42) == '42'
+    assert sqlparams.quote(1.5) == '1.5'
+    assert sqlparams.quote("O'Brien") == "'O''Brien'"
+    assert sqlparams.quote('café') == "'café'"
+    assert sqlparams.quote(b'\x00\xff') == "X'00ff'"
+    with pytest.raises(TypeError):
+        sqlparams.quote(object())
+
+
+def test_bind_positional():
+    statement = sqlparams.prepare("SELECT * FROM t WHERE a = ? AND b = ?2 AND c = '?' -- ?\n")
+    assert statement.param_count == 2
+    assert statement.bind([1, 'x']) == "SELECT * FROM t WHERE a = 1 AND b = 'x' AND c = '?' -- ?\n"
+    with pytest.raises(ValueError):
+        statement.bind([1])
+
+
+def test_bind_named():
+    statement = sqlparams.prepare('SELECT ":a" FROM t WHERE a = :a OR b = @b /* :c */')
+    assert statement.bind({'a': 'x', 'b': None}) == """SELECT ":a" FROM t WHERE a = 'x' OR b = NULL /* :c */"""
+    with pytest.raises(ValueError):
+        statement.bind({'a': 1})
+    with pytest.raises(ValueError):
+        statement.bind([1, 2])
+
+
+def test_encode():
+    encoded = sqlparams.encode("SELECT ?", ['é'])
+    assert base64.b64decode(encoded).decode('utf-8') == "SELECT 'é'"
+    assert sqlparams.encode("SELECT ?", [1]) != sqlparams.encode("SELECT ?", [1.0])
+    assert sqlparams.encode("SELECT ?", [bytearray(b'a')]) == base64.b64encode(b"SELECT X'61'")
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+import pydbhub.dbhub as dbhub
+
+
+@pytest.mark.parametrize('threads', [1, 8, 64])
+def test_shared_client(standin, threads):
+    # One client shared by many threads: every thread must get the answers to its own requests
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60))
+    errors = []
+    start = threading.Barrier(threads)
+
+    def work(worker):
+        start.wait()
+        for i in range(10):
+            db_name = f'db{worker % 4}.sqlite'
+            result, err = connection.Query('standin', db_name, 'SELECT ?, ?', [worker, i])
+            if err or result != [{'db': db_name, 'sql': f'SELECT {worker}, {i}'}]:
+                errors.append((worker, i, result, err))
+            tables, err = connection.Tables('standin', db_name)
+            if err or tables != ['table1', 'table2']:
+                errors.append((worker, i, tables, err))
+
+    pool = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    assert errors == []
+    assert standin.hits['query'] == threads * 10
+    # Branch heads are only checked once by database, even when threads race on them
+    assert standin.hits['branches'] == min(threads, 4)
+
+
+def test_adaptive_concurrency(standin):
+    # A server which can only serve 6 queries at the same time, answering 429 beyond
+    connection = dbhub.Dbhub(config_data=standin.config(head_check_interval=60, adaptive_concurrency='true', max_concurrency=32))
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0, 'rejected': 0}
+    route_query = standin.route_query
+
+    def query(fields):
+        with lock:
+            if state['running'] >= 6:
+                state['rejected'] += 1
+                return 429, {'error': 'Too many requests'}
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        try:
+            time.sleep(0.01)
+            return route_query(fields)
+        finally:
+            with lock:
+                state['running'] -= 1
+
+    standin.routes['query'] = query
+    targets = [('standin', f'db{i}.sqlite') for i in range(300)]
+    results, errors = connection.QueryMany(targets, 'SELECT 1')
+    metrics = connection.Metrics()
+
+    assert len(results) + len(errors) == 300
+    assert metrics['inflight'] == 0 and metrics['queued'] == 0
+    assert metrics['limit_decreases'] >= 1
+    # The limit settles around the capacity of the server instead of the 32 threads
+    assert metrics['concurrency_limit'] <= 12
+    assert state['rejected'] == len(errors) < 60
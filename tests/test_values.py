@@ -0,0 +1,21 @@
+import base64
+
+import pytest
+
+import pydbhub.values as values
+
+
+def test_blob_column():
+    blobs = [b'', b'a', b'ab', b'abc', bytes(range(256))]
+    column = values.BlobColumn([base64.b64encode(blob).decode('ascii') for blob in blobs])
+    assert [bytes(value) for value in column] == blobs
+    assert bytes(column[-1]) == blobs[-1]
+    assert column.span(3) == (3, 6)
+    with pytest.raises(TypeError):
+        column[1][0] = 0
+
+
+def test_blob_column_padding():
+    # Padding in the middle of a value: it doesn't decode to the size its length tells
+    column = values.BlobColumn(['QQ==QQ==', 'QUJD'])
+    assert [bytes(value) for value in column] == [b'A', b'ABC']
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pydbhub.dbhub as dbhub
+import pydbhub.fanout as fanout
+from pydbhub.watch import Watcher
+
+
+def branches(heads):
+    def route(fields):
+        db_heads = heads[fields['dbname']]
+        return 200, {
+            'branches': {name: {'commit': commit, 'commit_count': 1, 'description': ''} for name, commit in db_heads.items()},
+            'default_branch': 'master',
+        }
+    return route
+
+
+def test_poll(standin):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    heads = {f'db{i}.sqlite': {'master': 'a' * 64} for i in range(20)}
+    standin.routes['branches'] = branches(heads)
+    changes = []
+    watcher = Watcher(connection, [('standin', name) for name in heads], lambda *change: changes.append(change),
+                      min_interval=0.05, max_interval=10, jitter=0, requests_per_second=1000)
+
+    # The first check only records the heads
+    assert watcher.poll() == 0
+    assert changes == []
+    assert len(watcher.heads) == 20
+    assert standin.hits['branches'] == 20
+
+    heads['db3.sqlite'] = {'master': 'b' * 64, 'dev': 'c' * 64}
+    heads['db7.sqlite'] = {}
+    time.sleep(0.06)
+    assert watcher.poll() == 3
+    assert sorted(changes) == [
+        (('standin', 'db3.sqlite'), 'dev', None, 'c' * 64),
+        (('standin', 'db3.sqlite'), 'master', 'a' * 64, 'b' * 64),
+        (('standin', 'db7.sqlite'), 'master', 'a' * 64, None),
+    ]
+
+    # Unchanged databases are checked less and less often, changed ones at the shortest interval
+    assert watcher._intervals[('standin', 'db3.sqlite')] == 0.05
+    assert watcher._intervals[('standin', 'db0.sqlite')] == 0.1
+    time.sleep(0.06)
+    watcher.poll()
+    assert standin.hits['branches'] == 42
+    assert watcher._intervals[('standin', 'db3.sqlite')] == 0.1
+
+    # Failures are kept, and backed off
+    standin.routes['branches'] = lambda fields: (500, {'error': 'Unavailable'})
+    time.sleep(0.45)
+    watcher.poll()
+    assert watcher.errors[('standin', 'db0.sqlite')] == {'error': 'Unavailable'}
+    assert watcher._intervals[('standin', 'db0.sqlite')] == 0.2
+
+
+def test_poll_exceptions(standin, monkeypatch):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    heads = {'a.sqlite': {'master': 'a' * 64}, 'b.sqlite': {'master': 'a' * 64}}
+    standin.routes['branches'] = branches(heads)
+    changes = []
+
+    def callback(db, branch, old_head, new_head):
+        if db[1] == 'a.sqlite':
+            raise ValueError('callback bug')
+        changes.append(db)
+
+    watcher = Watcher(connection, [('standin', name) for name in heads], callback, min_interval=0.05, jitter=0, requests_per_second=1000)
+    watcher.poll()
+
+    # A failing callback doesn't keep the other databases from being called back
+    heads['a.sqlite'] = heads['b.sqlite'] = {'master': 'b' * 64}
+    time.sleep(0.06)
+    assert watcher.poll() == 2
+    assert changes == [('standin', 'b.sqlite')]
+    assert 'callback bug' in watcher.errors[('standin', 'a.sqlite')]
+    assert ('standin', 'b.sqlite') not in watcher.errors
+
+    # Neither does an exception from a check
+    def broken(db_owner, db_name):
+        raise RuntimeError('client bug')
+
+    monkeypatch.setattr(connection, 'Branches', broken)
+    time.sleep(0.11)
+    assert watcher.poll() == 0
+    assert 'client bug' in watcher.errors[('standin', 'b.sqlite')]
+
+    # And the background thread keeps polling
+    monkeypatch.undo()
+    heads['b.sqlite'] = {'master': 'c' * 64}
+    with watcher.start():
+        deadline = time.monotonic() + 5
+        while changes == [('standin', 'b.sqlite')] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert changes == [('standin', 'b.sqlite')] * 2
+
+
+def test_add_again(standin):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    standin.routes['branches'] = branches({'a.sqlite': {'master': 'a' * 64}})
+    watcher = Watcher(connection, [('standin', 'a.sqlite')], lambda *change: None, min_interval=0.05, jitter=0,
+                      requests_per_second=1000)
+    watcher.poll()
+    # Removed then added again: checked at once, and then only once per interval
+    watcher.remove('standin', 'a.sqlite')
+    watcher.add('standin', 'a.sqlite')
+    watcher.poll()
+    assert standin.hits['branches'] == 2
+    time.sleep(0.06)
+    watcher.poll()
+    assert standin.hits['branches'] == 3
+    assert len(watcher._due) == 1
+
+
+def test_budget(standin):
+    connection = dbhub.Dbhub(config_data=standin.config())
+    heads = {f'db{i}.sqlite': {'master': 'a' * 64} for i in range(20)}
+    standin.routes['branches'] = branches(heads)
+    watcher = Watcher(connection, [('standin', name) for name in heads], lambda *change: None, requests_per_second=50, max_workers=4)
+    start = time.monotonic()
+    watcher.poll()
+    # 4 at once, then 50 by second
+    assert time.monotonic() - start >= 16 / 50 * 0.9
+    assert watcher.requests == 20
+
+
+def test_rate_limiter():
+    limiter = fanout.RateLimiter(10, burst=2)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert 0.09 < limiter.reserve() <= 0.1
+    assert 0.19 < limiter.reserve() <= 0.2
+
+
+def test_watch(standin):
+    # The databases of the API key belong to its account, whatever the owner of the configuration
+    config = standin.config().replace('db_owner = standin', 'db_owner = other')
+    assert dbhub.Dbhub(config_data=config).Watch(lambda *change: None)[1].startswith("The account of the API key is unknown")
+    connection = dbhub.Dbhub(config_data=config + 'account = standin\n')
+    heads = {'standin.sqlite': {'master': 'a' * 64}, 'other.sqlite': {'master': 'a' * 64}}
+    standin.routes['branches'] = branches(heads)
+    changed = threading.Event()
+    changes = []
+
+    def callback(*change):
+        changes.append(change)
+        changed.set()
+
+    watcher, err = connection.Watch(callback, min_interval=0.05, max_interval=0.1)
+    assert err is None, err
+    try:
+        while len(watcher.heads) < 1:
+            time.sleep(0.01)
+        heads['standin.sqlite'] = {'master': 'b' * 64}
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+    assert changes == [(('standin', 'standin.sqlite'), 'master', 'a' * 64, 'b' * 64)]
+    assert not watcher._thread.is_alive()